@@ -1,7 +1,19 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, send_file
 from user_input import get_input_data
-from execute import execute
-from pattern import regex_dict
+from execute import execute, execute_batch, execute_scenarios
+from scenarios import scenario_criteria
+from pattern_profiles import AUTO_DETECT, profile_stats
+from content_cache import ContentCache, CACHE_FOLDER, evict_least_recently_used
+from job_profiler import profile_file_path
+from job_queue import JobQueue, JOB_WORKERS, RESULTS_RETENTION_HOURS, new_job_id, job_directory, expire_job_directories
+from metrics import render_metrics
+from record_writers import OUTPUT_FORMATS, CONTENT_TYPES
+from conditional_formats import VALIDATION_MODES, FILL_MODE
+from results_store import ResultsStore, RESULTS_DB
+from pdf_source import PdfSource, SPOOL_MAX_BYTES
+from pdf_reader import DEFAULT_TEXT_BACKEND, text_backend_function
+from werkzeug.utils import secure_filename
+import json
 import os
 
 app = Flask(__name__)
@@ -12,6 +24,114 @@ UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Worker processes used for PDF text extraction, 1 keeps extraction serial
+PDF_READ_WORKERS = int(os.environ.get('PDF_READ_WORKERS', 1))
+
+# Text extraction backend, 'pypdf2' or the faster 'stream' tokenizer, see pdf_reader.TEXT_BACKENDS
+PDF_TEXT_BACKEND = os.environ.get('PDF_TEXT_BACKEND', DEFAULT_TEXT_BACKEND)
+text_backend_function(PDF_TEXT_BACKEND)
+
+# Skip the text extraction of pages that can never yield a truss, off until triage is
+# measurably cheaper than extracting them, see benchmarks/bench_page_triage.py
+PDF_PAGE_TRIAGE = os.environ.get('PDF_PAGE_TRIAGE', '0').lower() in ('1', 'true', 'yes')
+
+# Uploads are analysed from memory, or a memory mapped temp file above the spool size
+# in MB, and the original PDF is only kept in its job directory when retention is on
+UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get('UPLOAD_SPOOL_MB', SPOOL_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+RETAIN_UPLOADS = os.environ.get('RETAIN_UPLOADS', '0').lower() in ('1', 'true', 'yes')
+
+# Retained uploads are kept apart from the job directories, under a job directory of
+# their own, so the upload cap never evicts results
+ORIGINALS_FOLDER = os.path.join(UPLOAD_FOLDER, 'originals')
+
+# Size caps in MB, the least recently used files are evicted beyond them
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_MB', 1024)) * 1024 * 1024
+ANALYSIS_CACHE = ContentCache(
+    os.environ.get('ANALYSIS_CACHE_FOLDER', CACHE_FOLDER),
+    max_bytes=int(os.environ.get('ANALYSIS_CACHE_MB', 512)) * 1024 * 1024,
+)
+
+# Job directories and their results are deleted this many hours after their last change
+RESULTS_RETENTION_SECONDS = float(os.environ.get('RESULTS_RETENTION_HOURS', RESULTS_RETENTION_HOURS)) * 3600
+
+# Records and verdicts of every job, queried across jobs through /query
+RESULTS_STORE = ResultsStore(os.environ.get('RESULTS_DB', RESULTS_DB))
+
+# Background worker pool running the analysis jobs
+JOB_QUEUE = JobQueue(workers=int(os.environ.get('JOB_WORKERS', JOB_WORKERS)))
+
+# Files of a batch analysed at once, unset uses one process per CPU
+BATCH_CONCURRENCY = int(os.environ['BATCH_CONCURRENCY']) if os.environ.get('BATCH_CONCURRENCY') else None
+
+def parse_input_data(form):
+    """Create the input_data dictionary from the submitted form fields"""
+    return get_input_data(
+        design_roof_dead_load=float(form.get('roofDeadLoad', 21)),
+        design_floor_dead_load=float(form.get('floorDeadLoad', 18)),
+        design_roof_live_load_more_slope=float(form.get('roofLiveLoadSteep', 16)),
+        design_roof_live_load_less_slope=float(form.get('roofLiveLoadShallow', 20)),
+        design_floor_live_load=float(form.get('floorLiveLoad', 40)),
+        actual_truss_spacing=float(form.get('trussSpacing', 2)),
+        design_wind_standard=form.get('windStandard', 'ASCE 7-16'),
+        design_wind_speed=float(form.get('windSpeed', 115)),
+        design_risk_category=form.get('riskCategory', 'II'),
+        design_building_code=form.get('buildingCode', 'IRC 2018'),
+        design_roof_live_load_deflection_criteria=int(form.get('roofLiveDeflection', 'L/360').split('/')[1]),
+        design_roof_total_load_deflection_criteria=int(form.get('roofTotalDeflection', 'L/240').split('/')[1]),
+        design_floor_live_load_deflection_criteria=int(form.get('floorLiveDeflection', 'L/360').split('/')[1]),
+        design_floor_total_load_deflection_criteria=int(form.get('floorTotalDeflection', 'L/240').split('/')[1])
+    )
+
+def parse_output_format(form):
+    """The requested output format, the results workbook unless another is chosen"""
+    output_format = form.get('outputFormat', 'xlsx').lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+    return output_format
+
+def parse_validation_mode(form):
+    """How failing cells of the workbook are marked, painted unless conditional formatting is chosen"""
+    validation_mode = form.get('validationMode', FILL_MODE).lower()
+    if validation_mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode '{validation_mode}', expected one of {', '.join(VALIDATION_MODES)}")
+    return validation_mode
+
+def parse_profiling(form):
+    """True when the job is to run under the profiler, from the optional profileJob form field"""
+    return form.get('profileJob', '').lower() in ('1', 'true', 'yes', 'on')
+
+def ingest_upload(file, job_dir):
+    """
+    Read an uploaded PDF from the request into memory or a spool file.
+
+    The original is only written when uploads are retained, to the directory matching
+    job_dir under ORIGINALS_FOLDER, within the upload cap. The cap evicts only retained
+    originals, never those of queued or running jobs, nor any job's results.
+    """
+    source = PdfSource.from_stream(file.stream, secure_filename(file.filename) or 'upload.pdf',
+                                   spool_max_bytes=UPLOAD_SPOOL_MAX_BYTES)
+    if RETAIN_UPLOADS:
+        original_dir = os.path.join(ORIGINALS_FOLDER, os.path.relpath(job_dir, UPLOAD_FOLDER))
+        os.makedirs(original_dir, exist_ok=True)
+        filepath = source.persist(os.path.join(original_dir, source.name))
+        active = [os.path.join(ORIGINALS_FOLDER, job_id) for job_id in JOB_QUEUE.active_jobs()]
+        evict_least_recently_used(ORIGINALS_FOLDER, UPLOAD_MAX_BYTES, keep=[filepath] + active)
+    return source
+
+def expire_results():
+    """Delete the job directories and retained uploads past the retention period, jobs still in the queue are kept"""
+    active = JOB_QUEUE.active_jobs()
+    expire_job_directories(UPLOAD_FOLDER, RESULTS_RETENTION_SECONDS, keep=active + [os.path.basename(ORIGINALS_FOLDER)])
+    expire_job_directories(ORIGINALS_FOLDER, RESULTS_RETENTION_SECONDS, keep=active)
+
+def analyse_uploads(func, sources, *args, **kwargs):
+    """Run an analysis job on ingested uploads, releasing their memory and spool files after"""
+    try:
+        return func(*args, **kwargs)
+    finally:
+        for source in sources:
+            source.close()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -26,44 +146,221 @@ def submit():
         file = request.files['fileInput']
         if file.filename == '':
             return jsonify({'success': False, 'message': 'No file selected'})
-            
-        if file and file.filename.endswith('.pdf'):
-            filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-            file.save(filepath)
+        if not file.filename.lower().endswith('.pdf'):
+            return jsonify({'success': False, 'message': 'Only PDF files can be analysed'})
         
         # Get form data and create input_data dictionary
-        input_data = get_input_data(
-            design_roof_dead_load=float(request.form.get('roofDeadLoad', 21)),
-            design_floor_dead_load=float(request.form.get('floorDeadLoad', 18)),
-            design_roof_live_load_more_slope=float(request.form.get('roofLiveLoadSteep', 16)),
-            design_roof_live_load_less_slope=float(request.form.get('roofLiveLoadShallow', 20)),
-            design_floor_live_load=float(request.form.get('floorLiveLoad', 40)),
-            actual_truss_spacing=float(request.form.get('trussSpacing', 2)),
-            design_wind_standard=request.form.get('windStandard', 'ASCE 7-16'),
-            design_wind_speed=float(request.form.get('windSpeed', 115)),
-            design_risk_category=request.form.get('riskCategory', 'II'),
-            design_building_code=request.form.get('buildingCode', 'IRC 2018'),
-            design_roof_live_load_deflection_criteria=int(request.form.get('roofLiveDeflection', 'L/360').split('/')[1]),
-            design_roof_total_load_deflection_criteria=int(request.form.get('roofTotalDeflection', 'L/240').split('/')[1]),
-            design_floor_live_load_deflection_criteria=int(request.form.get('floorLiveDeflection', 'L/360').split('/')[1]),
-            design_floor_total_load_deflection_criteria=int(request.form.get('floorTotalDeflection', 'L/240').split('/')[1])
-        )
-
-        # Execute analysis
-        execute(input_data, filepath, regex_dict)
-        
-        # Get the output file path
-        output_file = f'Truss Review Results_{os.path.splitext(os.path.basename(filepath))[0]}.xlsx'
-        output_path = os.path.abspath(output_file)
+        input_data = parse_input_data(request.form)
+        output_format = parse_output_format(request.form)
+        validation_mode = parse_validation_mode(request.form)
+        profiling = parse_profiling(request.form)
+
+        # Every job works in its own directory under the upload folder
+        expire_results()
+        job_id = new_job_id()
+        job_dir = job_directory(UPLOAD_FOLDER, job_id)
+        source = ingest_upload(file, job_dir)
+
+        # Queue the analysis, the frontend polls /status/<job_id> for progress
+        JOB_QUEUE.submit(job_id, analyse_uploads, execute, [source], input_data, source, AUTO_DETECT,
+                         read_workers=PDF_READ_WORKERS, cache=ANALYSIS_CACHE, output_dir=job_dir,
+                         output_format=output_format, store=RESULTS_STORE, project=request.form.get('projectName', ''),
+                         profiling=profiling, validation_mode=validation_mode, text_backend=PDF_TEXT_BACKEND,
+                         triage_pages=PDF_PAGE_TRIAGE)
+        if profiling:
+            pdf_file_name = os.path.splitext(source.name)[0]
+            JOB_QUEUE.update(job_id, profile_paths={
+                'pstats': profile_file_path(pdf_file_name, 'pstats', job_dir),
+                'txt': profile_file_path(pdf_file_name, 'txt', job_dir),
+            })
         
         return jsonify({
             'success': True, 
-            'message': 'Analysis completed successfully',
-            'output_path': output_path
+            'message': 'Analysis queued',
+            'job_id': job_id
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@app.route('/submit_batch', methods=['POST'])
+def submit_batch():
+    try:
+        files = [file for file in request.files.getlist('fileInput') if file.filename]
+        if not files:
+            return jsonify({'success': False, 'message': 'No file selected'})
+        if not all(file.filename.lower().endswith('.pdf') for file in files):
+            return jsonify({'success': False, 'message': 'Only PDF files can be analysed'})
+
+        input_data = parse_input_data(request.form)
+        output_format = parse_output_format(request.form)
+        validation_mode = parse_validation_mode(request.form)
+
+        # Every file of the batch gets its own directory, uploads may share a file name
+        expire_results()
+        job_id = new_job_id()
+        job_dir = job_directory(UPLOAD_FOLDER, job_id)
+        sources = []
+        output_dirs = []
+        for index, file in enumerate(files):
+            file_dir = job_directory(job_dir, f'{index:03d}')
+            sources.append(ingest_upload(file, file_dir))
+            output_dirs.append(file_dir)
+
+        # Queue the batch, the summary workbook is the job output
+        JOB_QUEUE.submit(job_id, analyse_uploads, execute_batch, sources, input_data, sources, AUTO_DETECT, job_dir,
+                         concurrency=BATCH_CONCURRENCY, cache=ANALYSIS_CACHE, output_dirs=output_dirs,
+                         output_format=output_format, store=RESULTS_STORE, project=request.form.get('projectName', ''),
+                         validation_mode=validation_mode, text_backend=PDF_TEXT_BACKEND, triage_pages=PDF_PAGE_TRIAGE)
+
+        return jsonify({
+            'success': True,
+            'message': f'Batch of {len(files)} files queued',
+            'job_id': job_id
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@app.route('/submit_scenarios', methods=['POST'])
+def submit_scenarios():
+    """
+    Check one PDF against several criteria sets in a single job.
+
+    The scenarios form field is a JSON list of criteria sets keyed as the arguments of
+    get_input_data, each with an optional name, overriding the criteria of the form.
+    """
+    try:
+        file = request.files.get('fileInput')
+        if file is None or file.filename == '':
+            return jsonify({'success': False, 'message': 'No file selected'})
+        if not file.filename.lower().endswith('.pdf'):
+            return jsonify({'success': False, 'message': 'Only PDF files can be analysed'})
+
+        try:
+            specs = json.loads(request.form.get('scenarios', ''))
+        except json.JSONDecodeError:
+            return jsonify({'success': False, 'message': 'Scenarios must be a JSON list of criteria sets'})
+        scenarios = scenario_criteria(specs, base=parse_input_data(request.form))
+
+        expire_results()
+        job_id = new_job_id()
+        job_dir = job_directory(UPLOAD_FOLDER, job_id)
+        source = ingest_upload(file, job_dir)
+
+        JOB_QUEUE.submit(job_id, analyse_uploads, execute_scenarios, [source], scenarios, source, AUTO_DETECT,
+                         read_workers=PDF_READ_WORKERS, cache=ANALYSIS_CACHE, output_dir=job_dir,
+                         text_backend=PDF_TEXT_BACKEND, triage_pages=PDF_PAGE_TRIAGE)
+
+        return jsonify({
+            'success': True,
+            'message': f'What-if analysis of {len(scenarios)} scenarios queued',
+            'job_id': job_id
         })
 
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
+@app.route('/status/<job_id>')
+def status(job_id):
+    job = JOB_QUEUE.status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+
+    # Results are fetched through the download route, never by their path on the server
+    output_path = job.pop('output_path')
+    if output_path:
+        job['output_file'] = os.path.basename(output_path)
+        job['download_url'] = url_for('results', job_id=job_id, download=1)
+    if job.pop('profile_paths', None):
+        job['profile_url'] = url_for('profile', job_id=job_id)
+    job['success'] = job['status'] != 'failed'
+    return jsonify(job)
+
+@app.route('/results/<job_id>')
+def results(job_id):
+    """
+    Stream the output of a finished job in the response, ?download=1 sends it as an attachment.
+
+    Responses carry an ETag and Last-Modified so a repeated download is answered with
+    304 Not Modified, and Range requests are served for resuming large result files.
+    """
+    job = JOB_QUEUE.status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+    if job['status'] != 'done' or not job['output_path']:
+        return jsonify({'success': False, 'message': f"Job is {job['status']}, no results available"}), 409
+    if not os.path.exists(job['output_path']):
+        return jsonify({'success': False, 'message': 'Results have expired'}), 410
+
+    file_path = job['output_path']
+    output_format = os.path.splitext(file_path)[1].lstrip('.')
+    return send_file(
+        os.path.abspath(file_path),
+        mimetype=CONTENT_TYPES.get(output_format, 'application/octet-stream'),
+        as_attachment=bool(request.args.get('download')),
+        download_name=os.path.basename(file_path),
+        conditional=True,
+        etag=True,
+        max_age=0,
+    )
+
+@app.route('/results/<job_id>/profile')
+def profile(job_id):
+    """The profile text summary of a job submitted with profileJob, ?format=pstats sends the raw stats"""
+    job = JOB_QUEUE.status(job_id)
+    if job is None or not job.get('profile_paths'):
+        return jsonify({'success': False, 'message': 'No profile for this job'}), 404
+    if job['status'] not in ('done', 'failed'):
+        return jsonify({'success': False, 'message': f"Job is {job['status']}, no profile available"}), 409
+
+    profile_format = request.args.get('format', 'txt')
+    file_path = job['profile_paths'].get(profile_format)
+    if file_path is None:
+        return jsonify({'success': False, 'message': "Profile format must be 'txt' or 'pstats'"}), 400
+    if not os.path.exists(file_path):
+        return jsonify({'success': False, 'message': 'Profile has expired'}), 410
+    return send_file(
+        os.path.abspath(file_path),
+        mimetype='text/plain' if profile_format == 'txt' else 'application/octet-stream',
+        as_attachment=profile_format == 'pstats',
+        download_name=os.path.basename(file_path),
+        conditional=True,
+        max_age=0,
+    )
+
+@app.route('/query/jobs')
+def query_jobs():
+    jobs = RESULTS_STORE.jobs(project=request.args.get('project'), file_name=request.args.get('file_name'))
+    return jsonify({'success': True, 'jobs': jobs})
+
+@app.route('/query/trusses')
+def query_trusses():
+    """Trusses across past jobs, filtered by rule, verdict, project, file_name, label or any truss field"""
+    try:
+        trusses = RESULTS_STORE.trusses(**request.args.to_dict())
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 400
+    return jsonify({'success': True, 'trusses': trusses})
+
+@app.route('/query/failures')
+def query_failures():
+    failures = RESULTS_STORE.failure_counts(project=request.args.get('project'))
+    return jsonify({'success': True, 'failures': failures})
+
+@app.route('/profiles')
+def profiles():
+    """Documents parsed with each vendor pattern profile and its pattern match rates on design pages"""
+    return jsonify({'success': True, 'profiles': profile_stats()})
+
+@app.route('/metrics')
+def metrics():
+    counts = JOB_QUEUE.counts()
+    gauges = {
+        'truss_jobs_queued': ('Analysis jobs waiting for a worker', counts['queued']),
+        'truss_jobs_running': ('Analysis jobs in flight', counts['running']),
+    }
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+from execute import execute_batch, find_pdf_files
+from pattern_profiles import AUTO_DETECT
+from user_input import get_input_data
+from content_cache import ContentCache
+from record_writers import OUTPUT_FORMATS
+from conditional_formats import VALIDATION_MODES, FILL_MODE
+from results_store import ResultsStore
+from pdf_reader import TEXT_BACKENDS, DEFAULT_TEXT_BACKEND
+
+# SCRIPT TO ANALYSE A WHOLE DIRECTORY OF SHOP DRAWINGS FROM THE COMMAND LINE
+# Every PDF gets its own results workbook or records file and the batch gets a summary
+# workbook with one row per file. Example:
+# python batch.py drawings/ extra.pdf --output-dir results --criteria criteria.json
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyse many truss shop drawing PDFs in parallel.')
+    parser.add_argument('inputs', nargs='+', help='PDF files or directories of PDF files')
+    parser.add_argument('--output-dir', default='.', help='Directory the workbooks are written to')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='Number of files analysed at once, defaults to one per CPU')
+    parser.add_argument('--criteria', default=None,
+                        help='JSON file of design criteria, keyed as the arguments of get_input_data')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='xlsx',
+                        help='Output of every file, a results workbook or the records as JSON, NDJSON or CSV')
+    parser.add_argument('--validation', choices=VALIDATION_MODES, default=FILL_MODE,
+                        help='Paint the failing cells of every workbook, or leave them to Excel conditional formatting')
+    parser.add_argument('--store', default=None, help='Save every file\'s records and verdicts to this SQLite database')
+    parser.add_argument('--project', default='', help='Project the files are saved under in the store')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile every file with cProfile and tracemalloc, saving the stats next to its output')
+    parser.add_argument('--text-backend', choices=TEXT_BACKENDS, default=DEFAULT_TEXT_BACKEND,
+                        help='PDF text extraction backend, stream is faster and falls back to pypdf2 per page')
+    parser.add_argument('--triage', action='store_true',
+                        help='Skip the text extraction of pages that can never yield a truss')
+    parser.add_argument('--cache-dir', default=None, help='Reuse extracted page text and records from this cache')
+    args = parser.parse_args()
+
+    criteria = {}
+    if args.criteria:
+        with open(args.criteria, 'r', encoding='utf-8') as file:
+            criteria = json.load(file)
+    input_data = get_input_data(**criteria)
+
+    pdf_file_paths = find_pdf_files(args.inputs)
+    if not pdf_file_paths:
+        parser.error('no PDF files found')
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache = ContentCache(args.cache_dir) if args.cache_dir else None
+    store = ResultsStore(args.store) if args.store else None
+    summary_path = execute_batch(input_data, pdf_file_paths, AUTO_DETECT, args.output_dir,
+                                 concurrency=args.concurrency, cache=cache, output_format=args.format,
+                                 store=store, project=args.project, profiling=args.profile,
+                                 validation_mode=args.validation, text_backend=args.text_backend,
+                                 triage_pages=args.triage)
+    print(f"Batch summary: {summary_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import time
+
+import openpyxl
+from openpyxl.styles import Alignment, Font, PatternFill
+
+from cell_styles import register_styles, LABEL_STYLE, VALUE_STYLE, PASS_STYLE, FAIL_STYLE
+
+# SCRIPT TO MEASURE PER-CELL STYLE OBJECTS AGAINST THE SHARED NAMED STYLES
+# Styles a multi-thousand-row results sheet both ways, then reports the styling time,
+# wb.save time and file size. Run from the repository root:
+# python -m benchmarks.bench_cell_styles --rows 5000
+
+COLUMNS = 20
+
+
+def verdict(row, column):
+    """Deterministic pass/fail pattern with roughly one failing cell in seven"""
+    return (row * 31 + column * 17) % 7 != 0
+
+
+def fill_values(ws, rows):
+    """Writes a label and numeric values for every truss row"""
+    for row in range(4, rows + 4):
+        ws.cell(row=row, column=1).value = f'T{row:05d}'
+        for column in range(2, COLUMNS + 1):
+            ws.cell(row=row, column=column).value = float(row % 97)
+
+
+def style_per_cell(ws, rows):
+    """The previous approach: fresh Font, PatternFill and Alignment objects per cell"""
+    for row in range(4, rows + 4):
+        for column in range(1, COLUMNS + 1):
+            ws.cell(row=row, column=column).alignment = Alignment(horizontal='center', vertical='center')
+    for row in range(4, rows + 4):
+        for column in range(2, COLUMNS + 1):
+            cell = ws.cell(row=row, column=column)
+            if verdict(row, column):
+                cell.font = Font()
+                cell.fill = PatternFill(fill_type=None)
+            else:
+                cell.font = Font(color='00FF0000')
+                cell.fill = PatternFill(start_color='00FFCC99', end_color='00FFCC99', fill_type='solid')
+
+
+def style_shared(ws, rows):
+    """The shared registry: every cell references a named style"""
+    register_styles(ws.parent)
+    for row in range(4, rows + 4):
+        for column in range(1, COLUMNS + 1):
+            ws.cell(row=row, column=column).style = LABEL_STYLE if column == 1 else VALUE_STYLE
+    for row in range(4, rows + 4):
+        for column in range(2, COLUMNS + 1):
+            ws.cell(row=row, column=column).style = PASS_STYLE if verdict(row, column) else FAIL_STYLE
+
+
+def measure(style, rows, directory):
+    """Returns the styling time, save time and file size of one approach"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    fill_values(ws, rows)
+
+    start = time.perf_counter()
+    style(ws, rows)
+    styled = time.perf_counter()
+    file_path = os.path.join(directory, f'{style.__name__}.xlsx')
+    wb.save(file_path)
+    saved = time.perf_counter()
+
+    return styled - start, saved - styled, os.path.getsize(file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure shared cell styles in the results workbook.')
+    parser.add_argument('--rows', type=int, default=5000, help='Number of truss rows')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'':14}{'style (s)':>12}{'save (s)':>12}{'size (KB)':>12}")
+        for style in (style_per_cell, style_shared):
+            style_time, save_time, size = measure(style, args.rows, directory)
+            print(f"{style.__name__:14}{style_time:12.2f}{save_time:12.2f}{size / 1024:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
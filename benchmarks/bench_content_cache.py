@@ -0,0 +1,49 @@
+import argparse
+import os
+import tempfile
+import time
+
+from content_cache import ContentCache
+from pdf_reader import read_pdf
+from benchmarks.sample_pages import build_document
+from benchmarks.synthetic_pdf import write_pdf
+
+# SCRIPT TO CHECK AND TIME THE PAGE TEXT CACHE
+# Writes synthetic submittals, plain and with the text of every page drawn from its
+# own form XObject so all pages share one content stream, and reads each without the
+# cache, into an empty cache and from the filled cache. The text of every page must
+# be the same all three ways. Run from the repository root:
+# python -m benchmarks.bench_content_cache --pages 100 1000
+
+
+def timed_read(pdf_file_path, cache=None):
+    """Returns the text of every page and the time in seconds of reading them"""
+    start = time.perf_counter()
+    pages = read_pdf(pdf_file_path, cache=cache)
+    return pages, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time the page text cache.')
+    parser.add_argument('--pages', type=int, nargs='+', default=[100, 1000], help='Synthetic document sizes')
+    args = parser.parse_args()
+
+    print(f"{'layout':>8}{'pages':>7}{'uncached (s)':>14}{'cold (s)':>10}{'warm (s)':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for page_count in args.pages:
+            for layout in ('plain', 'forms'):
+                pdf_file_path = write_pdf(os.path.join(directory, f'cache_{layout}_{page_count}.pdf'),
+                                          build_document(page_count), form_xobjects=layout == 'forms')
+                cache = ContentCache(os.path.join(directory, f'cache_{layout}_{page_count}'))
+                reference, uncached = timed_read(pdf_file_path)
+                cold_pages, cold = timed_read(pdf_file_path, cache)
+                warm_pages, warm = timed_read(pdf_file_path, cache)
+                assert len(set(reference)) > 1, f"{layout} pages all extracted the same, {page_count} pages"
+                for name, pages in (('cold', cold_pages), ('warm', warm_pages)):
+                    different = [number + 1 for number, (a, b) in enumerate(zip(reference, pages)) if a != b]
+                    assert not different, f"{name} cache text differs on pages {different[:10]}, {layout} {page_count}"
+                print(f"{layout:>8}{page_count:7}{uncached:14.2f}{cold:10.2f}{warm:10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import tempfile
+import time
+
+import PyPDF2
+from content_stream_text import FontCache
+from pdf_reader import iter_pdf_parallel, release_page_objects, text_backend_function, TEXT_BACKENDS
+from benchmarks.sample_pages import build_document
+from benchmarks.synthetic_pdf import write_pdf
+
+# SCRIPT TO MEASURE THE DOCUMENT FONT CACHE OF THE TEXT EXTRACTION BACKENDS
+# Writes synthetic submittals whose font has a ToUnicode CMap and extracts them with
+# every backend, building the font character maps for every page and then once for
+# the document. The text must be the same both ways. The hit rate and the time
+# saved are reported, and the hit rate across worker processes. Run from the
+# repository root:
+# python -m benchmarks.bench_font_cache --pages 1000 5000 --workers 2
+
+
+def extract_pages(pdf_file_path, text_backend, shared):
+    """Returns the text of every page, the document FontCache and the time in seconds of extracting them"""
+    page_text = text_backend_function(text_backend)
+    document_cache = FontCache()
+    pages = []
+    start = time.perf_counter()
+    with open(pdf_file_path, 'rb') as pdf_import:
+        pdf = PyPDF2.PdfReader(pdf_import)
+        for page in pdf.pages:
+            font_cache = document_cache if shared else FontCache()
+            pages.append(page_text(page, font_cache))
+            if not shared:
+                document_cache.merge(font_cache)
+            release_page_objects(pdf)
+    return pages, document_cache, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the font cache of the text extraction backends.')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1000, 5000], help='Synthetic document sizes')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes of the parallel read')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions, best is kept')
+    parser.add_argument('--backends', nargs='+', choices=TEXT_BACKENDS, default=list(TEXT_BACKENDS),
+                        help='Text extraction backends measured')
+    args = parser.parse_args()
+
+    print(f"{'backend':>8}{'pages':>7}{'hits':>8}{'misses':>8}{'hit rate':>10}{'per page (s)':>14}"
+          f"{'shared (s)':>12}{'saved (s)':>11}{'estimate (s)':>14}{'worker hit rate':>17}")
+    with tempfile.TemporaryDirectory() as directory:
+        for page_count in args.pages:
+            pdf_file_path = write_pdf(os.path.join(directory, f'fonts_{page_count}.pdf'),
+                                      build_document(page_count), to_unicode=True)
+            for backend in args.backends:
+                per_page = shared = float('inf')
+                for _ in range(args.repeat):
+                    reference, _, seconds = extract_pages(pdf_file_path, backend, shared=False)
+                    per_page = min(per_page, seconds)
+                    pages, font_cache, seconds = extract_pages(pdf_file_path, backend, shared=True)
+                    shared = min(shared, seconds)
+                assert pages == reference, f"{backend} text differs with the shared font cache, {page_count} pages"
+                # Building the maps for every page costs what the shared cache's hits save
+                estimate = font_cache.saved_seconds()
+
+                worker_cache = FontCache()
+                list(iter_pdf_parallel(pdf_file_path, page_count, args.workers, text_backend=backend,
+                                       font_cache=worker_cache))
+                lookups = font_cache.hits + font_cache.misses
+                worker_lookups = worker_cache.hits + worker_cache.misses
+                print(f"{backend:>8}{page_count:7}{font_cache.hits:8}{font_cache.misses:8}"
+                      f"{font_cache.hits / lookups:10.1%}"
+                      f"{per_page:14.2f}{shared:12.2f}{per_page - shared:11.2f}{estimate:14.2f}"
+                      f"{worker_cache.hits / worker_lookups:17.1%}")
+
+
+if __name__ == '__main__':
+    main()
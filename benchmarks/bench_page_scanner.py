@@ -0,0 +1,72 @@
+import argparse
+import time
+
+from pattern import regex_dict
+from storage_compartment import find_patterns
+from page_scanner import scan_page
+from benchmarks.sample_pages import build_document
+
+# SCRIPT TO BENCHMARK page_scanner.scan_page AGAINST storage_compartment.find_patterns
+# Run from the repository root: python -m benchmarks.bench_page_scanner --pages 1500
+
+
+def check_parity(pages):
+    """
+    Verifies scan_page reports the same data as find_patterns on every page.
+
+    A page rejected by scan_page must fail the compartmentalize_pdf gate, and a page
+    accepted by it must carry the same first match for every key.
+
+    Returns:
+    int: The number of truss design pages found.
+    """
+    accepted = 0
+    for index, page in enumerate(pages):
+        expected = find_patterns(page, regex_dict)
+        scanned = scan_page(page, regex_dict)
+        qualifies = bool(
+            expected['label_found']
+            and expected['page1_pattern_found']
+            and not expected['truss_layout_pattern_found']
+        )
+        if scanned is None:
+            assert not qualifies, f"page {index} was rejected but qualifies"
+            continue
+
+        assert qualifies, f"page {index} was accepted but does not qualify"
+        for key, matches in expected.items():
+            assert scanned[key] == matches[:1], f"page {index} differs on {key}"
+        accepted += 1
+    return accepted
+
+
+def time_scan(scan, pages, repeat):
+    """Returns the best wall time in seconds of scanning every page with scan."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            scan(page, regex_dict)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the gated page scanner.')
+    parser.add_argument('--pages', type=int, default=1500, help='Number of synthetic pages')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions, best is kept')
+    args = parser.parse_args()
+
+    pages = build_document(args.pages)
+    truss_pages = check_parity(pages)
+    print(f"Parity check passed: {truss_pages} truss pages out of {len(pages)}")
+
+    legacy = time_scan(find_patterns, pages, args.repeat)
+    scanner = time_scan(scan_page, pages, args.repeat)
+    print(f"find_patterns : {legacy * 1000:8.1f} ms ({len(pages) / legacy:,.0f} pages/s)")
+    print(f"scan_page     : {scanner * 1000:8.1f} ms ({len(pages) / scanner:,.0f} pages/s)")
+    print(f"Speedup       : {legacy / scanner:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from pattern import regex_dict
+from pdf_reader import iter_pdf
+from storage_compartment import compartmentalize_pdf
+from benchmarks.sample_pages import build_document, general_notes_page
+from benchmarks.synthetic_pdf import write_pdf
+
+# SCRIPT TO CHECK AND TIME PAGE TRIAGE AGAINST FULL TEXT EXTRACTION
+# Writes synthetic submittals with a share of general notes sheets between the truss
+# designs, then reads each with and without triage. The truss records must be the
+# same both ways. Run from the repository root:
+# python -m benchmarks.bench_page_triage --pages 1000 --notes 0 0.25 0.5
+
+
+def with_notes_pages(pages, share, seed=0):
+    """Inserts general notes sheets before design pages until they are the given share of pages"""
+    rng = random.Random(seed)
+    notes = int(len(pages) * share / (1 - share)) if share < 1 else 0
+    document = list(pages)
+    # Notes go in front of a page 1, never between a design page and its continuation
+    for _ in range(notes):
+        positions = [index for index, page in enumerate(document) if 'Page 1' in page and 'Truss Type' in page]
+        document.insert(rng.choice(positions), general_notes_page(rng, rng.randint(1, 3)))
+    return document
+
+
+def read_records(pdf_file_path, triage, repeat):
+    """Returns the records of a PDF and the best time in seconds of reading and parsing it"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        truss_dictionary = compartmentalize_pdf(regex_dict, iter_pdf(pdf_file_path, triage_pages=triage))
+        best = min(best, time.perf_counter() - start)
+    return truss_dictionary, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time page triage before text extraction.')
+    parser.add_argument('--pages', type=int, default=1000, help='Synthetic pages before notes are added')
+    parser.add_argument('--notes', type=float, nargs='+', default=[0, 0.25, 0.5],
+                        help='Share of the document made of general notes sheets')
+    parser.add_argument('--seeds', type=int, default=3, help='Documents checked per share')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions, best is kept')
+    args = parser.parse_args()
+
+    print(f"{'notes':>6}{'seed':>6}{'pages':>8}{'trusses':>9}{'full (s)':>10}{'triage (s)':>12}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for share in args.notes:
+            for seed in range(args.seeds):
+                pages = with_notes_pages(build_document(args.pages, seed), share, seed)
+                pdf_file_path = write_pdf(os.path.join(directory, f'triage_{share}_{seed}.pdf'), pages)
+                full, full_seconds = read_records(pdf_file_path, False, args.repeat)
+                triaged, triage_seconds = read_records(pdf_file_path, True, args.repeat)
+                assert [record.to_list() for record in full.values()] == \
+                    [record.to_list() for record in triaged.values()], f"records differ, notes {share} seed {seed}"
+                print(f"{share:6.2f}{seed:6}{len(pages):8}{len(full):9}{full_seconds:10.2f}{triage_seconds:12.2f}"
+                      f"{full_seconds / triage_seconds:9.2f}")
+
+
+if __name__ == '__main__':
+    main()
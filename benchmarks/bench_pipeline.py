@@ -0,0 +1,83 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from pattern import regex_dict
+from pdf_reader import read_pdf
+from storage_compartment import compartmentalize_pdf
+from workbook_creater import create_workbook, unpack_and_store_values, save_workbook
+from data_checker import assess
+from user_input import get_input_data
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+# SCRIPT TO TIME EVERY STAGE OF THE ANALYSIS ON SYNTHETIC SHOP DRAWINGS
+# Writes a synthetic PDF per page count, then runs the stages one after the other in a
+# fresh process so the peak memory of each run is its own. Run from the repository root:
+# python -m benchmarks.bench_pipeline --pages 10 100 1000 5000
+
+PAGE_COUNTS = [10, 100, 1000, 5000]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def time_stages(pdf_file_path, workers):
+    """
+    Runs the analysis stages on one PDF, timing each.
+
+    Returns:
+    list: A (stage, seconds, peak RSS in MB after the stage) tuple per stage.
+    """
+    pdf_file_name = os.path.splitext(os.path.basename(pdf_file_path))[0]
+    input_data = get_input_data()
+    timings = []
+
+    def run(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append((stage, time.perf_counter() - start, peak_rss_mb()))
+        return result
+
+    pdf_data = run('read_pdf', read_pdf, pdf_file_path, workers)
+    truss_dictionary = run('compartmentalize_pdf', compartmentalize_pdf, regex_dict, pdf_data)
+    workbook = run('create_workbook', create_workbook, pdf_file_name, truss_dictionary)
+    run('unpack_and_store_values', unpack_and_store_values, workbook, truss_dictionary)
+    run('assess', assess, pdf_file_name, input_data, workbook, truss_dictionary)
+    run('save_workbook', save_workbook, workbook, pdf_file_path + '.xlsx')
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time every analysis stage on synthetic shop drawings.')
+    parser.add_argument('--pages', type=int, nargs='+', default=PAGE_COUNTS, help='Page counts to run')
+    parser.add_argument('--workers', type=int, default=1, help='PDF read worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for reproducible documents')
+    args = parser.parse_args()
+
+    # Every run starts from a clean interpreter so peak memory is not carried over
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        for page_count in args.pages:
+            pdf_file_path = write_synthetic_pdf(os.path.join(directory, f'synthetic_{page_count}.pdf'),
+                                                page_count, seed=args.seed)
+            with context.Pool(1) as pool:
+                timings = pool.apply(time_stages, (pdf_file_path, args.workers))
+
+            total = sum(seconds for _, seconds, _ in timings)
+            print(f"\n{page_count} pages, {os.path.getsize(pdf_file_path) / 1024:,.0f} KB")
+            print(f"{'stage':26}{'seconds':>10}{'pages/s':>12}{'peak MB':>10}")
+            for stage, seconds, peak in timings:
+                print(f"{stage:26}{seconds:10.3f}{page_count / seconds:12,.0f}{peak:10.1f}")
+            print(f"{'total':26}{total:10.3f}{page_count / total:12,.0f}{timings[-1][2]:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import tempfile
+import time
+
+from pattern import regex_dict
+from pdf_reader import iter_pdf, TEXT_BACKENDS, PYPDF2_BACKEND
+from storage_compartment import compartmentalize_pdf
+from metrics import TEXT_BACKEND_FALLBACKS
+from benchmarks.sample_pages import build_document
+from benchmarks.synthetic_pdf import write_pdf
+
+# SCRIPT TO CHECK AND TIME THE TEXT EXTRACTION BACKENDS AGAINST PYPDF2
+# Writes synthetic submittals and extracts every page with each backend. The text of
+# every page, and so the truss records, must be the same as PyPDF2's. Run from the
+# repository root:
+# python -m benchmarks.bench_text_backend --pages 500 2000
+
+
+def read_pages(pdf_file_path, text_backend, repeat):
+    """Returns the text of every page and the best time in seconds of extracting them"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = list(iter_pdf(pdf_file_path, text_backend=text_backend))
+        best = min(best, time.perf_counter() - start)
+    return pages, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time the PDF text extraction backends.')
+    parser.add_argument('--pages', type=int, nargs='+', default=[500, 2000], help='Synthetic document sizes')
+    parser.add_argument('--seeds', type=int, default=2, help='Documents checked per size')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions, best is kept')
+    parser.add_argument('--uncompressed', action='store_true', help='Write the content streams without Flate')
+    args = parser.parse_args()
+
+    backends = [name for name in TEXT_BACKENDS if name != PYPDF2_BACKEND]
+    print(f"{'backend':>8}{'pages':>7}{'seed':>6}{'trusses':>9}{'fallbacks':>11}{'pypdf2 (s)':>12}"
+          f"{'backend (s)':>13}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for page_count in args.pages:
+            for seed in range(args.seeds):
+                pdf_file_path = write_pdf(os.path.join(directory, f'backend_{page_count}_{seed}.pdf'),
+                                          build_document(page_count, seed), compress=not args.uncompressed)
+                reference, reference_seconds = read_pages(pdf_file_path, PYPDF2_BACKEND, args.repeat)
+                records = compartmentalize_pdf(regex_dict, reference)
+                for backend in backends:
+                    TEXT_BACKEND_FALLBACKS.values.clear()
+                    pages, seconds = read_pages(pdf_file_path, backend, args.repeat)
+                    different = [number + 1 for number, (a, b) in enumerate(zip(reference, pages)) if a != b]
+                    assert not different, f"{backend} text differs on pages {different[:10]}, {page_count} seed {seed}"
+                    fallbacks = TEXT_BACKEND_FALLBACKS.values.get((backend,), 0) // args.repeat
+                    print(f"{backend:>8}{page_count:7}{seed:6}{len(records):9}{fallbacks:11}{reference_seconds:12.2f}"
+                          f"{seconds:13.2f}{reference_seconds / seconds:9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+from pattern import regex_dict
+from storage_compartment import iter_truss_records
+from truss_record import TrussRecord, FIELDS, TEXT_FIELDS, parse_number
+from benchmarks.sample_pages import build_document
+
+# SCRIPT TO MEASURE TYPED TRUSS RECORDS AGAINST POSITIONAL STRING LISTS
+# Holds the same truss values both ways, as the list of extracted strings per truss the
+# pipeline used to keep and as TrussRecord objects, then reports their memory and the
+# downstream string to number work. Run from the repository root:
+# python -m benchmarks.bench_truss_records --records 50000
+
+
+# Distinct truss designs parsed from synthetic pages, repeated up to the record count
+SAMPLE_PAGES = 2000
+
+
+def extracted_text(value):
+    """A new string holding the text a value was extracted from, as extraction produces"""
+    return value.encode().decode() if isinstance(value, str) else str(value)
+
+
+def sample_records(count):
+    """Returns count truss records parsed from synthetic pages"""
+    pages = build_document(SAMPLE_PAGES)
+    records = [record for _, record in iter_truss_records(regex_dict, pages)]
+    while len(records) < count:
+        records += records
+    return records[:count]
+
+
+def as_string_lists(records):
+    """Positional string lists, as the truss dictionary used to hold them"""
+    truss_dictionary = {}
+    for index, record in enumerate(records):
+        label = f'{record.label}-{index}'
+        truss_dictionary[label] = [label] + [extracted_text(value) for value in record.cells()[1:]]
+    return truss_dictionary
+
+
+def as_truss_records(records):
+    """TrussRecord objects, each value parsed once from its extracted string"""
+    truss_dictionary = {}
+    for index, source in enumerate(records):
+        record = TrussRecord(f'{source.label}-{index}')
+        for field, value in zip(FIELDS[1:], source.cells()[1:]):
+            record.set_text(field, extracted_text(value))
+        truss_dictionary[record.label] = record
+    return truss_dictionary
+
+
+def measure_memory(build, records):
+    """Returns the truss dictionary built and the bytes it holds"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    truss_dictionary = build(records)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return truss_dictionary, after - before
+
+
+def parse_strings(truss_dictionary):
+    """The downstream work string lists need: every value parsed for the sheet and the checks"""
+    numeric = [index for index, field in enumerate(FIELDS) if field not in TEXT_FIELDS]
+    for values in truss_dictionary.values():
+        for index in numeric:
+            parse_number(values[index])
+
+
+def read_records(truss_dictionary):
+    """The downstream work records need: reading the already parsed values"""
+    for record in truss_dictionary.values():
+        record.cells()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure typed truss records against string lists.')
+    parser.add_argument('--records', type=int, default=50000, help='Number of truss records')
+    args = parser.parse_args()
+
+    records = sample_records(args.records)
+    print(f"{'':16}{'memory (MB)':>14}{'bytes/truss':>14}{'downstream (s)':>16}")
+    for name, build, downstream in (('string lists', as_string_lists, parse_strings),
+                                    ('TrussRecord', as_truss_records, read_records)):
+        truss_dictionary, size = measure_memory(build, records)
+        start = time.perf_counter()
+        downstream(truss_dictionary)
+        elapsed = time.perf_counter() - start
+        print(f"{name:16}{size / 1024 / 1024:14.1f}{size / len(truss_dictionary):14.0f}{elapsed:16.3f}")
+        del truss_dictionary
+
+
+if __name__ == '__main__':
+    main()
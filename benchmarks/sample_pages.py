@@ -0,0 +1,154 @@
+import random
+
+# SCRIPT TO BUILD SYNTHETIC SHOP DRAWING PAGE TEXT
+# Page text follows the layout PyPDF2 produces for truss design pages so that every
+# pattern in pattern.regex_dict has something realistic to match against.
+
+WIND_STANDARDS = ['ASCE 7-16', 'ASCE 7-22', 'ASCE 7-10']
+BUILDING_CODES = ['IRC2018', 'IRC2021', 'IBC2021']
+RISK_CATEGORIES = ['II', 'II', 'II', 'III']
+DEFLECTIONS = ['>999', '>999', '999', '720', 'n/r', '****']
+
+
+def member_force_lines(rng, count):
+    """Returns filler lines resembling the member force tables on a design page."""
+    lines = []
+    for _ in range(count):
+        joints = ', '.join(
+            f'{j}-{j + 1}=-{rng.randint(100, 3000)}/{rng.randint(0, 900)}'
+            for j in range(1, rng.randint(4, 9))
+        )
+        lines.append(f'TOP CHORD {joints}')
+    return lines
+
+
+def truss_design_page(label, rng, roof=True, drag_load=None, warning=False):
+    """
+    Builds the text of the first page of a truss design.
+
+    Parameters:
+    - label (str): The truss label, e.g. 'T01'.
+    - rng (random.Random): Random source for the numeric values.
+    - roof (bool): Roof trusses carry a slope, floor trusses do not.
+    - drag_load (int): Drag load printed on the page, or None for no drag load.
+    - warning (bool): Whether to print the required bearing warning.
+
+    Returns:
+    str: The page text.
+    """
+    tcll, tcdl = (rng.choice([20.0, 16.0]), 10.0) if roof else (40.0, 10.0)
+    bcll, bcdl = (0.0, 10.0) if roof else (0.0, 5.0)
+    lines = [
+        'Job',
+        f'24-{rng.randint(1000, 1999)}',
+        'Truss',
+        f'{label}Truss Type',
+        'Common' if roof else 'Floor',
+        'Qty',
+        str(rng.randint(1, 12)),
+        'Ply',
+        '1',
+    ]
+    if roof:
+        lines.append(f'{rng.choice([4, 6, 8]) / 1:.2f} 12')
+    lines += [
+        'LOADING (psf)',
+        'TCLL',
+        'TCDL',
+        'BCLL',
+        f'BCDL{tcll}',
+        f'{tcdl}',
+        f'{bcll}',
+        f'{bcdl}',
+        'SPACING-',
+        f'Code{rng.choice([2, 2, 2, 1])}-0-0',
+        f'Plate Grip DOL 1.15 {rng.choice(BUILDING_CODES)}/TPI2014',
+        f'CSI TC BC WB {rng.random():.2f}',
+        f'{rng.random():.2f}',
+        f'{rng.random():.2f}DEFL',
+        'Vert(LL) in (loc) l/defl',
+        rng.choice(DEFLECTIONS),
+        rng.choice(DEFLECTIONS),
+        'L/d',
+        '360' if roof else '480',
+        '240' if roof else '360',
+    ]
+    lines += member_force_lines(rng, rng.randint(6, 14))
+    lines += [
+        'NOTES-',
+        f'1) Wind: {rng.choice(WIND_STANDARDS)}; Vult={rng.choice([110, 115, 120])}mph (3-second gust) Risk Cat.',
+        f'{rng.choice(RISK_CATEGORIES)}; Exp B; Enclosed',
+    ]
+    if not roof:
+        lines.append('2) Unbalanced floor live loads have been considered for this design.')
+    if drag_load is not None:
+        lines.append(f'3) This truss is designed for a total drag load of {drag_load} lb.')
+    if warning:
+        lines.append('WARNING: Required bearing size at joint(s) 2 greater than input bearing size.')
+    lines += ['Page 1']
+    return '\n'.join(lines)
+
+
+def continuation_page(label, rng, drag_load=None):
+    """Builds the text of the 'Page 2' continuation of a truss design."""
+    lines = ['Job', 'Truss', f'{label}Truss Type', 'NOTES- (continued)']
+    lines += member_force_lines(rng, rng.randint(2, 6))
+    if drag_load is not None:
+        lines.append(f'9) This truss is designed for a total drag load of {drag_load} lb.')
+    lines += ['Page 2']
+    return '\n'.join(lines)
+
+
+def placement_diagram_page(labels):
+    """Builds the text of a placement diagram page listing the given labels."""
+    lines = ['PLACEMENT DIAGRAM', 'Page 1']
+    lines += [f'{label}Truss Type' for label in labels]
+    return '\n'.join(lines)
+
+
+def general_notes_page(rng, page_number=1):
+    """Builds the text of a general notes or detail sheet, which never holds a truss design."""
+    lines = ['GENERAL NOTES', 'Job', '24-1855', 'Truss bracing and handling per BCSI']
+    lines += member_force_lines(rng, rng.randint(2, 8))
+    lines += [f'Page {page_number}']
+    return '\n'.join(lines)
+
+
+def build_document(page_count, seed=0):
+    """
+    Builds the page texts of a synthetic shop drawing submittal.
+
+    Roughly one page in four is a continuation page and the package opens with a
+    placement diagram, as real submittals do.
+
+    Parameters:
+    - page_count (int): The number of pages to produce.
+    - seed (int): Seed for the random source so documents are reproducible.
+
+    Returns:
+    list: A list where each element is a string containing the text of a page.
+    """
+    rng = random.Random(seed)
+    pages = []
+    truss_number = 1
+    while len(pages) < page_count:
+        if not pages:
+            pages.append(placement_diagram_page([f'T{n:02d}' for n in range(1, 25)]))
+            continue
+
+        label = f'{rng.choice("TFAG")}{truss_number:02d}'
+        roof = not label.startswith('F')
+        drag_load = rng.choice([None, None, None, rng.randint(500, 4000)])
+        on_next_page = drag_load is not None and rng.random() < 0.5
+        pages.append(truss_design_page(
+            label,
+            rng,
+            roof=roof,
+            drag_load=None if on_next_page else drag_load,
+            warning=rng.random() < 0.1,
+        ))
+        if len(pages) < page_count and (on_next_page or rng.random() < 0.25):
+            pages.append(continuation_page(label, rng, drag_load if on_next_page else None))
+        truss_number += 1
+
+    return pages
@@ -0,0 +1,152 @@
+import argparse
+import zlib
+
+from benchmarks.sample_pages import build_document
+
+# SCRIPT TO WRITE SYNTHETIC TRUSS SHOP DRAWING PDFS
+# Writes the pages from sample_pages.build_document as a real PDF, one text line per
+# text-show operator, so PyPDF2 reads back the same newline separated text.
+# Run from the repository root: python -m benchmarks.synthetic_pdf out.pdf --pages 1000
+
+PAGE_WIDTH = 792
+PAGE_HEIGHT = 612
+LINE_HEIGHT = 9
+
+
+def escape_pdf_string(text):
+    """Escapes a line of text for use inside a PDF literal string."""
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def page_content_stream(page_text):
+    """
+    Builds the content stream of one page.
+
+    Every line of the page text is shown with its own Tj operator on a new text line,
+    with a few drawing operators around it as on a real truss profile page.
+    """
+    operators = ['0.5 w', '36 36 720 540 re S', '36 300 m 756 300 l S', 'BT', '/F1 7 Tf', f'{LINE_HEIGHT} TL']
+    operators.append(f'40 {PAGE_HEIGHT - 40} Td')
+    for line in page_text.split('\n'):
+        operators.append(f'({escape_pdf_string(line)}) Tj T*')
+    operators.append('ET')
+    return '\n'.join(operators).encode('latin-1', 'replace')
+
+
+def to_unicode_cmap():
+    """
+    A ToUnicode CMap mapping every printable ASCII code to itself, one bfchar entry
+    per code as the subset fonts of drawing software write them.
+    """
+    entries = [f'<{code:02X}> <{code:04X}>' for code in range(32, 127)]
+    blocks = []
+    # A bfchar block holds at most 100 entries
+    for start in range(0, len(entries), 100):
+        block = entries[start:start + 100]
+        blocks.append(f'{len(block)} beginbfchar\n' + '\n'.join(block) + '\nendbfchar')
+    return '\n'.join([
+        '/CIDInit /ProcSet findresource begin', '12 dict begin', 'begincmap',
+        '/CMapName /Adobe-Identity-UCS def', '/CMapType 2 def',
+        '1 begincodespacerange', '<00> <FF>', 'endcodespacerange',
+        *blocks,
+        'endcmap', 'CMapName currentdict /CMap defineresource pop', 'end', 'end',
+    ]).encode('ascii')
+
+
+def stream_object(data, compress, entries=''):
+    """A stream object with the given extra dictionary entries, Flate compressed or not"""
+    if compress:
+        data = zlib.compress(data)
+        entries += ' /Filter /FlateDecode'
+    return f'<< /Length {len(data)}{entries} >>'.encode('ascii') + b'\nstream\n' + data + b'\nendstream'
+
+
+def write_pdf(pdf_file_path, pages, compress=True, to_unicode=False, form_xobjects=False):
+    """
+    Writes page texts to a PDF file.
+
+    Parameters:
+    - pdf_file_path (str): The full path of the PDF file to write.
+    - pages (list): The text of each page.
+    - compress (bool): Whether to Flate compress the page content streams.
+    - to_unicode (bool): Whether the shared font has a ToUnicode CMap, which PyPDF2
+      parses for every page it extracts.
+    - form_xobjects (bool): Whether the text of each page is drawn from its own form
+      XObject, so every page has the same content stream, 'q /Fm0 Do Q', as stamped
+      or merged drawings do.
+
+    Returns:
+    str: The path of the written file.
+    """
+    # Object 1 is the catalog, 2 the page tree, 3 the shared font, then a page and
+    # content stream pair per page, the ToUnicode CMap of the font and the form
+    # XObject of each page
+    objects = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    }
+    if to_unicode:
+        cmap_obj = 4 + len(pages) * 2
+        cmap = to_unicode_cmap()
+        objects[3] = objects[3][:-2] + f'/ToUnicode {cmap_obj} 0 R >>'.encode('ascii')
+        objects[cmap_obj] = f'<< /Length {len(cmap)} >>\nstream\n'.encode('ascii') + cmap + b'\nendstream'
+
+    first_form_obj = 4 + len(pages) * 2 + (1 if to_unicode else 0)
+
+    kids = []
+    for index, page_text in enumerate(pages):
+        page_obj = 4 + index * 2
+        content_obj = page_obj + 1
+        kids.append(f'{page_obj} 0 R')
+        resources = '/Font << /F1 3 0 R >>'
+        stream = page_content_stream(page_text)
+        if form_xobjects:
+            form_obj = first_form_obj + index
+            objects[form_obj] = stream_object(
+                stream, compress, f' /Type /XObject /Subtype /Form /BBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                                  f'/Resources << {resources} >>')
+            resources += f' /XObject << /Fm0 {form_obj} 0 R >>'
+            stream = b'q /Fm0 Do Q'
+        objects[page_obj] = (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << {resources} >> /Contents {content_obj} 0 R >>'
+        ).encode('ascii')
+        objects[content_obj] = stream_object(stream, compress)
+    objects[2] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(pages)} >>'.encode('ascii')
+
+    with open(pdf_file_path, 'wb') as pdf_export:
+        pdf_export.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = pdf_export.tell()
+            pdf_export.write(f'{number} 0 obj\n'.encode('ascii') + objects[number] + b'\nendobj\n')
+
+        xref_offset = pdf_export.tell()
+        pdf_export.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('ascii'))
+        for number in sorted(objects):
+            pdf_export.write(f'{offsets[number]:010d} 00000 n \n'.encode('ascii'))
+        pdf_export.write(
+            f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii')
+        )
+
+    return pdf_file_path
+
+
+def write_synthetic_pdf(pdf_file_path, page_count, seed=0, compress=True):
+    """Writes a synthetic shop drawing submittal with the given number of pages."""
+    return write_pdf(pdf_file_path, build_document(page_count, seed), compress=compress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic truss shop drawing PDF.')
+    parser.add_argument('output', help='Path of the PDF to write')
+    parser.add_argument('--pages', type=int, default=100, help='Number of pages')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for reproducible documents')
+    args = parser.parse_args()
+
+    write_synthetic_pdf(args.output, args.pages, seed=args.seed)
+    print(f"Wrote {args.pages} pages to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
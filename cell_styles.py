@@ -0,0 +1,62 @@
+from copy import copy
+from openpyxl.styles import NamedStyle, Alignment, Font, Border, Side, PatternFill
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+# SCRIPT FOR THE SHARED CELL STYLES OF THE RESULTS WORKBOOK
+# Every styled cell references one of these named styles instead of carrying its own
+# Font, PatternFill, Alignment and Border objects.
+
+HEADER_STYLE = 'Truss Header'
+UNIT_STYLE = 'Truss Unit'
+LABEL_STYLE = 'Truss Label'
+VALUE_STYLE = 'Truss Value'
+FAIL_STYLE = 'Truss Fail'
+
+# Passing cells look like any other value cell
+PASS_STYLE = VALUE_STYLE
+
+THIN_SIDE = Side(border_style='thin', color='000000')
+CENTER = Alignment(horizontal='center', vertical='center')
+FAIL_COLOR = '00FFCC99'
+
+STYLE_DEFINITIONS = {
+    HEADER_STYLE: {
+        'font': Font(bold=True),
+        'alignment': Alignment(horizontal='center', vertical='center', wrap_text=True),
+    },
+    UNIT_STYLE: {
+        'font': Font(bold=True),
+        'alignment': CENTER,
+        'border': Border(bottom=THIN_SIDE),
+    },
+    LABEL_STYLE: {
+        'font': copy(DEFAULT_FONT),
+        'alignment': CENTER,
+        'border': Border(right=THIN_SIDE),
+    },
+    VALUE_STYLE: {
+        'font': copy(DEFAULT_FONT),
+        'alignment': CENTER,
+    },
+    FAIL_STYLE: {
+        'font': Font(color='00FF0000'),
+        'fill': PatternFill(start_color=FAIL_COLOR, end_color=FAIL_COLOR, fill_type='solid'),
+        'alignment': CENTER,
+    },
+}
+
+
+def register_styles(wb):
+    """
+    Adds the shared named styles to a workbook, skipping any it already has.
+
+    Parameters:
+    - wb (openpyxl.Workbook): The results workbook.
+
+    Returns:
+    openpyxl.Workbook: The same workbook, so the call can be chained.
+    """
+    for name, attributes in STYLE_DEFINITIONS.items():
+        if name not in wb.named_styles:
+            wb.add_named_style(NamedStyle(name=name, **attributes))
+    return wb
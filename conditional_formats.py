@@ -0,0 +1,150 @@
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill
+from cell_styles import register_styles, HEADER_STYLE, LABEL_STYLE, VALUE_STYLE, FAIL_COLOR
+from validation_rules import VALIDATION_RULES, NA_DEFLECTIONS
+
+# SCRIPT FOR THE CONDITIONAL FORMATTING OUTPUT MODE OF THE RESULTS WORKBOOK
+# Instead of painting every failing cell, each row of VALIDATION_RULES becomes one
+# Excel conditional formatting rule over its columns, reading its limits from a
+# hidden criteria sheet. Excel evaluates pass/fail itself, so the cost of the workbook
+# does not grow with the checks, and editing a criterion updates the highlights.
+# The formulas follow validation_rules.evaluate_rule: empty cells count as zero,
+# rows missing a required number are skipped, and the slope in column F picks the
+# steep roof, shallow roof or floor limit.
+
+# Ways failing cells are marked: painted with the fail style by data_checker, or
+# left to Excel conditional formatting
+FILL_MODE = 'fill'
+CONDITIONAL_MODE = 'conditional'
+VALIDATION_MODES = (FILL_MODE, CONDITIONAL_MODE)
+
+CRITERIA_SHEET = 'Criteria'
+
+# Same look as cell_styles.FAIL_STYLE, conditional formats take differential styles
+FAIL_FONT = Font(color='00FF0000')
+FAIL_FILL = PatternFill(start_color=FAIL_COLOR, end_color=FAIL_COLOR, fill_type='solid')
+
+EXCEL_COMPARISONS = {
+    '>=': '>=',
+    '<=': '<=',
+    '<': '<',
+    '==': '=',
+    '!=': '<>',
+}
+
+
+def excel_string(value):
+    """A string literal for an Excel formula"""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def write_criteria_sheet(wb, input_data):
+    """
+    Adds the hidden sheet holding the design criteria the formatting rules read.
+
+    Returns:
+    dict: The input_data keys mapped to the absolute reference of their value cell.
+    """
+    ws = register_styles(wb).create_sheet(CRITERIA_SHEET)
+    ws.sheet_state = 'hidden'
+    ws['A1'], ws['B1'] = 'CRITERION', 'VALUE'
+    ws['A1'].style = ws['B1'].style = HEADER_STYLE
+    ws.column_dimensions['A'].width = 45
+    ws.column_dimensions['B'].width = 20
+
+    references = {}
+    for row, (key, value) in enumerate(input_data.items(), start=2):
+        ws.cell(row=row, column=1, value=key).style = LABEL_STYLE
+        ws.cell(row=row, column=2, value=value).style = VALUE_STYLE
+        references[key] = f"'{CRITERIA_SHEET}'!$B${row}"
+    return references
+
+
+def criterion_formula(criterion, references, slope):
+    """
+    The limit of a rule as a formula, picked by row category like criterion_by_category.
+
+    Parameters:
+    - criterion: The 'criterion' of a validation rule.
+    - references (dict): Criteria references from write_criteria_sheet.
+    - slope (str): The slope cell of the row, e.g. '$F4'.
+    """
+    if isinstance(criterion, dict):
+        steep = references[criterion.get('steep') or criterion['roof']]
+        shallow = references[criterion.get('shallow') or criterion['roof']]
+        floor = references[criterion['floor']]
+        roof = steep if steep == shallow else f'IF(N({slope})>=4,{steep},{shallow})'
+        return roof if roof == floor else f'IF(N({slope})<>0,{roof},{floor})'
+    if isinstance(criterion, str):
+        return references.get(criterion, excel_string(criterion))
+    return str(criterion)
+
+
+def failure_formula(rule, references, first_row):
+    """
+    A formula that is TRUE where a rule fails, written for the first data row.
+
+    Parameters:
+    - rule (dict): A row of VALIDATION_RULES.
+    - references (dict): Criteria references from write_criteria_sheet.
+    - first_row (int): The first data row, references are relative to it.
+
+    Returns:
+    str: The formula, without the leading '='.
+    """
+    def cell(column):
+        return f'${column}{first_row}'
+
+    def numeric(column):
+        # NumericColumn treats empty cells as zero
+        return f'OR(ISNUMBER({cell(column)}),ISBLANK({cell(column)}))'
+
+    slope = cell('F')
+    limit = criterion_formula(rule['criterion'], references, slope)
+    ready = [numeric(column) for column in rule['requires']]
+    if rule.get('roof_only'):
+        ready.append(f'N({slope})<>0')
+
+    if 'text' in rule:
+        matches = f'EXACT({cell(rule["text"])}&"",{limit}&"")'
+        failed = f'NOT({matches})' if rule['compare'] == '==' else matches
+    else:
+        measured = '+'.join(f'N({cell(column)})' for column in rule['values'])
+        compared = f'NOT({measured}{EXCEL_COMPARISONS[rule["compare"]]}{limit})'
+        # Values that are also required numbers are already checked by ready
+        parsed = [numeric(column) for column in rule['values'] if column not in rule['requires']]
+        failed = f'AND({",".join(parsed + [compared])})' if parsed else compared
+        if rule.get('na_fails'):
+            reported = f'LOWER({cell(rule["values"][0])}&"")'
+            not_reported = ','.join(f'{reported}={excel_string(value)}' for value in NA_DEFLECTIONS)
+            failed = f'OR({not_reported},{failed})'
+
+    return f'AND({",".join(ready + [failed])})' if ready else failed
+
+
+def add_validation_formats(wb, input_data, row_count, first_row=4, rules=VALIDATION_RULES):
+    """
+    Marks failing cells of the results sheet with Excel conditional formatting.
+
+    Parameters:
+    - wb (openpyxl.Workbook): The results workbook, its active sheet holds the trusses.
+    - input_data (dict): The design criteria from user_input.get_input_data, written
+      to the hidden criteria sheet.
+    - row_count (int): The number of truss rows.
+    - first_row (int): The first truss row of the results sheet.
+    - rules (list): The rule table to translate.
+
+    Returns:
+    openpyxl.Workbook: The same workbook.
+    """
+    ws = wb.active
+    references = write_criteria_sheet(wb, input_data)
+    if row_count == 0:
+        return wb
+
+    last_row = first_row + row_count - 1
+    for rule in rules:
+        cells = ' '.join(f'{column}{first_row}:{column}{last_row}' for column in rule['columns'])
+        formula = failure_formula(rule, references, first_row)
+        ws.conditional_formatting.add(cells, FormulaRule(formula=[formula], font=FAIL_FONT, fill=FAIL_FILL))
+    return wb
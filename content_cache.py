@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+from truss_record import TrussRecord
+
+# SCRIPT FOR THE ON-DISK CACHE OF EXTRACTED PAGE TEXT AND PARSED TRUSS RECORDS
+# Entries are content addressed: page text is keyed by a hash of the page content,
+# truss records by a hash of the whole file and the patterns used to parse it.
+
+CACHE_FOLDER = 'cache'
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Part of every key, bump it whenever the extraction or parsing output changes
+CACHE_VERSION = '6'
+
+
+def evict_least_recently_used(directory, max_bytes, keep=()):
+    """
+    Deletes the least recently used files in a directory tree until it fits a size cap.
+
+    Recency is the file modification time, which cache hits refresh.
+
+    Parameters:
+    - directory (str): The directory to bound.
+    - max_bytes (int): The maximum total size of the files in the directory.
+    - keep (iterable): Paths that must never be deleted, e.g. a file in use, or
+      directories whose files must never be deleted.
+
+    Returns:
+    int: The number of files deleted.
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    keep_dirs = tuple(path + os.sep for path in keep)
+    entries = []
+    total_bytes = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        if os.path.abspath(path) in keep or os.path.abspath(path).startswith(keep_dirs):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        deleted += 1
+
+    return deleted
+
+
+def file_hash(file_path):
+    """Returns the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ContentCache:
+    def __init__(self, cache_dir=CACHE_FOLDER, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def entry_path(self, kind, key):
+        """Path of a cache entry, fanned out by key prefix to keep directories small"""
+        return os.path.join(self.cache_dir, kind, key[:2], key)
+
+    def read_entry(self, kind, key):
+        """Read an entry and mark it as recently used, or return None on a miss"""
+        path = self.entry_path(kind, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as entry:
+                data = entry.read()
+            os.utime(path)
+            return data
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+
+    def write_entry(self, kind, key, data):
+        """Write an entry atomically so concurrent readers never see a partial file"""
+        path = self.entry_path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as entry:
+                entry.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing cache entry {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def page_key(self, content_hash, variant=None):
+        """
+        Key of a page's extracted text from the hash of its content, and the variant of
+        the extraction, e.g. a text backend other than PyPDF2, when there is one
+        """
+        content = content_hash if variant is None else f'{content_hash}:{variant}'
+        return hashlib.sha256(f'{CACHE_VERSION}:{content}'.encode()).hexdigest()
+
+    def records_key(self, pdf_file_hash, regex_dict, variant=None):
+        """Key of a document's truss records from its file hash, the patterns used and the extraction variant"""
+        patterns = '\n'.join(f'{name}={regex_dict[name].pattern}' for name in sorted(regex_dict))
+        content = pdf_file_hash if variant is None else f'{pdf_file_hash}:{variant}'
+        return hashlib.sha256(f'{CACHE_VERSION}:{content}:{patterns}'.encode()).hexdigest()
+
+    def get_page_text(self, content_hash, variant=None):
+        """Cached text of a page, or None"""
+        return self.read_entry('pages', self.page_key(content_hash, variant))
+
+    def put_page_text(self, content_hash, text, variant=None):
+        """Store the extracted text of a page"""
+        self.write_entry('pages', self.page_key(content_hash, variant), text)
+
+    def get_records(self, records_key):
+        """Cached truss dictionary of a document and the number of pages it was parsed from, or None"""
+        data = self.read_entry('records', records_key)
+        if data is None:
+            return None
+        data = json.loads(data)
+        truss_dictionary = {label: TrussRecord.from_list(record) for label, record in data['records'].items()}
+        return truss_dictionary, data['page_count']
+
+    def put_records(self, records_key, truss_dictionary, page_count):
+        """Store the truss dictionary of a document, preserving label order, and its page count"""
+        records = {label: record.to_list() for label, record in truss_dictionary.items()}
+        self.write_entry('records', records_key, json.dumps({'page_count': page_count, 'records': records}))
+
+    def evict(self):
+        """Evict least recently used entries until the cache fits its size cap"""
+        return evict_least_recently_used(self.cache_dir, self.max_bytes)
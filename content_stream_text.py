@@ -0,0 +1,477 @@
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from PyPDF2 import _page
+from PyPDF2._cmap import build_char_map, unknown_char_map
+
+# SCRIPT FOR THE LIGHT TEXT EXTRACTION BACKEND
+# PyPDF2's extract_text parses every operator of a page's content stream into PDF
+# objects before it looks at the text. This backend tokenizes the raw stream with a
+# single regular expression and only interprets the operators that show or position
+# text, following the same rules as PyPDF2 3.0 for where it puts newlines and spaces,
+# so the patterns in pattern.py see the same newline separated text.
+#
+# Anything it does not reproduce exactly, such as form XObjects, inline images,
+# right-to-left text or a malformed stream, raises UnsupportedContent and the page is
+# extracted by PyPDF2 instead.
+#
+# A submittal uses the same few fonts on every page, so their character maps, which
+# PyPDF2 rebuilds from the font and its ToUnicode CMap on every page, are built once
+# per document in a FontCache keyed by the font's object reference. PyPDF2's own
+# extract_text uses the same cache while shared_font_maps is active, through the
+# build_char_map of PyPDF2._page, which is replaced below.
+
+# Default space width PyPDF2 passes to build_char_map
+SPACE_WIDTH = 200.0
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Literal strings with one level of nested parentheses, hex strings, dictionary and
+# array brackets, comments, names, and numbers or operators. A byte matching none of
+# them, e.g. a more deeply nested string, is caught by the last alternative.
+CONTENT_TOKEN = re.compile(
+    rb'\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\)|<<|>>|<[0-9A-Fa-f\s]*>|[\[\]]|%[^\r\n]*'
+    rb'|/[^\s/\[\]()<>{}%]*|[^\s/\[\]()<>{}%]+|\S',
+    re.DOTALL,
+)
+NUMBER_START = frozenset(b'0123456789+-.')
+STRING_ESCAPE = re.compile(rb'\\(\r\n|[0-7]{1,3}|.)', re.DOTALL)
+# Escapes PyPDF2 replaces, others keep the escaped character as it is
+ESCAPED_CHARACTERS = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f', b'c': b'\\c'}
+WHITESPACE = b' \t\r\n\f\v\x00'
+
+# Characters PyPDF2 writes in right-to-left order
+RIGHT_TO_LEFT = re.compile('[\u0590-\u08FF\uFB1D-\uFDFF\uFE70-\uFEFF]')
+
+
+class UnsupportedContent(Exception):
+    """The page needs PyPDF2's full extraction"""
+
+
+def unescape_string(token):
+    """The bytes of a literal string token as PyPDF2 reads them"""
+    literal = token[1:-1]
+    if b'\\' not in literal:
+        return literal
+
+    def replace(match):
+        escape = match.group(1)
+        if escape[:1].isdigit():
+            return chr(int(escape, 8)).encode('latin-1') if int(escape, 8) < 256 else chr(int(escape, 8)).encode()
+        if escape in (b'\n', b'\r', b'\r\n'):
+            # A backslash at the end of a line continues the string
+            return b''
+        return ESCAPED_CHARACTERS.get(escape, escape)
+    return STRING_ESCAPE.sub(replace, literal)
+
+
+def parse_operations(content):
+    """
+    Splits a content stream into its operations.
+
+    Yields:
+    tuple: (operator, operands), strings as bytes, names as str with their slash,
+    numbers as float and arrays as lists.
+    """
+    operands = []
+    stack = []
+    for token in CONTENT_TOKEN.findall(content):
+        first = token[0]
+        if first == 40:  # (
+            if token[-1:] != b')' or len(token) < 2:
+                raise UnsupportedContent('unbalanced string')
+            operands.append(unescape_string(token))
+        elif first in NUMBER_START:
+            try:
+                operands.append(float(token))
+            except ValueError:
+                raise UnsupportedContent(f'unexpected token {token[:20]!r}')
+        elif first == 47:  # /
+            if b'#' in token:
+                raise UnsupportedContent('escaped name')
+            operands.append(token.decode('latin-1'))
+        elif first == 91 or token == b'<<':  # [
+            stack.append(operands)
+            operands = []
+        elif first == 93 or token == b'>>':  # ]
+            if not stack:
+                raise UnsupportedContent('unbalanced array')
+            array, operands = operands, stack.pop()
+            operands.append(array)
+        elif first == 60 and token[-1:] == b'>' and len(token) > 1:  # <
+            digits = token[1:-1].translate(None, WHITESPACE)
+            operands.append(bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode()))
+        elif first == 37:  # %
+            continue
+        elif token in (b')', b'{', b'}') or token[:1] in b'(<>':
+            raise UnsupportedContent(f'unexpected token {token[:20]!r}')
+        else:
+            if stack:
+                raise UnsupportedContent('operator inside an array')
+            if token == b'BI':
+                raise UnsupportedContent('inline image')
+            yield token, operands
+            operands = []
+
+
+def page_resources(page):
+    """The resources of a page, inherited from its parents when needed, or None"""
+    node = page
+    try:
+        while '/Resources' not in node:
+            node = node['/Parent'].get_object()
+        return node['/Resources'].get_object()
+    except Exception:
+        return None
+
+
+def build_font_map(name, page):
+    """
+    The character map PyPDF2 builds for a font resource of a page, with the decoding
+    tables of the font in place of the font dictionary, which this backend never reads
+    and which would tie the map to its open PdfReader.
+    """
+    font_type, space_width, encoding, unicode_map, _ = build_char_map(name, SPACE_WIDTH, page)
+    return font_type, space_width, encoding, unicode_map, decoding_tables((encoding, unicode_map))
+
+
+class FontCache:
+    """
+    Character maps of the fonts of one document, from build_font_map, keyed by the
+    (object number, generation) of the font. A cache can be pickled to and from worker
+    processes reading the same document.
+    """
+
+    def __init__(self, char_maps=None):
+        self.char_maps = dict(char_maps or {})
+        # Maps built through this cache, what a worker hands back to share
+        self.built = {}
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+
+    def char_map(self, key, name, page):
+        """The character map of font resource name of the page, built on the first lookup of its key"""
+        char_map = self.char_maps.get(key)
+        if char_map is not None:
+            self.hits += 1
+            return char_map
+        self.misses += 1
+        start = time.perf_counter()
+        char_map = self.char_maps[key] = self.built[key] = build_font_map(name, page)
+        self.build_seconds += time.perf_counter() - start
+        return char_map
+
+    def merge(self, other):
+        """Adopts the maps another cache of the same document built, and adds up its lookups"""
+        self.char_maps.update(other.built)
+        self.built.update(other.built)
+        self.hits += other.hits
+        self.misses += other.misses
+        self.build_seconds += other.build_seconds
+
+    def saved_seconds(self):
+        """Estimated time the hits saved, at the average time of building a map"""
+        return self.hits * self.build_seconds / self.misses if self.misses else 0.0
+
+
+# The FontCache extract_text reads from in each thread, see shared_font_maps
+active_font_cache = threading.local()
+
+
+def cached_build_char_map(font_name, space_width, obj):
+    """
+    Stands in for build_char_map in PyPDF2._page. Fonts that are indirect objects are
+    answered from the active FontCache of the thread, anything else is built as before.
+    The map's last item, the font dictionary, is only passed to extract_text visitors,
+    which this repository does not use.
+    """
+    font_cache = getattr(active_font_cache, 'font_cache', None)
+    if font_cache is not None and space_width == SPACE_WIDTH:
+        try:
+            reference = obj['/Resources']['/Font'].get_object().raw_get(font_name)
+            key = reference.idnum, reference.generation
+        except Exception:
+            key = None
+        if key is not None:
+            return font_cache.char_map(key, font_name, obj)
+    return build_char_map(font_name, space_width, obj)
+
+
+_page.build_char_map = cached_build_char_map
+
+
+@contextmanager
+def shared_font_maps(font_cache):
+    """Lets page.extract_text build the character maps of its fonts through font_cache"""
+    previous = getattr(active_font_cache, 'font_cache', None)
+    active_font_cache.font_cache = font_cache
+    try:
+        yield font_cache
+    finally:
+        active_font_cache.font_cache = previous
+
+
+def font_char_maps(page, resources, font_cache=None):
+    """
+    The character map of every font of the page, as PyPDF2 builds them.
+
+    Parameters:
+    - page (PyPDF2.PageObject): The page.
+    - resources (dict): The resources of the page.
+    - font_cache (FontCache): Optional maps of the document's fonts, so a font shared
+      by every page is only built once. Fonts that are not indirect objects are
+      always built.
+    """
+    maps = {}
+    fonts = resources.get('/Font')
+    if fonts is None:
+        return maps
+    fonts = fonts.get_object()
+    for name in fonts:
+        reference = fonts.raw_get(name)
+        if font_cache is not None and hasattr(reference, 'idnum'):
+            maps[name] = font_cache.char_map((reference.idnum, reference.generation), name, page)
+        else:
+            maps[name] = build_font_map(name, page)
+    return maps
+
+
+def decoding_tables(char_map):
+    """
+    Translation tables of a PyPDF2 character map for str.translate.
+
+    Returns:
+    tuple: The table from byte values to characters, None when the encoding is a
+    codec name, and the table of the ToUnicode map, None when it is empty.
+    """
+    encoding, unicode_map = char_map[0], char_map[1]
+    byte_table = None
+    if not isinstance(encoding, str):
+        byte_table = {}
+        for value in range(256):
+            if value in encoding:
+                byte_table[value] = encoding[value]
+            elif value < 128:
+                byte_table[value] = chr(value)
+            # Other bytes fail to decode in PyPDF2, they are left for the fallback
+    unicode_table = {ord(key): value for key, value in unicode_map.items() if isinstance(key, str) and len(key) == 1}
+    return byte_table, unicode_table or None
+
+
+def decode_string(data, char_map, tables):
+    """Decodes the bytes of a shown string with a font's character map like PyPDF2"""
+    byte_table, unicode_table = tables
+    if byte_table is None:
+        try:
+            text = data.decode(char_map[0], 'surrogatepass')
+        except Exception:
+            text = data.decode('utf-16-be' if char_map[0] == 'charmap' else 'charmap', 'surrogatepass')
+    else:
+        text = data.decode('latin-1')
+        if len(byte_table) < 256 and any(ord(character) not in byte_table for character in text):
+            raise UnsupportedContent('undecodable byte')
+        text = text.translate(byte_table)
+    if unicode_table is not None:
+        text = text.translate(unicode_table)
+    return text
+
+
+def is_right_to_left(text):
+    """True when a string holds characters PyPDF2 reorders as right-to-left text"""
+    if RIGHT_TO_LEFT.search(text):
+        return True
+    if 0 <= _page.CUSTOM_RTL_MAX and _page.CUSTOM_RTL_MIN <= _page.CUSTOM_RTL_MAX:
+        return any(_page.CUSTOM_RTL_MIN <= ord(character) <= _page.CUSTOM_RTL_MAX for character in text)
+    return False
+
+
+def multiply(m, n):
+    return (
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    )
+
+
+class TextState:
+    """The text of a page being extracted and the state PyPDF2 lays it out from"""
+
+    def __init__(self, fonts):
+        # Character maps of the page's fonts by resource name, from font_char_maps
+        self.fonts = fonts
+        self.output = ''
+        self.text = ''
+        self.cm_matrix = IDENTITY
+        self.cm_stack = []
+        self.tm_matrix = list(IDENTITY)
+        self.tm_prev = IDENTITY
+        self.space_width = 500.0
+        self.leading = 0.0
+        self.font_size = 12.0
+        # Encoding, ToUnicode map, font name and decoding tables of the current font
+        self.char_map = ('charmap', {}, 'NotInitialized', None)
+
+    def flush(self):
+        self.output += self.text
+        self.text = ''
+
+    def show(self, data):
+        """Appends a shown string, then lays out the position like any text operator"""
+        if isinstance(data, str):
+            self.text += data
+        else:
+            char_map = self.char_map
+            tables = char_map[3]
+            if tables is None:
+                tables = decoding_tables(char_map)
+            shown = decode_string(data, char_map, tables)
+            if is_right_to_left(shown):
+                raise UnsupportedContent('right-to-left text')
+            self.text += shown
+        self.layout()
+
+    def layout(self):
+        """
+        Starts a new line when the position dropped by most of the font size since the
+        last text operator, or inserts a space after a wide jump along the same line.
+        """
+        m = self.tm_matrix if self.cm_matrix is IDENTITY else multiply(self.tm_matrix, self.cm_matrix)
+        prev = self.tm_prev
+        delta_x = m[4] - prev[4]
+        delta_y = m[5] - prev[5]
+        f = self.font_size * math.sqrt(abs(m[0] * m[3]) + abs(m[1] * m[2]))
+        self.tm_prev = tuple(m)
+
+        if m[3] > 1e-6:
+            across, along, new_line = delta_y, delta_x, delta_y < -0.8 * f
+        elif m[3] < -1e-6:
+            across, along, new_line = delta_y, delta_x, delta_y > 0.8 * f
+        elif m[1] > 0:
+            across, along, new_line = delta_x, delta_y, delta_x > 0.8 * f
+        else:
+            across, along, new_line = delta_x, delta_y, delta_x < -0.8 * f
+
+        # PyPDF2 looks at the last character of output and text, nothing happens on an empty page
+        last = self.text[-1:] or self.output[-1:]
+        if not last:
+            return
+        if new_line:
+            if last != '\n':
+                self.output += self.text + '\n'
+                self.text = ''
+        elif abs(across) < f * 0.3 and abs(along) > self.space_width / 1000.0 * f * 15:
+            if last != ' ':
+                self.text += ' '
+
+    def move(self, tx, ty):
+        tm = self.tm_matrix
+        tm[4] += tx * tm[0] + ty * tm[2]
+        tm[5] += tx * tm[1] + ty * tm[3]
+        self.layout()
+
+    def next_line(self):
+        self.tm_matrix[5] -= self.leading
+        self.layout()
+
+    def set_font(self, operands):
+        self.flush()
+        try:
+            font = self.fonts[operands[0]]
+            self.space_width = font[1]
+            self.char_map = (font[2], font[3], operands[0], font[4])
+        except KeyError:
+            self.space_width = unknown_char_map[1]
+            self.char_map = (unknown_char_map[2], unknown_char_map[3], '???' + operands[0], None)
+        try:
+            self.font_size = float(operands[1])
+        except Exception:
+            pass
+
+
+def stream_page_text(page, font_cache=None):
+    """
+    Extracts the text of a page from its content stream, as page.extract_text() would.
+
+    Parameters:
+    - page (PyPDF2.PageObject): The page to extract.
+    - font_cache (FontCache): Optional character maps of the document's fonts, shared
+      by its pages, see font_char_maps.
+
+    Returns:
+    str: The text of the page.
+
+    Raises:
+    UnsupportedContent: When the page holds content only PyPDF2 extracts correctly.
+    """
+    resources = page_resources(page)
+    if resources is None or '/Contents' not in page:
+        return ''
+    state = TextState(font_char_maps(page, resources, font_cache))
+    contents = page.get_contents()
+    if contents is None:
+        return ''
+
+    for operator, operands in parse_operations(contents.get_data()):
+        if operator == b'Tj':
+            state.show(operands[0])
+        elif operator == b'T*':
+            state.next_line()
+        elif operator == b'Td':
+            state.move(float(operands[0]), float(operands[1]))
+        elif operator == b'TJ':
+            for item in operands[0]:
+                if isinstance(item, bytes):
+                    state.show(item)
+                elif (isinstance(item, float) and abs(item) >= state.space_width and state.text
+                      and state.text[-1] != ' '):
+                    state.show(' ')
+        elif operator == b'TD':
+            state.leading = -float(operands[1])
+            state.move(float(operands[0]), float(operands[1]))
+        elif operator == b'Tm':
+            state.tm_matrix = [float(operands[index]) for index in range(6)]
+            state.layout()
+        elif operator == b"'":
+            state.next_line()
+            state.show(operands[0])
+        elif operator == b'"':
+            state.next_line()
+            state.show(operands[2])
+        elif operator == b'BT':
+            state.tm_matrix = list(IDENTITY)
+            state.flush()
+        elif operator == b'ET':
+            state.flush()
+        elif operator == b'Tf':
+            state.set_font(operands)
+        elif operator == b'TL':
+            state.leading = float(operands[0])
+        elif operator == b'q':
+            state.cm_stack.append((state.cm_matrix, state.char_map, state.font_size, state.space_width, state.leading))
+        elif operator == b'Q':
+            try:
+                (state.cm_matrix, state.char_map, state.font_size, state.space_width,
+                 state.leading) = state.cm_stack.pop()
+            except IndexError:
+                state.cm_matrix = IDENTITY
+        elif operator == b'cm':
+            state.flush()
+            state.cm_matrix = multiply([float(operands[index]) for index in range(6)], state.cm_matrix)
+        elif operator == b'Do':
+            state.flush()
+            if state.output and state.output[-1] != '\n':
+                state.output += '\n'
+            try:
+                subtype = resources['/XObject'][operands[0]]['/Subtype']
+            except Exception:
+                continue
+            if subtype != '/Image':
+                raise UnsupportedContent('form XObject')
+
+    return state.output + state.text
@@ -1,31 +1,429 @@
 import os
 import glob
-from pdf_reader import read_pdf
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf_reader import iter_pdf, cache_variant, DEFAULT_TEXT_BACKEND
+from pdf_source import as_pdf_source
 from storage_compartment import compartmentalize_pdf
-from pattern import regex_dict
-from workbook_creater import create_workbook, unpack_and_store_values
-from data_checker import assess
+from page_index import PageIndex
+from page_scanner import ALL_PATTERNS
+from pattern_profiles import AUTO_DETECT, as_profile, detect_profile, registry_patterns
+from workbook_creater import (create_workbook, unpack_and_store_values, add_conditional_formats, save_workbook,
+                              results_file_path, save_batch_summary, batch_summary_path, create_scenarios_workbook,
+                              write_comparison_sheet, scenarios_file_path)
+from conditional_formats import FILL_MODE, CONDITIONAL_MODE
+from data_checker import assess, check_records, check_scenarios, apply_masks
+from record_writers import write_records, records_file_path
+from validation_rules import FAIL
 from user_input import get_input_data
+from scenarios import sheet_titles, changed_criteria, verdict_flips
+from job_profiler import JobProfile
+from metrics import (STAGE_SECONDS, PAGES_PROCESSED, TRUSSES_FOUND, timed_iteration, record_profile_results,
+                     snapshot_metrics, metric_deltas, merge_metrics)
 
 
-def execute(input_data, pdf_file_path, regex_dict):
-    # Extract the base name of the PDF file without the extension
-    pdf_file_name = os.path.splitext(os.path.basename(pdf_file_path))[0]
-    
-    # Read the PDF
-    pdf_data = read_pdf(pdf_file_path)
-    if pdf_data is None:
-        print(f"Error: The file '{pdf_file_path}' was not found.")
-        return
-    
-    # Compartmentalize the PDF data
-    compartmentalized_data = compartmentalize_pdf(regex_dict, pdf_data)
-    
-    # Create a workbook
-    workbook = create_workbook(pdf_file_name, compartmentalized_data)
+def ignore_progress(stage, done=None, total=None):
+    """Progress callback used when the caller does not track progress"""
+
+
+def load_truss_records(pdf_file_path, regex_dict, read_workers=1, cache=None, progress=None,
+                       text_backend=DEFAULT_TEXT_BACKEND, triage_pages=False):
+    """
+    Extracts and parses the truss records of a PDF, reusing cached work when possible.
+
+    A file already parsed with the same patterns is answered from the record cache,
+    which reports its page and truss counts to progress as a full read would.
+    Otherwise only pages whose content is not in the page text cache are extracted.
+    With regex_dict AUTO_DETECT the pattern profile is picked from the first pages,
+    a PatternProfile or a plain regex dictionary is used as given. Pages are extracted
+    with text_backend, see pdf_reader.iter_pdf, and its records are cached apart.
+    With triage_pages, pages that can never yield a truss are not extracted.
+
+    Raises:
+    PdfReadError: When the file cannot be opened or read as a PDF, so the job or batch
+    file fails rather than reporting a document without trusses.
+    """
+    source = as_pdf_source(pdf_file_path)
+    records_key = None
+    if cache is not None and source.exists():
+        patterns = registry_patterns() if regex_dict is AUTO_DETECT else as_profile(regex_dict).regex_dict
+        records_key = cache.records_key(source.content_hash(), patterns, cache_variant(text_backend))
+        cached = cache.get_records(records_key)
+        if cached is not None:
+            truss_dictionary, page_count = cached
+            if progress is not None:
+                progress('read_pdf', page_count, page_count)
+                progress('compartmentalize_pdf', len(truss_dictionary))
+            return truss_dictionary
+
+    # Read the PDF lazily, pages are parsed as they are extracted and only one page
+    # of lookahead text is held in memory. The records are collected into the truss
+    # dictionary, which grows with the trusses found, before the output stages run.
+    # With triage, pages unable to yield a truss are never extracted. The time spent
+    # reading is split from the parsing time for the stage metrics.
+    reading = {'seconds': 0.0, 'items': 0}
+    start = time.perf_counter()
+    pdf_pages = iter_pdf(source, workers=read_workers, cache=cache, progress=progress, triage_pages=triage_pages,
+                         text_backend=text_backend, raise_errors=True)
+    pdf_data = timed_iteration(pdf_pages, reading)
+    if regex_dict is AUTO_DETECT:
+        profile, pdf_data = detect_profile(pdf_data)
+    else:
+        profile = as_profile(regex_dict)
+    page_index = PageIndex(profile.regex_dict)
+    truss_dictionary = compartmentalize_pdf(profile.regex_dict, pdf_data, progress=progress, page_index=page_index,
+                                            page_extractors=profile.page_extractors,
+                                            continuation_extractors=profile.continuation_extractors)
+    STAGE_SECONDS.observe(reading['seconds'], 'read_pdf')
+    STAGE_SECONDS.observe(time.perf_counter() - start - reading['seconds'], 'compartmentalize_pdf')
+    PAGES_PROCESSED.inc(amount=reading['items'])
+    record_profile_results(profile.name, map(page_index.page_matches, page_index.design_pages()), ALL_PATTERNS)
+
+    if records_key is not None:
+        if truss_dictionary:
+            cache.put_records(records_key, truss_dictionary, reading['items'])
+        cache.evict()
+
+    return truss_dictionary
+
+
+def write_workbook_results(input_data, pdf_file_name, truss_dictionary, output_dir, progress,
+                           validation_mode=FILL_MODE):
+    """
+    Builds, validates and saves the results workbook of a document.
+
+    In CONDITIONAL_MODE the failing cells are not painted, Excel highlights them from
+    conditional formatting rules and the criteria on a hidden sheet.
+
+    Returns:
+    tuple: The validation masks and the path of the workbook.
+    """
+    # Create a workbook, it stays in memory until every stage has run
+    progress('create_workbook', 0, len(truss_dictionary))
+    with STAGE_SECONDS.time('create_workbook'):
+        workbook = create_workbook(pdf_file_name, truss_dictionary)
     
     # Unpack and store values in the workbook
-    unpack_and_store_values(workbook, compartmentalized_data)
+    progress('unpack_and_store_values', 0, len(truss_dictionary))
+    with STAGE_SECONDS.time('unpack_and_store_values'):
+        unpack_and_store_values(workbook, truss_dictionary)
     
     # Run the main data checker function
-    assess(pdf_file_name, input_data)
\ No newline at end of file
+    progress('assess', 0, len(truss_dictionary))
+    with STAGE_SECONDS.time('assess'):
+        if validation_mode == CONDITIONAL_MODE:
+            # The masks are still evaluated for the store and the batch summary
+            add_conditional_formats(workbook, input_data, truss_dictionary)
+            results = check_records(input_data, truss_dictionary)
+        else:
+            results = assess(pdf_file_name, input_data, workbook, truss_dictionary)
+
+    # Write the workbook to disk once
+    progress('save_workbook')
+    with STAGE_SECONDS.time('save_workbook'):
+        output_path = save_workbook(workbook, results_file_path(pdf_file_name, output_dir))
+
+    return results, output_path
+
+
+def write_records_results(input_data, pdf_file_name, truss_dictionary, output_dir, progress, output_format):
+    """
+    Validates the records of a document and writes them as JSON, NDJSON or CSV.
+
+    Machine readable output skips the workbook stages altogether.
+
+    Returns:
+    tuple: The validation masks and the path of the records file.
+    """
+    progress('assess', 0, len(truss_dictionary))
+    with STAGE_SECONDS.time('assess'):
+        results = check_records(input_data, truss_dictionary)
+
+    progress('write_records')
+    with STAGE_SECONDS.time('write_records'):
+        output_path = write_records(truss_dictionary, results, output_format,
+                                    records_file_path(pdf_file_name, output_format, output_dir))
+
+    return results, output_path
+
+
+def run_analysis(input_data, pdf_file_path, regex_dict, read_workers=1, cache=None, output_dir=None, progress=None,
+                 output_format='xlsx', store=None, project=None, profiling=False, validation_mode=FILL_MODE,
+                 text_backend=DEFAULT_TEXT_BACKEND, triage_pages=False):
+    """
+    Runs the full analysis of one PDF and writes the results workbook or records file.
+
+    Parameters:
+    - input_data (dict): The design criteria from user_input.get_input_data.
+    - pdf_file_path (str or PdfSource): The full path to the PDF file to analyse, or
+      an upload ingested in memory or a temporary file.
+    - regex_dict (dict): The dictionary containing regex patterns, a PatternProfile,
+      or AUTO_DETECT to pick the registered profile matching the document.
+    - read_workers (int): Worker processes used for PDF text extraction.
+    - cache (ContentCache): Optional cache of extracted page text and records.
+    - output_dir (str): Directory the output is written to, defaults to the CWD.
+    - progress (callable): Optional callback, called as progress(stage, done, total)
+      as each stage starts and while pages are read.
+    - output_format (str): 'xlsx' for the results workbook, or 'json', 'ndjson' or
+      'csv' for the records and verdicts without building a workbook.
+    - store (ResultsStore): Optional store the records and verdicts are saved to.
+    - project (str): Project the document is saved under in the store.
+    - profiling (bool): Run under cProfile and tracemalloc and save the pstats and a
+      text summary next to the output, even when the analysis fails.
+    - validation_mode (str): FILL_MODE paints the failing cells of the workbook,
+      CONDITIONAL_MODE leaves them to Excel conditional formatting.
+    - text_backend (str): The PDF text extraction backend, see pdf_reader.TEXT_BACKENDS.
+    - triage_pages (bool): Skip the text extraction of pages that can never yield a
+      truss, see pdf_reader.iter_pdf. Off by default, on this repository's benchmarks
+      it does not yet pay for itself.
+
+    Returns:
+    dict: The output file path ('output_path'), the number of pages read ('pages'),
+    the extracted records ('truss_dictionary'), the validation masks ('results') and
+    the pstats and summary paths when profiling ('profile_paths', otherwise None).
+    """
+    progress = progress or ignore_progress
+    pages = {'read': 0}
+
+    def track_pages(stage, done=None, total=None):
+        if stage == 'read_pdf' and total is not None:
+            pages['read'] = total
+        progress(stage, done, total)
+
+    # Extract the base name of the PDF file without the extension
+    source = as_pdf_source(pdf_file_path)
+    pdf_file_name = os.path.splitext(source.name)[0]
+
+    job_profile = JobProfile() if profiling else nullcontext()
+    try:
+        with job_profile:
+            # Read and compartmentalize the PDF data
+            progress('read_pdf')
+            compartmentalized_data = load_truss_records(source, regex_dict, read_workers, cache, track_pages,
+                                                        text_backend, triage_pages)
+            TRUSSES_FOUND.inc(amount=len(compartmentalized_data))
+
+            if output_format == 'xlsx':
+                results, output_path = write_workbook_results(input_data, pdf_file_name, compartmentalized_data,
+                                                              output_dir, progress, validation_mode)
+            else:
+                results, output_path = write_records_results(input_data, pdf_file_name, compartmentalized_data,
+                                                             output_dir, progress, output_format)
+
+            if store is not None:
+                progress('store_results')
+                with STAGE_SECONDS.time('store_results'):
+                    store.save_job(project, source.name, compartmentalized_data, results, input_data)
+    finally:
+        profile_paths = job_profile.save(pdf_file_name, output_dir) if profiling else None
+
+    return {
+        'output_path': output_path,
+        'pages': pages['read'],
+        'truss_dictionary': compartmentalized_data,
+        'results': results,
+        'profile_paths': profile_paths,
+    }
+
+
+def execute(input_data, pdf_file_path, regex_dict, read_workers=1, cache=None, output_dir=None, progress=None,
+            output_format='xlsx', store=None, project=None, profiling=False, validation_mode=FILL_MODE,
+            text_backend=DEFAULT_TEXT_BACKEND, triage_pages=False):
+    """
+    Runs the full analysis of one PDF, see run_analysis for the parameters.
+
+    Returns:
+    str: The path of the results workbook or records file.
+    """
+    return run_analysis(input_data, pdf_file_path, regex_dict, read_workers, cache, output_dir, progress,
+                        output_format, store, project, profiling, validation_mode, text_backend,
+                        triage_pages)['output_path']
+
+
+def execute_scenarios(scenarios, pdf_file_path, regex_dict, read_workers=1, cache=None, output_dir=None,
+                      progress=None, text_backend=DEFAULT_TEXT_BACKEND, triage_pages=False):
+    """
+    Checks one PDF against several criteria sets, reading and parsing it only once.
+
+    Parameters:
+    - scenarios (list): (name, input_data) pairs, see scenarios.scenario_criteria.
+    - pdf_file_path (str or PdfSource): The PDF to analyse, see run_analysis.
+    - regex_dict (dict): The regex patterns, a PatternProfile or AUTO_DETECT.
+    - read_workers (int): Worker processes used for PDF text extraction.
+    - cache (ContentCache): Optional cache of extracted page text and records.
+    - output_dir (str): Directory the workbook is written to, defaults to the CWD.
+    - progress (callable): Optional callback, see run_analysis.
+    - text_backend (str): The PDF text extraction backend, see pdf_reader.TEXT_BACKENDS.
+    - triage_pages (bool): Skip pages that can never yield a truss, see run_analysis.
+
+    Returns:
+    str: The path of the workbook with a sheet per scenario and a comparison sheet.
+    """
+    progress = progress or ignore_progress
+    source = as_pdf_source(pdf_file_path)
+    pdf_file_name = os.path.splitext(source.name)[0]
+
+    progress('read_pdf')
+    truss_dictionary = load_truss_records(source, regex_dict, read_workers, cache, progress, text_backend,
+                                          triage_pages)
+    TRUSSES_FOUND.inc(amount=len(truss_dictionary))
+
+    titles = sheet_titles([name for name, _ in scenarios])
+    progress('create_workbook', 0, len(truss_dictionary))
+    with STAGE_SECONDS.time('create_workbook'):
+        workbook = create_scenarios_workbook(truss_dictionary, titles)
+
+    # Every scenario is evaluated over the same parsed columns, then painted on its sheet
+    progress('assess', 0, len(truss_dictionary))
+    with STAGE_SECONDS.time('assess'):
+        scenario_results = check_scenarios([input_data for _, input_data in scenarios], truss_dictionary)
+        for title, results in zip(titles, scenario_results):
+            apply_masks(workbook[title], results)
+        flips = verdict_flips(list(truss_dictionary), scenario_results)
+        write_comparison_sheet(workbook, titles, scenarios, changed_criteria(scenarios), flips)
+
+    progress('save_workbook')
+    with STAGE_SECONDS.time('save_workbook'):
+        return save_workbook(workbook, scenarios_file_path(pdf_file_name, output_dir))
+
+
+def find_pdf_files(paths):
+    """
+    Expands files and directories into the list of PDF files to analyse.
+
+    Parameters:
+    - paths (list): PDF files and directories holding PDF files.
+
+    Returns:
+    list: The PDF file paths, directories expanded in name order.
+    """
+    pdf_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, '*.pdf')) + glob.glob(os.path.join(path, '*.PDF'))
+            pdf_files.extend(sorted(set(matches)))
+        else:
+            pdf_files.append(path)
+    return pdf_files
+
+
+def source_file_path(pdf_file_path):
+    """The path reported for a file of a batch, an in memory upload is reported by its name"""
+    source = as_pdf_source(pdf_file_path)
+    return source.name if source.temporary or source.path is None else source.path
+
+
+def analyse_batch_file(input_data, pdf_file_path, regex_dict, output_dir, cache=None, output_format='xlsx',
+                       store=None, project=None, profiling=False, validation_mode=FILL_MODE,
+                       text_backend=DEFAULT_TEXT_BACKEND, triage_pages=False):
+    """
+    Process pool worker: analyses one file of a batch and never raises.
+
+    Returns:
+    dict: The outcome of the file, its timing, and its truss and failure counts, with
+    the changes the file made to the metrics of the worker process under 'metrics'.
+    """
+    metrics_before = snapshot_metrics()
+    start = time.perf_counter()
+    summary = {
+        'pdf_file_path': source_file_path(pdf_file_path),
+        'status': 'failed',
+        'output_path': None,
+        'pages': 0,
+        'trusses': 0,
+        'failed_trusses': 0,
+        'failed_cells': 0,
+        'seconds': 0.0,
+        'error': '',
+    }
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        analysis = run_analysis(input_data, pdf_file_path, regex_dict, cache=cache, output_dir=output_dir,
+                                output_format=output_format, store=store, project=project, profiling=profiling,
+                                validation_mode=validation_mode, text_backend=text_backend,
+                                triage_pages=triage_pages)
+        failed_rows = set()
+        for mask in analysis['results'].values():
+            for row, verdict in enumerate(mask):
+                if verdict == FAIL:
+                    failed_rows.add(row)
+                    summary['failed_cells'] += 1
+        summary.update(
+            status='done',
+            output_path=analysis['output_path'],
+            pages=analysis['pages'],
+            trusses=len(analysis['truss_dictionary']),
+            failed_trusses=len(failed_rows),
+        )
+        if not analysis['truss_dictionary']:
+            summary['error'] = 'No truss design pages found'
+    except Exception as e:
+        summary['error'] = str(e)
+
+    summary['seconds'] = time.perf_counter() - start
+    summary['metrics'] = metric_deltas(metrics_before)
+    return summary
+
+
+def execute_batch(input_data, pdf_file_paths, regex_dict, output_dir, concurrency=None, cache=None,
+                  output_dirs=None, progress=None, output_format='xlsx', store=None, project=None, profiling=False,
+                  validation_mode=FILL_MODE, text_backend=DEFAULT_TEXT_BACKEND, triage_pages=False):
+    """
+    Analyses many PDFs across a process pool and writes a consolidated summary.
+
+    A file that fails is recorded in the summary and does not abort the batch.
+
+    Parameters:
+    - input_data (dict): The design criteria from user_input.get_input_data.
+    - pdf_file_paths (list): The PDF files to analyse, as paths or PdfSource uploads.
+    - regex_dict (dict): The dictionary containing regex patterns, a PatternProfile,
+      or AUTO_DETECT to pick the profile of each file from its first pages.
+    - output_dir (str): Directory the summary, and by default every workbook, is written to.
+    - concurrency (int): Maximum number of files analysed at once, None for one per CPU.
+    - cache (ContentCache): Optional cache of extracted page text and records.
+    - output_dirs (list): Optional per-file workbook directories, e.g. when uploads
+      share a file name.
+    - progress (callable): Optional callback, called as progress('batch', files_done, file_count).
+    - output_format (str): Output of every file, see run_analysis. The summary is always a workbook.
+    - store (ResultsStore): Optional store every file's records and verdicts are saved to.
+    - project (str): Project the files are saved under in the store.
+    - profiling (bool): Profile every file, see run_analysis, in the worker analysing it.
+    - validation_mode (str): How failing cells of every workbook are marked, see run_analysis.
+    - text_backend (str): The PDF text extraction backend of every file, see run_analysis.
+    - triage_pages (bool): Skip pages that can never yield a truss in every file, see run_analysis.
+
+    Returns:
+    str: The path of the batch summary workbook.
+    """
+    progress = progress or ignore_progress
+    output_dirs = output_dirs or [output_dir] * len(pdf_file_paths)
+    concurrency = concurrency or os.cpu_count() or 1
+    summaries = [None] * len(pdf_file_paths)
+
+    progress('batch', 0, len(pdf_file_paths))
+    with ProcessPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(analyse_batch_file, input_data, pdf_file_path, regex_dict, file_output_dir, cache,
+                            output_format, store, project, profiling, validation_mode, text_backend,
+                            triage_pages): index
+            for index, (pdf_file_path, file_output_dir) in enumerate(zip(pdf_file_paths, output_dirs))
+        }
+        for files_done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                summaries[index] = future.result()
+            except Exception as e:
+                # The worker process itself died, record the file as failed
+                summaries[index] = {'pdf_file_path': source_file_path(pdf_file_paths[index]), 'status': 'failed',
+                                    'output_path': None, 'pages': 0, 'trusses': 0, 'failed_trusses': 0,
+                                    'failed_cells': 0, 'seconds': 0.0, 'error': str(e)}
+            summary = summaries[index]
+            # The file ran in a worker process, add what it recorded to the metrics of this one
+            merge_metrics(summary.pop('metrics', {}))
+            print(f"{os.path.basename(summary['pdf_file_path'])}: {summary['status']} "
+                  f"in {summary['seconds']:.1f}s {summary['error']}".rstrip())
+            progress('batch', files_done, len(pdf_file_paths))
+
+    progress('save_workbook')
+    return save_batch_summary(summaries, batch_summary_path(output_dir))
@@ -0,0 +1,97 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# SCRIPT FOR THE OPT-IN PROFILING OF ONE ANALYSIS JOB
+# A job submitted with profiling on runs under cProfile with tracemalloc snapshots
+# taken as it starts and ends. The raw pstats and a text summary of the hotspots and
+# allocations are saved next to the job's results, so a slow document can be examined
+# from the server without reproducing it locally.
+#
+# cProfile only sees the thread that runs the job. Text extraction running in worker
+# processes (PDF_READ_WORKERS > 1) shows up as the wait for their results.
+
+# Functions and allocation sites listed in the text summary
+PROFILE_TOP_N = 40
+
+# Stack frames kept per traced allocation
+TRACEMALLOC_FRAMES = 1
+
+# cProfile and tracemalloc are process wide, profiled jobs of one process run one at a time
+profile_lock = threading.Lock()
+
+
+def profile_file_path(pdf_file_name, extension, directory_path=None):
+    """Path of a profile file of a PDF, next to its results"""
+    if directory_path is None:
+        directory_path = os.getcwd()
+    return os.path.join(directory_path, f'Truss Review Profile_{pdf_file_name}.{extension}')
+
+
+class JobProfile:
+    def __init__(self, top_n=PROFILE_TOP_N):
+        self.top_n = top_n
+        self.profiler = cProfile.Profile()
+        self.seconds = 0.0
+        # tracemalloc snapshots as the job starts and ends
+        self.start_snapshot = None
+        self.end_snapshot = None
+        # Peak traced memory in bytes while the job ran
+        self.peak_bytes = 0
+
+    def __enter__(self):
+        profile_lock.acquire()
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.start_snapshot = tracemalloc.take_snapshot()
+        self.start = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.disable()
+        self.seconds = time.perf_counter() - self.start
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        self.end_snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        profile_lock.release()
+        return False
+
+    def summary(self):
+        """
+        Renders the hotspots and memory growth of the job as text.
+
+        Returns:
+        str: The top functions by cumulative and by own time, and the source lines
+        whose allocations grew most between the start and end snapshots.
+        """
+        lines = [f'Wall time: {self.seconds:.3f}s', f'Peak traced memory: {self.peak_bytes / 1024 / 1024:.1f} MB', '']
+
+        for sort_key, title in (('cumulative', 'cumulative time'), ('tottime', 'own time')):
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).strip_dirs().sort_stats(sort_key).print_stats(self.top_n)
+            lines += [f'Top {self.top_n} functions by {title}', stream.getvalue().strip(), '']
+
+        lines.append(f'Top {self.top_n} allocation sites by memory growth')
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        growth = self.end_snapshot.filter_traces(filters).compare_to(
+            self.start_snapshot.filter_traces(filters), 'lineno')
+        lines += [str(statistic) for statistic in growth[:self.top_n]]
+        return '\n'.join(lines) + '\n'
+
+    def save(self, pdf_file_name, directory_path=None):
+        """
+        Writes the pstats file and the text summary of the job.
+
+        Returns:
+        tuple: The paths of the pstats file and the text summary.
+        """
+        stats_path = profile_file_path(pdf_file_name, 'pstats', directory_path)
+        self.profiler.dump_stats(stats_path)
+        summary_path = profile_file_path(pdf_file_name, 'txt', directory_path)
+        with open(summary_path, 'w', encoding='utf-8') as file:
+            file.write(self.summary())
+        return stats_path, summary_path
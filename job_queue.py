@@ -0,0 +1,198 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from metrics import JOBS_FINISHED
+
+# SCRIPT FOR THE BACKGROUND ANALYSIS JOB QUEUE
+# /submit enqueues a job and returns its id straight away; a local worker pool runs
+# the analysis and the stages report progress back through a callback, which
+# /status/<job_id> serves to the frontend.
+
+JOB_WORKERS = 2
+
+# Finished jobs kept for status polling, the oldest are forgotten beyond this
+MAX_FINISHED_JOBS = 500
+
+# Hours a job directory and its results are kept after its last change
+RESULTS_RETENTION_HOURS = 72
+
+# Share of the progress bar reached when each stage starts, PDF reading fills the
+# range up to the next stage page by page and a batch file by file
+STAGE_PROGRESS = {
+    'queued': 0,
+    'batch': 0,
+    'read_pdf': 0,
+    'create_workbook': 80,
+    'unpack_and_store_values': 85,
+    'assess': 90,
+    'save_workbook': 95,
+    'write_records': 95,
+    'store_results': 98,
+    'done': 100,
+}
+
+
+def new_job_id():
+    """Returns a new unique job id"""
+    return uuid.uuid4().hex
+
+
+def job_directory(base_folder, job_id):
+    """
+    Creates the working directory of a job.
+
+    Every job reads its upload from and writes its results to its own directory, so
+    concurrent jobs with the same file name never overwrite each other.
+
+    Returns:
+    str: The path of the job directory.
+    """
+    path = os.path.join(base_folder, job_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def last_modified(path):
+    """The latest modification time of a directory and everything in it"""
+    latest = os.stat(path).st_mtime
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+            except FileNotFoundError:
+                continue
+    return latest
+
+
+def expire_job_directories(base_folder, max_age_seconds, keep=()):
+    """
+    Deletes the job directories that have not changed for longer than a retention period.
+
+    Parameters:
+    - base_folder (str): The folder the job directories are created in.
+    - max_age_seconds (float): How long a job directory is kept after its last change.
+    - keep (iterable): Job ids that must never be deleted, e.g. jobs still running.
+
+    Returns:
+    int: The number of job directories deleted.
+    """
+    if not os.path.isdir(base_folder):
+        return 0
+    keep = set(keep)
+    cutoff = time.time() - max_age_seconds
+    deleted = 0
+    for entry in os.scandir(base_folder):
+        if not entry.is_dir() or entry.name in keep:
+            continue
+        try:
+            expired = last_modified(entry.path) < cutoff
+        except FileNotFoundError:
+            continue
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            deleted += 1
+    return deleted
+
+
+def stage_percent(job):
+    """Overall progress of a job in percent from its stage and page or file counts"""
+    if job['status'] == 'done':
+        return 100
+    percent = STAGE_PROGRESS.get(job['stage'], 0)
+    if job['stage'] == 'read_pdf' and job['pages_total']:
+        percent += (STAGE_PROGRESS['create_workbook'] - percent) * job['pages_done'] / job['pages_total']
+    elif job['stage'] == 'batch' and job['files_total']:
+        percent += (STAGE_PROGRESS['save_workbook'] - percent) * job['files_done'] / job['files_total']
+    return int(percent)
+
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='truss-job')
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def submit(self, job_id, func, *args, **kwargs):
+        """Queue func to run in the worker pool, it receives a progress callback keyword"""
+        with self.lock:
+            self.forget_finished_jobs()
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'stage': 'queued',
+                'pages_done': 0,
+                'pages_total': 0,
+                'trusses_found': 0,
+                'files_done': 0,
+                'files_total': 0,
+                'message': '',
+                'output_path': None,
+                'submitted': time.time(),
+                'finished': None,
+            }
+        self.executor.submit(self.run, job_id, func, args, kwargs)
+        return job_id
+
+    def run(self, job_id, func, args, kwargs):
+        """Run a job in a worker thread, recording its outcome"""
+        self.update(job_id, status='running')
+        try:
+            output_path = func(*args, progress=self.progress_callback(job_id), **kwargs)
+            self.update(job_id, status='done', stage='done', output_path=output_path,
+                        message='Analysis completed successfully', finished=time.time())
+            JOBS_FINISHED.inc('done')
+        except Exception as e:
+            self.update(job_id, status='failed', message=f'Error: {str(e)}', finished=time.time())
+            JOBS_FINISHED.inc('failed')
+
+    def progress_callback(self, job_id):
+        """Build the callback the analysis stages use to report progress"""
+        def progress(stage, done=None, total=None):
+            fields = {'stage': stage}
+            if stage == 'read_pdf' and done is not None:
+                fields.update(pages_done=done, pages_total=total)
+            elif stage == 'batch':
+                fields.update(files_done=done, files_total=total)
+            elif stage == 'compartmentalize_pdf':
+                # Parsing runs alongside reading, keep the reading stage on the bar
+                fields = {'trusses_found': done}
+            self.update(job_id, **fields)
+        return progress
+
+    def update(self, job_id, **fields):
+        """Update the record of a job"""
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def status(self, job_id):
+        """Copy of the record of a job with its overall progress, or None if unknown"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        job['percent'] = stage_percent(job)
+        return job
+
+    def counts(self):
+        """Number of queued and running jobs"""
+        with self.lock:
+            statuses = [job['status'] for job in self.jobs.values()]
+        return {'queued': statuses.count('queued'), 'running': statuses.count('running')}
+
+    def active_jobs(self):
+        """Ids of the queued and running jobs"""
+        with self.lock:
+            return [job_id for job_id, job in self.jobs.items() if job['status'] in ('queued', 'running')]
+
+    def forget_finished_jobs(self):
+        """Drop the oldest finished job records beyond MAX_FINISHED_JOBS, lock must be held"""
+        finished = sorted(
+            (job['finished'], job_id) for job_id, job in self.jobs.items() if job['finished'] is not None
+        )
+        for _, job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
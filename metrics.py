@@ -0,0 +1,257 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# SCRIPT FOR THE IN-PROCESS METRICS SERVED AT /metrics
+# Counters and histograms are updated by cheap hooks in the analysis stages and
+# rendered in the Prometheus text exposition format on request. Values live in the
+# process that ran the stage, the Flask process for jobs queued through /submit.
+# Batch files run in worker processes, which hand their changes back with the file's
+# summary, see metric_deltas and merge_metrics.
+
+# Upper bounds in seconds of the stage latency histogram buckets
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def format_labels(names, values):
+    """Renders label pairs as {name="value",...}, or an empty string without labels"""
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        """Add to the counter of a label combination"""
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def inc_many(self, amounts):
+        """Add to several label combinations under one lock, amounts maps label tuples to counts"""
+        with self.lock:
+            for label_values, amount in amounts.items():
+                self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def delta(self, before):
+        """The changes since a snapshot, label tuples mapped to the amount added"""
+        return {labels: value - before.get(labels, 0) for labels, value in self.snapshot().items()
+                if value != before.get(labels, 0)}
+
+    def merge(self, delta):
+        self.inc_many(delta)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self.lock:
+            values = sorted(self.values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, description, labels=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # Label tuple mapped to (per-bucket counts, sum, count)
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        """Record one observation for a label combination"""
+        with self.lock:
+            counts, total, count = self.values.get(label_values, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self.values[label_values] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe the wall time of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def snapshot(self):
+        with self.lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self.values.items()}
+
+    def delta(self, before):
+        """The observations since a snapshot, label tuples mapped to (per-bucket counts, sum, count)"""
+        delta = {}
+        for labels, (counts, total, count) in self.snapshot().items():
+            before_counts, before_total, before_count = before.get(labels, ([0] * len(self.buckets), 0.0, 0))
+            if count != before_count:
+                delta[labels] = ([now - then for now, then in zip(counts, before_counts)],
+                                 total - before_total, count - before_count)
+        return delta
+
+    def merge(self, delta):
+        """Adds observations made elsewhere, e.g. the delta of a worker process"""
+        with self.lock:
+            for labels, (counts, total, count) in delta.items():
+                own_counts, own_total, own_count = self.values.get(labels, ([0] * len(self.buckets), 0.0, 0))
+                self.values[labels] = ([own + other for own, other in zip(own_counts, counts)],
+                                       own_total + total, own_count + count)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            values = sorted((label_values, (list(counts), total, count))
+                            for label_values, (counts, total, count) in self.values.items())
+        for label_values, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labels + ('le',), label_values + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labels + ('le',), label_values + ('+Inf',))
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, label_values)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, label_values)} {count}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('truss_stage_seconds', 'Wall time of each analysis stage', labels=('stage',))
+PAGES_PROCESSED = Counter('truss_pages_processed_total', 'PDF pages read')
+PAGES_SKIPPED = Counter('truss_pages_skipped_total', 'PDF pages whose text extraction was skipped by triage')
+TRUSSES_FOUND = Counter('truss_trusses_found_total', 'Truss records extracted')
+PATTERN_RESULTS = Counter('truss_pattern_results_total', 'Page pattern scans by pattern and outcome',
+                          labels=('pattern', 'result'))
+VALIDATION_FAILURES = Counter('truss_validation_failures_total', 'Failing trusses by validation rule',
+                              labels=('rule',))
+PROFILE_DOCUMENTS = Counter('truss_profile_documents_total', 'Documents parsed with each pattern profile',
+                            labels=('profile',))
+PROFILE_PATTERN_RESULTS = Counter('truss_profile_pattern_results_total',
+                                  'Pattern scans on truss design pages by profile, pattern and outcome',
+                                  labels=('profile', 'pattern', 'result'))
+TEXT_BACKEND_FALLBACKS = Counter('truss_text_backend_fallbacks_total',
+                                 'Pages extracted in this process that a text backend handed to PyPDF2',
+                                 labels=('backend',))
+FONT_CACHE_LOOKUPS = Counter('truss_font_cache_lookups_total',
+                             'Font character map lookups of text extraction by outcome', labels=('result',))
+FONT_MAP_BUILD_SECONDS = Counter('truss_font_map_build_seconds_total',
+                                 'Time spent building font character maps on font cache misses')
+JOBS_FINISHED = Counter('truss_jobs_finished_total', 'Finished analysis jobs by outcome', labels=('status',))
+
+METRICS = [STAGE_SECONDS, PAGES_PROCESSED, PAGES_SKIPPED, TRUSSES_FOUND, PATTERN_RESULTS, VALIDATION_FAILURES,
+           PROFILE_DOCUMENTS, PROFILE_PATTERN_RESULTS, TEXT_BACKEND_FALLBACKS, FONT_CACHE_LOOKUPS,
+           FONT_MAP_BUILD_SECONDS, JOBS_FINISHED]
+
+
+def record_pattern_results(page_patterns, pattern_names):
+    """
+    Counts the match or miss of every pattern scanned on a page.
+
+    Parameters:
+    - page_patterns (dict): Result keys mapped to their matches, as find_patterns reports them.
+    - pattern_names (dict): Result keys mapped to the regex_dict pattern names used as labels.
+    """
+    PATTERN_RESULTS.inc_many({
+        (pattern_names[key], 'match' if matches else 'miss'): 1 for key, matches in page_patterns.items()
+    })
+
+
+def record_profile_results(profile_name, design_page_patterns, pattern_names):
+    """
+    Counts a document parsed with a pattern profile and the match or miss of every
+    pattern on its design pages, so a falling match rate shows a vendor changed format.
+
+    Parameters:
+    - profile_name (str): The name of the profile the document was parsed with.
+    - design_page_patterns (iterable): The matches of each truss design page.
+    - pattern_names (dict): Result keys mapped to the regex_dict pattern names used as labels.
+    """
+    PROFILE_DOCUMENTS.inc(profile_name)
+    results = {}
+    for page_patterns in design_page_patterns:
+        for key, matches in page_patterns.items():
+            labels = (profile_name, pattern_names[key], 'match' if matches else 'miss')
+            results[labels] = results.get(labels, 0) + 1
+    PROFILE_PATTERN_RESULTS.inc_many(results)
+
+
+def timed_iteration(iterable, elapsed):
+    """
+    Yields from an iterable, adding the time spent producing each item to elapsed.
+
+    Used to split the time of a streamed stage from that of its consumer, e.g. PDF
+    reading from the parsing that runs page by page alongside it.
+
+    Parameters:
+    - iterable (iterable): The producer, e.g. pdf_reader.iter_pdf.
+    - elapsed (dict): Updated in place with 'seconds' and 'items' produced.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            elapsed['seconds'] += time.perf_counter() - start
+            return
+        elapsed['seconds'] += time.perf_counter() - start
+        elapsed['items'] += 1
+        yield item
+
+
+def snapshot_metrics():
+    """The values of every metric, to take metric_deltas against later"""
+    return {metric.name: metric.snapshot() for metric in METRICS}
+
+
+def metric_deltas(before):
+    """
+    The changes of every metric since snapshot_metrics, e.g. what one batch file added
+    in its worker process. The result can be pickled and passed to merge_metrics.
+    """
+    deltas = {}
+    for metric in METRICS:
+        delta = metric.delta(before.get(metric.name, {}))
+        if delta:
+            deltas[metric.name] = delta
+    return deltas
+
+
+def merge_metrics(deltas):
+    """Adds the metric_deltas of another process to the metrics of this one"""
+    metrics = {metric.name: metric for metric in METRICS}
+    for name, delta in deltas.items():
+        metrics[name].merge(delta)
+
+
+def render_metrics(gauges=None):
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Parameters:
+    - gauges (dict): Optional gauge name mapped to a (description, value) pair,
+      sampled by the caller at request time, e.g. the job queue depth.
+
+    Returns:
+    str: The exposition text.
+    """
+    lines = []
+    for name, (description, value) in (gauges or {}).items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} gauge', f'{name} {value}']
+    for metric in METRICS:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
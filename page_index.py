@@ -0,0 +1,89 @@
+import hashlib
+from page_scanner import scan_page_role, PAGE1_ROLE, PAGE2_ROLE
+
+# SCRIPT FOR THE PAGE INDEX OF ONE DOCUMENT
+# Built in the same single pass that parses the trusses: every page is scanned once,
+# its role is recorded and the matches its role needs are kept, so the drag load
+# lookahead and the per-profile match rates of the design pages are lookups.
+# Pages are hashed by their text, so a reprinted page is not scanned again and takes
+# the role and matches of its first occurrence.
+
+
+def page_text_hash(page):
+    """A digest of the extracted text of a page"""
+    return hashlib.blake2b(page.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def truss_label(page_patterns):
+    """The truss label of a page from its label match, or None"""
+    if not page_patterns.get('label_found'):
+        return None
+    return page_patterns['label_found'][0].split('Truss')[0]
+
+
+class PageIndex:
+    def __init__(self, regex_dict):
+        self.regex_dict = regex_dict
+        # Role of every page, by page number from 0
+        self.roles = []
+        # Page number mapped to its matches, for design and continuation pages only
+        self.matches = {}
+        # Text hash mapped to the number of the first page with that text
+        self.first_pages = {}
+        # Page number of every reprinted page mapped to the first page with its text
+        self.duplicates = {}
+
+    def add(self, page):
+        """
+        Scans the next page of the document and indexes it.
+
+        Returns:
+        int: The number of the page.
+        """
+        page_number = len(self.roles)
+        first_page = self.first_pages.setdefault(page_text_hash(page), page_number)
+        if first_page != page_number:
+            # A reprint shares the role and matches of the first page with its text
+            self.duplicates[page_number] = first_page
+            role, page_patterns = self.roles[first_page], self.matches.get(first_page)
+        else:
+            role, page_patterns = scan_page_role(page, self.regex_dict)
+        self.roles.append(role)
+        if role in (PAGE1_ROLE, PAGE2_ROLE):
+            self.matches[page_number] = page_patterns
+        return page_number
+
+    def role(self, page_number):
+        """The role of a page: 'page1', 'page2', 'placement' or 'other'"""
+        return self.roles[page_number]
+
+    def page_matches(self, page_number):
+        """The cached matches of a design or continuation page, or None"""
+        return self.matches.get(page_number)
+
+    def label(self, page_number):
+        """The truss label of a design or continuation page, or None"""
+        return truss_label(self.matches.get(page_number, {}))
+
+    def original(self, page_number):
+        """The number of the first page with the same text as a page, the page itself if it is the first"""
+        return self.duplicates.get(page_number, page_number)
+
+    def design_pages(self):
+        """The page numbers of every truss design page"""
+        return [page_number for page_number, role in enumerate(self.roles) if role == PAGE1_ROLE]
+
+    def continuation_page(self, page_number):
+        """The number of the 'Page 2' continuation following a design page, or None"""
+        next_page = page_number + 1
+        if next_page < len(self.roles) and self.roles[next_page] == PAGE2_ROLE:
+            return next_page
+        return None
+
+    def continuation(self, page_number):
+        """The matches of the page following a design page if it is its 'Page 2' continuation, or None"""
+        next_page = self.continuation_page(page_number)
+        return self.matches[next_page] if next_page is not None else None
+
+    def __len__(self):
+        return len(self.roles)
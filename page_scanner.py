@@ -0,0 +1,140 @@
+import re
+from metrics import record_pattern_results
+
+# PATTERN GROUPS USED BY THE PAGE SCANNER
+# Keys match the dictionary returned by storage_compartment.find_patterns so the
+# extract_* helpers can consume either result unchanged.
+
+# Gating patterns decide whether a page is a truss design page at all. They are
+# checked cheapest first: the two literal patterns before the truss label.
+GATING_PATTERNS = {
+    'page1_pattern_found': 'page1_pattern',
+    'truss_layout_pattern_found': 'truss_layout_pattern',
+    'label_found': 'truss_label_pattern',
+}
+
+# Field patterns are only run on pages that pass the gate
+FIELD_PATTERNS = {
+    'design_load_found': 'design_load_pattern',
+    'roof_slope_found': 'roof_slope_pattern',
+    'floor_slope_found': 'floor_slope_pattern',
+    'truss_spacing_found': 'truss_spacing_pattern',
+    'wind_standard_found': 'wind_standard_pattern',
+    'wind_speed_found': 'wind_speed_pattern',
+    'risk_category_found': 'risk_category_pattern',
+    'building_code_found': 'building_code_pattern',
+    'max_member_stress_found': 'max_member_stress_pattern',
+    'actual_deflection_found': 'actual_deflection_pattern',
+    'design_deflection_criteria_found': 'design_deflection_criteria_pattern',
+    'drag_load_found': 'drag_load_pattern',
+    'warning_found': 'warning_pattern',
+}
+
+ALL_PATTERNS = {**GATING_PATTERNS, **FIELD_PATTERNS}
+
+# A 'Page 2' continuation only needs its label and a drag load carried over from page 1
+CONTINUATION_PATTERNS = ['label_found', 'drag_load_found']
+PAGE2_PATTERN = re.compile(r'Page 2')
+
+# Page roles, in the order the gates decide them
+PAGE1_ROLE = 'page1'
+PAGE2_ROLE = 'page2'
+PLACEMENT_ROLE = 'placement'
+OTHER_ROLE = 'other'
+PAGE_ROLES = (PAGE1_ROLE, PAGE2_ROLE, PLACEMENT_ROLE, OTHER_ROLE)
+
+
+def first_match(pattern, page):
+    """
+    Returns the first match of a pattern in the form re.findall would report it.
+
+    Parameters:
+    - pattern (re.Pattern): A compiled regex pattern.
+    - page (str): The text content of the page.
+
+    Returns:
+    list: A one element list holding the first match, or an empty list.
+    """
+    match = pattern.search(page)
+    if match is None:
+        return []
+    if pattern.groups == 0:
+        return [match.group(0)]
+    if pattern.groups == 1:
+        return [match.group(1) or '']
+    return [tuple(group or '' for group in match.groups())]
+
+
+def scan_fields(page, regex_dict, keys):
+    """
+    Runs only the requested patterns over a page.
+
+    Parameters:
+    - page (str): The text content of the page.
+    - regex_dict (dict): The dictionary containing regex patterns.
+    - keys (iterable): Result keys to scan for, as named in ALL_PATTERNS.
+
+    Returns:
+    dict: A dictionary containing the first match for each requested key.
+    """
+    return {key: first_match(regex_dict[ALL_PATTERNS[key]], page) for key in keys}
+
+
+def scan_page_role(page, regex_dict):
+    """
+    Decides the role of a page and scans it for the matches that role needs.
+
+    Every pattern runs at most once per page. The gating patterns run first; the
+    first page of a truss design then gets every field pattern, a 'Page 2'
+    continuation gets its label and drag load, and other pages get nothing more.
+    The match or miss of every pattern run is counted in metrics.PATTERN_RESULTS.
+
+    Parameters:
+    - page (str): The text content of the page.
+    - regex_dict (dict): The dictionary containing regex patterns.
+
+    Returns:
+    tuple: The role of the page, one of PAGE_ROLES, and a dictionary of the matches
+    found, keyed as in find_patterns.
+    """
+    page_patterns = {}
+    role = PAGE1_ROLE
+    for key, pattern_name in GATING_PATTERNS.items():
+        page_patterns[key] = first_match(regex_dict[pattern_name], page)
+        # A placement diagram rejects the page, every other gate must match
+        if key == 'page1_pattern_found' and not page_patterns[key]:
+            role = PAGE2_ROLE if PAGE2_PATTERN.search(page) else OTHER_ROLE
+        elif key == 'truss_layout_pattern_found' and page_patterns[key]:
+            role = PLACEMENT_ROLE
+        elif key == 'label_found' and not page_patterns[key]:
+            role = OTHER_ROLE
+        if role != PAGE1_ROLE:
+            break
+
+    if role == PAGE1_ROLE:
+        page_patterns.update(scan_fields(page, regex_dict, FIELD_PATTERNS))
+    elif role == PAGE2_ROLE:
+        page_patterns.update(scan_fields(page, regex_dict, CONTINUATION_PATTERNS))
+    record_pattern_results(page_patterns, ALL_PATTERNS)
+    return role, page_patterns
+
+
+def scan_page(page, regex_dict):
+    """
+    Scans a page for truss data, running the cheap gating patterns first.
+
+    Placement diagrams and pages without both a truss label and 'Page 1' are
+    rejected before any field pattern runs. Qualifying pages get one search per
+    field pattern, thirteen in all, each stopping at its first match, which is the
+    only match the extract_* helpers read. Other pages cost at most the three gates.
+
+    Parameters:
+    - page (str): The text content of the page.
+    - regex_dict (dict): The dictionary containing regex patterns.
+
+    Returns:
+    dict: The same keys as find_patterns, each holding a list with the first
+    match, or None if the page is not the first page of a truss design.
+    """
+    role, page_patterns = scan_page_role(page, regex_dict)
+    return page_patterns if role == PAGE1_ROLE else None
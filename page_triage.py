@@ -0,0 +1,145 @@
+import re
+
+# SCRIPT TO TRIAGE PDF PAGES BEFORE TEXT EXTRACTION
+# A page can only yield a truss when it carries 'Page 1' and a truss label and is not
+# a placement diagram, or when it carries 'Page 2' and follows such a page as its
+# continuation. Those literals are looked for in the strings the page's content stream shows, which costs
+# a fraction of extract_text, and only pages that may qualify are extracted in full.
+#
+# The check must never reject a page extract_text would accept, so it only rejects a
+# page when it can be sure: every font maps its bytes straight to characters, no text
+# hides in form XObjects or inline images, and the literals are missing even with
+# every string joined and all whitespace removed. Anything else is extracted.
+
+# Literals of the gating patterns in pattern.py, without their whitespace
+PAGE1_LITERAL = b'Page1'
+PAGE2_LITERAL = b'Page2'
+LABEL_LITERAL = b'TrussType'
+# A placement diagram is only certain when a single string shows the whole phrase
+PLACEMENT_LITERAL = b'PLACEMENT DIAGRAM'
+
+# Font encodings whose byte values below 128 are ASCII characters
+SIMPLE_ENCODINGS = ('/WinAnsiEncoding', '/StandardEncoding', '/MacRomanEncoding', '/PDFDocEncoding')
+SIMPLE_FONT_TYPES = ('/Type1', '/TrueType', '/MMType1')
+
+# Literal strings, with one level of unescaped nested parentheses, hex strings and
+# comments, matched in a single scan so brackets inside one are never misread
+CONTENT_TOKEN = re.compile(
+    rb'\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\)|<[0-9A-Fa-f\s]*>|%[^\r\n]*',
+    re.DOTALL,
+)
+STRING_ESCAPE = re.compile(rb'\\([0-7]{1,3}|.)', re.DOTALL)
+ESCAPED_CHARACTERS = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+INLINE_IMAGE = re.compile(rb'(?:^|\s)BI\s')
+WHITESPACE = b' \t\r\n\f\v\x00'
+
+
+def unescape_string(literal):
+    """The bytes of a PDF literal string token, without its parentheses"""
+    def replace(match):
+        escape = match.group(1)
+        if escape[:1].isdigit():
+            return bytes([int(escape, 8) & 0xFF])
+        if escape in (b'\n', b'\r'):
+            # A backslash at the end of a line continues the string
+            return b''
+        return ESCAPED_CHARACTERS.get(escape, escape)
+    return STRING_ESCAPE.sub(replace, literal[1:-1])
+
+
+def shown_strings(content):
+    """
+    Decodes the strings of a content stream as the bytes a simple font shows.
+
+    Parameters:
+    - content (bytes): The decoded content stream of a page.
+
+    Returns:
+    list: The bytes of every literal and hex string, in stream order.
+    """
+    strings = []
+    for token in CONTENT_TOKEN.findall(content):
+        if token[:1] == b'(':
+            strings.append(unescape_string(token) if b'\\' in token else token[1:-1])
+        elif token[:1] == b'<':
+            digits = token[1:-1].translate(None, WHITESPACE)
+            strings.append(bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode()))
+    return strings
+
+
+def is_simple_font(font):
+    """True when a font shows the bytes of its strings as the same ASCII characters"""
+    if font.get('/Subtype') not in SIMPLE_FONT_TYPES or '/ToUnicode' in font:
+        return False
+    encoding = font.get('/Encoding')
+    return encoding is None or encoding.get_object() in SIMPLE_ENCODINGS
+
+
+def has_simple_fonts(resources, known_fonts=None):
+    """
+    True when every font of the page is simple.
+
+    Parameters:
+    - resources (dict): The resources of the page.
+    - known_fonts (dict): Optional verdicts of fonts already checked, keyed by object
+      number, so a font shared by every page is only resolved once.
+    """
+    fonts = resources.get('/Font')
+    if fonts is None:
+        return True
+    fonts = fonts.get_object()
+    for name in fonts:
+        reference = fonts.raw_get(name)
+        key = getattr(reference, 'idnum', None)
+        if known_fonts is None or key is None:
+            simple = is_simple_font(reference.get_object())
+        elif key in known_fonts:
+            simple = known_fonts[key]
+        else:
+            simple = known_fonts[key] = is_simple_font(reference.get_object())
+        if not simple:
+            return False
+    return True
+
+
+def has_form_xobjects(resources):
+    """True when the page draws form XObjects, whose text extract_text also reads"""
+    xobjects = resources.get('/XObject')
+    if xobjects is None:
+        return False
+    xobjects = xobjects.get_object()
+    return any(xobjects[name].get_object().get('/Subtype') == '/Form' for name in xobjects)
+
+
+def triage_page(page, known_fonts=None):
+    """
+    Decides from the raw content stream what a page may be, without extracting its text.
+
+    Parameters:
+    - page (PyPDF2.PageObject): The page to triage.
+    - known_fonts (dict): Optional verdicts of fonts already checked, see has_simple_fonts.
+
+    Returns:
+    tuple: (design, continuation) booleans, whether the page may be the first page of
+    a truss design and whether it may be a 'Page 2' continuation. Each is False only
+    when the page certainly is not one, both are True when it cannot be told cheaply.
+    """
+    resources = page.get('/Resources')
+    resources = resources.get_object() if resources is not None else {}
+    if not has_simple_fonts(resources, known_fonts) or has_form_xobjects(resources):
+        return True, True
+
+    contents = page.get_contents()
+    if contents is None:
+        return False, False
+    content = contents.get_data()
+    if b'BI' in content and INLINE_IMAGE.search(content):
+        return True, True
+
+    strings = shown_strings(content)
+    text = b''.join(strings).translate(None, WHITESPACE)
+    continuation = PAGE2_LITERAL in text
+    if PAGE1_LITERAL not in text or LABEL_LITERAL not in text:
+        return False, continuation
+    # Strings are joined with a byte the phrase does not hold, so it only matches within one
+    return PLACEMENT_LITERAL not in b'\n'.join(strings), continuation
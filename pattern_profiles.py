@@ -0,0 +1,143 @@
+import re
+from itertools import chain, islice
+from pattern import regex_dict
+from storage_compartment import PAGE_EXTRACTORS, CONTINUATION_EXTRACTORS
+from metrics import PROFILE_DOCUMENTS, PROFILE_PATTERN_RESULTS
+
+# SCRIPT FOR THE PATTERN PROFILES OF EACH TRUSS SOFTWARE VENDOR
+# A profile is the precompiled patterns and extract functions for the drawings of one
+# vendor. Profiles are registered once at import. The profile of a document is picked
+# by sampling its first pages, the whole document is parsed with that profile, and its
+# documents and pattern match rates are counted under it. A document matching no
+# vendor's signature falls back to the generic profile. Only the MiTek patterns exist
+# so far and both registered profiles run them; the registry is where a vendor with
+# patterns of its own is added.
+
+# Pages sampled from the start of a document to pick its profile
+DETECT_SAMPLE_PAGES = 5
+
+# Pass as the regex_dict of an analysis to pick the profile from the document itself
+AUTO_DETECT = None
+
+
+class PatternProfile:
+    def __init__(self, name, regex_dict, signature, page_extractors=PAGE_EXTRACTORS,
+                 continuation_extractors=CONTINUATION_EXTRACTORS):
+        self.name = name
+        # Compiled patterns keyed as in pattern.regex_dict
+        self.regex_dict = regex_dict
+        # Compiled patterns that are all found on a design page of this vendor
+        self.signature = signature
+        # Extract functions, see storage_compartment.iter_truss_records
+        self.page_extractors = page_extractors
+        self.continuation_extractors = continuation_extractors
+
+    def matches(self, page):
+        """True when every signature pattern is found on the page"""
+        return bool(self.signature) and all(pattern.search(page) for pattern in self.signature)
+
+    def __repr__(self):
+        return f'PatternProfile({self.name!r})'
+
+
+PROFILES = {}
+
+
+def register_profile(profile):
+    """Adds a profile to the registry"""
+    PROFILES[profile.name] = profile
+    return profile
+
+
+# MiTek truss design pages, the layout pattern.regex_dict was written for
+MITEK_PROFILE = register_profile(PatternProfile(
+    'mitek',
+    regex_dict,
+    signature=(regex_dict['truss_label_pattern'], re.compile(r'LOADING \(psf\)')),
+))
+
+# Documents whose sampled pages match no vendor's signature. It has no signature of
+# its own and runs the shared patterns, its documents and match rates are counted
+# apart so a vendor's format change shows up as documents falling back to it.
+GENERIC_PROFILE = register_profile(PatternProfile('generic', regex_dict, signature=()))
+
+
+def as_profile(patterns):
+    """A profile for a plain regex dictionary, a profile is returned unchanged"""
+    if isinstance(patterns, PatternProfile):
+        return patterns
+    return PatternProfile('custom', patterns, signature=())
+
+
+def select_profile(pages):
+    """
+    Picks the registered profile whose signature is found on most of the given pages.
+
+    Parameters:
+    - pages (list): The text of the sampled pages.
+
+    Returns:
+    PatternProfile: The best matching profile, GENERIC_PROFILE when none match.
+    """
+    best, best_hits = GENERIC_PROFILE, 0
+    for profile in PROFILES.values():
+        hits = sum(1 for page in pages if profile.matches(page))
+        if hits > best_hits:
+            best, best_hits = profile, hits
+    return best
+
+
+def detect_profile(pages, sample_pages=DETECT_SAMPLE_PAGES):
+    """
+    Picks the profile of a document from its first pages without losing them.
+
+    Parameters:
+    - pages (iterable): The text of each page, e.g. from pdf_reader.iter_pdf.
+    - sample_pages (int): The number of pages sampled from the start.
+
+    Returns:
+    tuple: The selected PatternProfile and an iterator over every page, the sampled
+    pages included.
+    """
+    pages = iter(pages)
+    sample = list(islice(pages, sample_pages))
+    return select_profile(sample), chain(sample, pages)
+
+
+def registry_patterns():
+    """Every registered pattern keyed by profile and name, e.g. to key cached records"""
+    return {
+        f'{profile.name}.{name}': pattern
+        for profile in PROFILES.values()
+        for name, pattern in profile.regex_dict.items()
+    }
+
+
+def profile_stats():
+    """
+    The documents parsed with each profile and the match rate of its patterns on
+    truss design pages, from the counters in metrics.
+
+    Returns:
+    dict: Profile names mapped to their 'documents' count and 'match_rates', pattern
+    names mapped to the share of design pages they matched on.
+    """
+    with PROFILE_PATTERN_RESULTS.lock:
+        results = dict(PROFILE_PATTERN_RESULTS.values)
+    with PROFILE_DOCUMENTS.lock:
+        documents = dict(PROFILE_DOCUMENTS.values)
+
+    stats = {}
+    for name in list(PROFILES) + sorted({labels[0] for labels in documents} - set(PROFILES)):
+        rates = {}
+        for (profile_name, pattern_name, result), count in sorted(results.items()):
+            if profile_name == name:
+                matched, scanned = rates.get(pattern_name, (0, 0))
+                rates[pattern_name] = (matched + (count if result == 'match' else 0), scanned + count)
+        stats[name] = {
+            'documents': documents.get((name,), 0),
+            'match_rates': {
+                pattern_name: round(matched / scanned, 4) for pattern_name, (matched, scanned) in rates.items()
+            },
+        }
+    return stats
@@ -1,31 +1,481 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import PyPDF2
+from PyPDF2.generic import IndirectObject
+from pdf_source import as_pdf_source
+from page_triage import triage_page
+from content_stream_text import FontCache, stream_page_text, page_resources, shared_font_maps
+from metrics import PAGES_SKIPPED, TEXT_BACKEND_FALLBACKS, FONT_CACHE_LOOKUPS, FONT_MAP_BUILD_SECONDS
 
-def read_pdf(pdf_file_path):
+# Number of page chunks handed to each worker, so a slow chunk does not leave the
+# rest of the pool idle at the end of a job
+CHUNKS_PER_WORKER = 4
+
+# Upper bound on pages per chunk and on chunks in flight per worker, which together
+# bound how much extracted text is held before the consumer reads it
+MAX_CHUNK_PAGES = 50
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Text extraction backends, PyPDF2's extract_text and the content stream tokenizer of
+# content_stream_text, which falls back to PyPDF2 on any page it cannot reproduce
+PYPDF2_BACKEND = 'pypdf2'
+STREAM_BACKEND = 'stream'
+DEFAULT_TEXT_BACKEND = PYPDF2_BACKEND
+
+
+def pypdf2_page_text(page, font_cache=None):
+    """Text of a page from PyPDF2's extract_text, with the font character maps of font_cache"""
+    if font_cache is None:
+        return page.extract_text()
+    with shared_font_maps(font_cache):
+        return page.extract_text()
+
+
+def stream_text(page, font_cache=None):
+    """Text of a page from its content stream, or from PyPDF2 when the stream backend cannot read it"""
+    try:
+        return stream_page_text(page, font_cache)
+    except Exception:
+        TEXT_BACKEND_FALLBACKS.inc(STREAM_BACKEND)
+        return pypdf2_page_text(page, font_cache)
+
+
+# Backend names mapped to a function of (page, font_cache) returning the page text.
+# font_cache is the content_stream_text.FontCache of the document, shared by its pages.
+TEXT_BACKENDS = {
+    PYPDF2_BACKEND: pypdf2_page_text,
+    STREAM_BACKEND: stream_text,
+}
+
+
+def text_backend_function(text_backend):
+    """The extraction function of a backend name, raising ValueError for an unknown name"""
+    try:
+        return TEXT_BACKENDS[text_backend]
+    except KeyError:
+        raise ValueError(f"Unknown text backend '{text_backend}', expected one of {', '.join(TEXT_BACKENDS)}")
+
+
+def cache_variant(text_backend):
+    """The cache key variant of a backend, None for PyPDF2 so its existing entries stay valid"""
+    return None if text_backend == PYPDF2_BACKEND else text_backend
+
+
+# Font entries pointing at embedded font programs, which text extraction never reads
+FONT_PROGRAMS = ('/FontFile', '/FontFile2', '/FontFile3')
+
+
+def object_key(reference):
+    """The key PdfReader.resolved_objects uses for an indirect reference"""
+    return reference.generation, reference.idnum
+
+
+class SharedObjects:
     """
-    Reads and extracts text from each page of a PDF file.
+    The objects of a document that every page reuses, kept when a page is released.
+
+    Those are the fonts of the pages with the objects they refer to, such as their
+    ToUnicode CMaps, and resource dictionaries drawn on by more than one page. Their
+    number depends on the fonts of the document, not on its page count.
+    """
+
+    def __init__(self):
+        self.keep = set()
+        # Resource dictionaries seen on one page so far
+        self.seen = set()
+
+    def note(self, reference):
+        """Keeps an indirect resource dictionary once a second page uses it"""
+        if isinstance(reference, IndirectObject):
+            key = object_key(reference)
+            if key in self.seen:
+                self.keep.add(key)
+            else:
+                self.seen.add(key)
+
+    def keep_font(self, reference):
+        """Keeps a font and the objects it refers to, leaving out embedded font programs"""
+        pending = [reference]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, IndirectObject):
+                key = object_key(item)
+                if key in self.keep:
+                    continue
+                self.keep.add(key)
+                item = item.get_object()
+            if isinstance(item, dict):
+                pending.extend(value for name, value in item.items() if name not in FONT_PROGRAMS)
+            elif isinstance(item, list):
+                pending.extend(item)
+
+    def add_page(self, page):
+        """Records the shared objects of a page before it is released"""
+        node = page
+        while '/Resources' not in node:
+            node = node['/Parent'].get_object()
+        self.note(node.raw_get('/Resources'))
+        resources = node['/Resources'].get_object()
+        if '/Font' not in resources:
+            return
+        self.note(resources.raw_get('/Font'))
+        fonts = resources['/Font'].get_object()
+        for name in fonts:
+            reference = fonts.raw_get(name)
+            if not isinstance(reference, IndirectObject) or object_key(reference) not in self.keep:
+                self.keep_font(reference)
+
+
+class PdfReadError(Exception):
+    """The PDF could not be opened or read, raised by iter_pdf with raise_errors"""
+
+
+def release_page_objects(pdf, shared=None):
+    """
+    Drops the PDF objects PyPDF2 resolved while extracting a page.
+
+    PdfReader caches every object it resolves, including decoded content streams,
+    so without this its memory grows with the number of pages read. The objects of
+    shared, a SharedObjects, are kept so the next pages do not parse them again.
+    """
+    if shared is None or not shared.keep:
+        pdf.resolved_objects.clear()
+        return
+    for key in [key for key in pdf.resolved_objects if key not in shared.keep]:
+        del pdf.resolved_objects[key]
+
+
+def release_page(pdf, page_number, shared):
+    """Keeps the shared objects of a page, then releases the rest of what it resolved"""
+    try:
+        shared.add_page(pdf.pages[page_number])
+    except Exception:
+        pass
+    release_page_objects(pdf, shared)
+
+
+def hash_resources(digest, resources, visited):
+    """
+    Adds the fonts and form XObjects of a resource dictionary to a page hash.
+
+    Form XObjects are drawn by the Do operator and extract_text renders their text,
+    so their content streams and their own resources are hashed, following nested
+    forms. visited holds the object numbers of the forms already hashed, so a form
+    drawn twice or referring back to itself is hashed once.
+    """
+    fonts = resources.get('/Font')
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for name in sorted(fonts):
+            font = fonts[name].get_object()
+            digest.update(f"{name}{font.get('/Subtype')}{font.get('/BaseFont')}".encode())
+            encoding = font.get('/Encoding')
+            if encoding is not None:
+                digest.update(str(encoding.get_object()).encode())
+            to_unicode = font.get('/ToUnicode')
+            if to_unicode is not None:
+                digest.update(to_unicode.get_object().get_data())
+
+    xobjects = resources.get('/XObject')
+    if xobjects is None:
+        return
+    xobjects = xobjects.get_object()
+    for name in sorted(xobjects):
+        xobject = xobjects[name].get_object()
+        subtype = xobject.get('/Subtype')
+        digest.update(f'{name}{subtype}'.encode())
+        if subtype == '/Image':
+            continue
+        key = getattr(xobjects.raw_get(name), 'idnum', None)
+        if key is not None:
+            if key in visited:
+                digest.update(f'@{key}'.encode())
+                continue
+            visited.add(key)
+        digest.update(xobject.get_data())
+        form_resources = xobject.get('/Resources')
+        if form_resources is not None:
+            hash_resources(digest, form_resources.get_object(), visited)
+
+
+def page_content_hash(page):
+    """
+    Hashes everything that determines a page's extracted text.
+
+    That is the decoded content streams plus the identity of every font the page
+    uses, including its ToUnicode map, and the content of every form XObject it can
+    draw, so a reprinted page hashes the same even when its objects sit elsewhere in
+    a revised file, and pages drawing different forms never share an entry.
+
+    Parameters:
+    - page (PyPDF2.PageObject): The page to hash.
+
+    Returns:
+    str: The SHA-256 hex digest of the page content.
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        streams = contents if isinstance(contents, list) else [contents]
+        for stream in streams:
+            digest.update(stream.get_object().get_data())
+
+    resources = page_resources(page)
+    if resources is not None:
+        hash_resources(digest, resources, set())
+
+    return digest.hexdigest()
+
+
+def extract_page_text(pdf, page_number, cache=None, text_backend=DEFAULT_TEXT_BACKEND, font_cache=None):
+    """
+    Extracts the text of a single page, isolating any failure to that page.
+
+    Parameters:
+    - pdf (PyPDF2.PdfReader): The open PDF.
+    - page_number (int): Zero based index of the page to extract.
+    - cache (ContentCache): Optional cache of extracted text keyed by page content.
+    - text_backend (str): The name of the extraction backend, a key of TEXT_BACKENDS.
+    - font_cache (FontCache): Optional font character maps shared across the pages of the document.
+
+    Returns:
+    str: The text of the page, or an empty string if extraction failed.
+    """
+    page_text = text_backend_function(text_backend)
+    try:
+        page = pdf.pages[page_number]
+        if cache is None:
+            return page_text(page, font_cache)
+
+        content_hash = page_content_hash(page)
+        text = cache.get_page_text(content_hash, cache_variant(text_backend))
+        if text is None:
+            text = page_text(page, font_cache)
+            cache.put_page_text(content_hash, text, cache_variant(text_backend))
+        return text
+    except Exception as e:
+        print(f"An error occurred on page {page_number + 1}: {e}")
+        return ''
+
+
+def triage_page_at(pdf, page_number, known_fonts=None):
+    """Triage of one page, see page_triage.triage_page. A page that fails it may be anything."""
+    try:
+        return triage_page(pdf.pages[page_number], known_fonts)
+    except Exception:
+        return True, True
+
+
+def iter_page_range(pdf, start, stop, cache=None, triage_pages=False, text_backend=DEFAULT_TEXT_BACKEND,
+                    font_cache=None):
+    """
+    Extracts a range of pages of an open PDF.
+
+    The font character maps are built once for the range, or shared with the rest of
+    the document through font_cache.
+
+    With triage, a page is only extracted when it may be the first page of a truss
+    design, or may be the 'Page 2' continuation of the page before.
+
+    Yields:
+    str: The text of each page, or None for a page skipped by triage.
+    """
+    # Fonts are shared across pages, each is only checked once per range
+    known_fonts = {}
+    if font_cache is None:
+        font_cache = FontCache()
+    # Fonts and shared resources stay resolved from one page to the next
+    shared = SharedObjects()
+    previous_design = False
+    if triage_pages and start > 0:
+        previous_design = triage_page_at(pdf, start - 1, known_fonts)[0]
+        release_page(pdf, start - 1, shared)
+    for page in range(start, stop):
+        if triage_pages:
+            design, continuation = triage_page_at(pdf, page, known_fonts)
+            skip = not (design or (continuation and previous_design))
+            previous_design = design
+            if skip:
+                release_page(pdf, page, shared)
+                yield None
+                continue
+        # The objects resolved for triage are reused by the extraction
+        yield extract_page_text(pdf, page, cache, text_backend, font_cache)
+        release_page(pdf, page, shared)
+
+
+def read_page_range(pdf_file_path, start, stop, cache=None, triage_pages=False, text_backend=DEFAULT_TEXT_BACKEND,
+                    char_maps=None):
+    """
+    Worker function: opens the PDF independently and extracts a range of pages.
 
     Parameters:
     - pdf_file_path (str): The full path to the PDF file to read.
+    - start (int): Zero based index of the first page to extract.
+    - stop (int): Index one past the last page to extract.
+    - cache (ContentCache): Optional cache of extracted text keyed by page content.
+    - triage_pages (bool): Whether to skip pages that cannot yield a truss.
+    - text_backend (str): The name of the extraction backend, a key of TEXT_BACKENDS.
+    - char_maps (dict): Font character maps of the document other ranges built, see FontCache.
 
     Returns:
-    list: A list where each element is a string containing the text of a page.
+    tuple: The text of pages start to stop - 1, in page order, None for skipped pages,
+    and the FontCache of the range holding the maps it built.
+    """
+    font_cache = FontCache(char_maps)
+    with as_pdf_source(pdf_file_path).open() as pdf_import:
+        pdf = PyPDF2.PdfReader(pdf_import)
+        return list(iter_page_range(pdf, start, stop, cache, triage_pages, text_backend, font_cache)), font_cache
+
+
+def split_page_range(page_count, workers):
+    """Splits the pages into contiguous (start, stop) chunks for the worker pool."""
+    chunk_size = max(1, min(MAX_CHUNK_PAGES, page_count // (workers * CHUNKS_PER_WORKER)))
+    return [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+
+
+def chunk_result(start, stop, future, font_cache):
+    """Returns the pages of a finished chunk, or empty pages if its worker failed, adopting its font maps."""
+    try:
+        pages, chunk_font_cache = future.result()
+        font_cache.merge(chunk_font_cache)
+        return pages
+    except Exception as e:
+        print(f"An error occurred on pages {start + 1}-{stop}: {e}")
+        return [''] * (stop - start)
+
+
+def iter_pdf_parallel(pdf_file_path, page_count, workers, cache=None, triage_pages=False,
+                      text_backend=DEFAULT_TEXT_BACKEND, font_cache=None):
     """
-    
-    # Load PDF file into the program
+    Extracts the pages of a PDF across a process pool, yielding them in page order.
+
+    Only a bounded window of chunks is submitted ahead of the consumer. A chunk whose
+    worker fails outright yields empty strings for its pages rather than failing the
+    whole document.
+
+    The font character maps every finished chunk built are merged into font_cache and
+    handed to the chunks submitted after it, so past the first window workers no
+    longer build the fonts of the document.
+    """
+    if font_cache is None:
+        font_cache = FontCache()
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start, stop in split_page_range(page_count, workers):
+            future = executor.submit(read_page_range, pdf_file_path, start, stop, cache, triage_pages, text_backend,
+                                     dict(font_cache.char_maps))
+            in_flight.append((start, stop, future))
+            if len(in_flight) < workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                continue
+            yield from chunk_result(*in_flight.popleft(), font_cache)
+
+        while in_flight:
+            yield from chunk_result(*in_flight.popleft(), font_cache)
+
+
+def iter_pdf(pdf_file_path, workers=1, cache=None, progress=None, triage_pages=False,
+             text_backend=DEFAULT_TEXT_BACKEND, raise_errors=False):
+    """
+    Lazily reads a PDF, yielding the text of one page at a time.
+
+    Parameters:
+    - pdf_file_path (str or PdfSource): The full path to the PDF file to read, or a
+      PdfSource holding an upload in memory or in a temporary file. A source in memory
+      read with more than one worker is spooled once to a temp file the workers open.
+    - workers (int): Number of worker processes used for extraction. 1 reads the
+      pages serially in this process, None uses one worker per CPU.
+    - cache (ContentCache): Optional cache of extracted text, only pages whose
+      content is not in the cache are extracted.
+    - progress (callable): Optional callback, called as
+      progress('read_pdf', pages_done, page_count) after each page.
+    - triage_pages (bool): Whether to skip the text extraction of pages that can
+      never yield a truss, only pages that may be the first page of a truss design or
+      its 'Page 2' continuation are extracted. The number skipped is printed and counted.
+    - text_backend (str): The name of the extraction backend, a key of TEXT_BACKENDS.
+      'stream' decodes the content streams directly and is several times faster on
+      text-only drawings, pages it cannot reproduce are handed to PyPDF2.
+    - raise_errors (bool): Raise PdfReadError when the file cannot be opened or read,
+      instead of printing the error and yielding no pages.
+
+    Yields:
+    str: The text of each page in page order. A page that fails to extract, or is
+    skipped by triage, is yielded as an empty string.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    text_backend_function(text_backend)
+    source = as_pdf_source(pdf_file_path)
+    font_cache = FontCache()
+
+    # Load PDF file into the program, straight from memory or a memory mapped file
     try:
-        with open(pdf_file_path, "rb") as pdf_import:
+        with source.open() as pdf_import:
             pdf = PyPDF2.PdfReader(pdf_import)
-            page_storage = []
-            
-            # Parse through all pages and store text as strings in a list
-            for page in range(len(pdf.pages)):
-                page_storage.append(pdf.pages[page].extract_text())
-
-        return page_storage
-    
-    except FileNotFoundError:
-        print(f"Error: The file '{pdf_file_path}' was not found.")
-        return []
+            page_count = len(pdf.pages)
+
+            if workers <= 1 or page_count < 2:
+                pages = iter_page_range(pdf, 0, page_count, cache, triage_pages, text_backend, font_cache)
+                yield from counted_pages(pages, page_count, progress)
+                record_font_cache(font_cache)
+                return
+
+    except FileNotFoundError as e:
+        if raise_errors:
+            raise PdfReadError(f"The file '{source.path}' was not found") from e
+        print(f"Error: The file '{source.path}' was not found.")
+        return
     except Exception as e:
+        if raise_errors:
+            raise PdfReadError(f"The PDF could not be read: {e}") from e
         print(f"An error occurred: {e}")
-        return []
\ No newline at end of file
+        return
+
+    pages = iter_pdf_parallel(source.spool(), page_count, workers, cache, triage_pages, text_backend, font_cache)
+    yield from counted_pages(pages, page_count, progress)
+    record_font_cache(font_cache)
+
+
+def record_font_cache(font_cache):
+    """Counts the font map lookups of a document and the time spent building the maps"""
+    if not (font_cache.hits or font_cache.misses):
+        return
+    FONT_CACHE_LOOKUPS.inc_many({('hit',): font_cache.hits, ('miss',): font_cache.misses})
+    FONT_MAP_BUILD_SECONDS.inc(amount=font_cache.build_seconds)
+
+
+def counted_pages(texts, page_count, progress=None):
+    """Yields the page texts, skipped pages as empty strings, reporting progress and the pages skipped"""
+    skipped = 0
+    for page, text in enumerate(texts):
+        if text is None:
+            skipped += 1
+            text = ''
+        yield text
+        if progress is not None:
+            progress('read_pdf', page + 1, page_count)
+    if skipped:
+        PAGES_SKIPPED.inc(amount=skipped)
+        print(f"Triage skipped text extraction on {skipped} of {page_count} pages")
+
+
+def read_pdf(pdf_file_path, workers=1, cache=None, text_backend=DEFAULT_TEXT_BACKEND):
+    """
+    Reads and extracts text from each page of a PDF file.
+
+    Parameters:
+    - pdf_file_path (str or PdfSource): The full path to the PDF file to read, or a
+      PdfSource, see iter_pdf.
+    - workers (int): Number of worker processes used for extraction. 1 reads the
+      pages serially in this process, None uses one worker per CPU.
+    - cache (ContentCache): Optional cache of extracted text, only pages whose
+      content is not in the cache are extracted.
+    - text_backend (str): The name of the extraction backend, see iter_pdf.
+
+    Returns:
+    list: A list where each element is a string containing the text of a page.
+    A page that fails to extract is stored as an empty string.
+    """
+    return list(iter_pdf(pdf_file_path, workers=workers, cache=cache, text_backend=text_backend))
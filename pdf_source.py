@@ -0,0 +1,150 @@
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# SCRIPT FOR THE SOURCE OF THE PDF BEING ANALYSED
+# An upload is read straight from the request stream instead of being saved and
+# reopened: small files stay in memory, larger ones are spooled once to a temporary
+# file that is memory mapped for reading. A PDF on disk is mapped in place.
+
+# Uploads up to this size are held in memory, larger ones are spooled to a temp file
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+# Bytes copied at a time when spooling a stream
+COPY_BLOCK_BYTES = 1024 * 1024
+
+
+class PdfSource:
+    def __init__(self, name, data=None, path=None, temporary=False):
+        # File name the results are named after, e.g. 'plans.pdf'
+        self.name = name
+        # The PDF bytes when held in memory, otherwise None
+        self.data = data
+        # The PDF file when on disk, otherwise None
+        self.path = path
+        # True when path is a spool file this source removes on close
+        self.temporary = temporary
+        self.content_digest = None
+
+    @classmethod
+    def from_path(cls, pdf_file_path):
+        """A source reading a PDF file in place"""
+        return cls(os.path.basename(pdf_file_path), path=pdf_file_path)
+
+    @classmethod
+    def from_stream(cls, stream, name, spool_max_bytes=SPOOL_MAX_BYTES, spool_dir=None):
+        """
+        Ingests a binary stream, e.g. an uploaded file, without saving it under its name.
+
+        Parameters:
+        - stream (file-like): The PDF bytes, read from its current position to the end.
+        - name (str): File name the results are named after.
+        - spool_max_bytes (int): Streams larger than this are spooled to a temp file.
+        - spool_dir (str): Directory of the temp file, the system temp directory if None.
+
+        Returns:
+        PdfSource: The source, in memory or backed by a temporary file.
+        """
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        while len(buffer) <= spool_max_bytes:
+            block = stream.read(COPY_BLOCK_BYTES)
+            if not block:
+                source = cls(name, data=bytes(buffer))
+                source.content_digest = digest.hexdigest()
+                return source
+            digest.update(block)
+            buffer += block
+
+        # Too large to hold, copy what was read and the rest of the stream to disk once
+        spool = tempfile.NamedTemporaryFile(prefix='upload-', suffix='.pdf', dir=spool_dir, delete=False)
+        try:
+            with spool:
+                spool.write(buffer)
+                del buffer
+                for block in iter(lambda: stream.read(COPY_BLOCK_BYTES), b''):
+                    digest.update(block)
+                    spool.write(block)
+        except Exception:
+            os.remove(spool.name)
+            raise
+        source = cls(name, path=spool.name, temporary=True)
+        source.content_digest = digest.hexdigest()
+        return source
+
+    @contextmanager
+    def open(self):
+        """
+        Opens the PDF for PdfReader as a seekable binary stream.
+
+        Yields:
+        file-like: A BytesIO over the bytes in memory, or a read only memory map of
+        the file so pages are paged in by the OS as PyPDF2 seeks to them.
+        """
+        if self.data is not None:
+            yield io.BytesIO(self.data)
+            return
+
+        with open(self.path, 'rb') as pdf_file:
+            if os.fstat(pdf_file.fileno()).st_size == 0:
+                # An empty file cannot be mapped, let PdfReader report it
+                yield pdf_file
+                return
+            with mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def exists(self):
+        """False only for a file source whose file is missing"""
+        return self.data is not None or os.path.exists(self.path)
+
+    def content_hash(self):
+        """Returns the SHA-256 hex digest of the PDF bytes."""
+        if self.content_digest is None:
+            digest = hashlib.sha256()
+            with self.open() as pdf_stream:
+                for block in iter(lambda: pdf_stream.read(COPY_BLOCK_BYTES), b''):
+                    digest.update(block)
+            self.content_digest = digest.hexdigest()
+        return self.content_digest
+
+    def spool(self, spool_dir=None):
+        """
+        Returns a path other processes can open the PDF from, writing the in memory
+        bytes to a temporary file the first time it is needed.
+        """
+        if self.path is None:
+            with tempfile.NamedTemporaryFile(prefix='upload-', suffix='.pdf', dir=spool_dir, delete=False) as spool:
+                spool.write(self.data)
+            self.path = spool.name
+            self.temporary = True
+        return self.path
+
+    def persist(self, file_path):
+        """Keeps a copy of the original PDF, for when uploads are retained"""
+        if self.data is not None:
+            with open(file_path, 'wb') as retained:
+                retained.write(self.data)
+        else:
+            shutil.copyfile(self.path, file_path)
+        return file_path
+
+    def close(self):
+        """Releases the bytes in memory and removes a temporary file"""
+        self.data = None
+        if self.temporary and self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        if self.temporary:
+            self.path = None
+
+    def __repr__(self):
+        where = 'memory' if self.data is not None else self.path
+        return f'PdfSource({self.name!r}, {where!r})'
+
+
+def as_pdf_source(pdf):
+    """A PdfSource for a file path, a PdfSource is returned unchanged"""
+    return pdf if isinstance(pdf, PdfSource) else PdfSource.from_path(pdf)
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import os
+from truss_record import FIELDS
+from validation_rules import COLUMNS, PASS, FAIL
+
+# SCRIPT TO WRITE THE TRUSS RECORDS AND VERDICTS AS JSON, NDJSON OR CSV
+# Machine readable alternatives to the results workbook. Every writer is a generator
+# of text chunks, one truss at a time, so a file or an HTTP response can be streamed
+# without building the whole document in memory.
+
+OUTPUT_FORMATS = ('xlsx', 'json', 'ndjson', 'csv')
+
+CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+VERDICTS = {PASS: 'pass', FAIL: 'fail'}
+
+# Columns telling how many design pages carry a record and whether its label conflicts
+OCCURRENCE_FIELDS = ('occurrences', 'pages', 'conflict')
+
+# Field name of every results column
+COLUMN_FIELDS = dict(zip(COLUMNS, FIELDS))
+
+
+def records_file_path(pdf_file_name, output_format, directory_path=None):
+    """Path of the records file of a PDF, next to where its workbook would be written"""
+    if directory_path is None:
+        directory_path = os.getcwd()
+    return os.path.join(directory_path, f'Truss Review Results_{pdf_file_name}.{output_format}')
+
+
+def checked_fields(results):
+    """Fields carrying a verdict, in column order"""
+    return [COLUMN_FIELDS[column] for column in COLUMNS if column in results]
+
+
+def iter_rows(truss_dictionary, results):
+    """
+    Yields one dictionary per truss with its values and validation verdicts.
+
+    Parameters:
+    - truss_dictionary (dict): Truss labels mapped to their TrussRecord.
+    - results (dict): Column letter mapped to the PASS/FAIL/SKIP mask of each truss,
+      as returned by validation_rules.evaluate_rules.
+
+    Yields:
+    dict: The fields of the truss, the number of design pages carrying it
+    ('occurrences'), their page numbers ('pages'), whether its label is also found
+    with different values ('conflict') and a 'checks' dictionary of 'pass', 'fail' or
+    'skip' per checked field.
+    """
+    fields = checked_fields(results)
+    masks = [results[column] for column in COLUMNS if column in results]
+    for row, record in enumerate(truss_dictionary.values()):
+        data = dict(zip(FIELDS, record.cells()))
+        data.update(occurrences=record.occurrences, pages=record.pages, conflict=record.conflict)
+        data['checks'] = {field: VERDICTS.get(mask[row], 'skip') for field, mask in zip(fields, masks)}
+        yield data
+
+
+def iter_json(truss_dictionary, results):
+    """Streams the rows as a JSON array"""
+    yield '['
+    for index, data in enumerate(iter_rows(truss_dictionary, results)):
+        yield (',\n' if index else '\n') + json.dumps(data)
+    yield '\n]\n'
+
+
+def iter_ndjson(truss_dictionary, results):
+    """Streams the rows as newline delimited JSON, one truss per line"""
+    for data in iter_rows(truss_dictionary, results):
+        yield json.dumps(data) + '\n'
+
+
+def iter_csv(truss_dictionary, results):
+    """
+    Streams the rows as CSV with the occurrence columns and a verdict column after the
+    fields. The source pages are separated by semicolons.
+    """
+    fields = checked_fields(results)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush(row):
+        writer.writerow(row)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield flush(list(FIELDS) + list(OCCURRENCE_FIELDS) + [f'{field}_check' for field in fields])
+    for data in iter_rows(truss_dictionary, results):
+        occurrences = [data['occurrences'], ';'.join(map(str, data['pages'])), data['conflict']]
+        yield flush([data[field] for field in FIELDS] + occurrences + [data['checks'][field] for field in fields])
+
+
+WRITERS = {
+    'json': iter_json,
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+}
+
+
+def write_records(truss_dictionary, results, output_format, file_path):
+    """
+    Streams the truss records and verdicts to a file.
+
+    Parameters:
+    - truss_dictionary (dict): Truss labels mapped to their TrussRecord.
+    - results (dict): The validation masks from validation_rules.evaluate_rules.
+    - output_format (str): One of 'json', 'ndjson' or 'csv'.
+    - file_path (str): The path of the file to write.
+
+    Returns:
+    str: The path of the written file.
+    """
+    with open(file_path, 'w', encoding='utf-8', newline='') as export:
+        for chunk in WRITERS[output_format](truss_dictionary, results):
+            export.write(chunk)
+    return file_path
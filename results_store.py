@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from truss_record import FIELDS, TEXT_FIELDS
+from validation_rules import VALIDATION_RULES, PASS, FAIL, SKIP
+
+# SCRIPT FOR THE LOCAL STORE OF ANALYSIS RESULTS ACROSS JOBS
+# Every analysed document is saved to an embedded SQLite database: one row per job,
+# one per truss with its typed fields and one per truss and rule with the verdict, so
+# questions across past submittals are answered without re-reading a PDF or workbook.
+
+RESULTS_DB = 'results.sqlite3'
+
+VERDICT_NAMES = {PASS: 'pass', FAIL: 'fail', SKIP: 'skip'}
+
+# Columns after the truss fields: how many design pages carry a record, which ones,
+# and whether its label is also found with different values
+OCCURRENCE_COLUMNS = (('occurrences', 'INTEGER'), ('source_pages', 'TEXT'), ('conflict', 'INTEGER'))
+TRUSS_COLUMNS = ('job_id', 'row') + FIELDS + tuple(name for name, _ in OCCURRENCE_COLUMNS)
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        project TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        analysed_at REAL NOT NULL,
+        truss_count INTEGER NOT NULL,
+        input_data TEXT NOT NULL
+    )''',
+    'CREATE TABLE IF NOT EXISTS trusses (job_id TEXT NOT NULL, row INTEGER NOT NULL, '
+    + ', '.join(f"{field} {'TEXT' if field in TEXT_FIELDS else 'REAL'}" for field in FIELDS)
+    + ''.join(f', {name} {column_type}' for name, column_type in OCCURRENCE_COLUMNS)
+    + ', PRIMARY KEY (job_id, row)) WITHOUT ROWID',
+    '''CREATE TABLE IF NOT EXISTS verdicts (
+        job_id TEXT NOT NULL,
+        row INTEGER NOT NULL,
+        rule TEXT NOT NULL,
+        verdict INTEGER NOT NULL,
+        PRIMARY KEY (job_id, rule, row)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS jobs_project ON jobs (project, job_id)',
+    'CREATE INDEX IF NOT EXISTS jobs_file_name ON jobs (file_name, job_id)',
+    'CREATE INDEX IF NOT EXISTS jobs_analysed_at ON jobs (analysed_at)',
+    'CREATE INDEX IF NOT EXISTS trusses_label ON trusses (label)',
+    'CREATE INDEX IF NOT EXISTS verdicts_rule ON verdicts (rule, verdict)',
+]
+
+RULE_NAMES = [rule['name'] for rule in VALIDATION_RULES]
+
+
+class ResultsStore:
+    def __init__(self, db_path=RESULTS_DB):
+        self.db_path = db_path
+        with closing(self.connect()) as connection, connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            # Stores created before the occurrence columns existed gain them empty
+            existing = {row['name'] for row in connection.execute('PRAGMA table_info(trusses)')}
+            for name, column_type in OCCURRENCE_COLUMNS:
+                if name not in existing:
+                    connection.execute(f'ALTER TABLE trusses ADD COLUMN {name} {column_type}')
+            # Planner statistics are gathered once at startup, sampling a bounded number
+            # of rows per index, so filters use the most selective index
+            connection.execute('PRAGMA analysis_limit=1000')
+            connection.execute('ANALYZE')
+
+    def connect(self):
+        """A new connection, each call opens its own so jobs in threads and processes can share the file"""
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        # Readers are never blocked by a job writing its results
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def save_job(self, project, file_name, truss_dictionary, results, input_data, job_id=None):
+        """
+        Saves the records and verdicts of one analysed document in a single transaction.
+
+        Parameters:
+        - project (str): The project the submittal belongs to, may be empty.
+        - file_name (str): The name of the analysed PDF.
+        - truss_dictionary (dict): Truss labels mapped to their TrussRecord.
+        - results (dict): The validation masks from validation_rules.evaluate_rules.
+        - input_data (dict): The design criteria the trusses were checked against.
+        - job_id (str): Id to save the job under, a new one is generated if not given.
+
+        Returns:
+        str: The job id.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        truss_rows = [
+            (job_id, row, *record.cells(), record.occurrences, ', '.join(map(str, record.pages)), int(record.conflict))
+            for row, record in enumerate(truss_dictionary.values())
+        ]
+        verdict_rows = [
+            (job_id, row, rule['name'], verdict)
+            for rule in VALIDATION_RULES if rule['columns'][0] in results
+            for row, verdict in enumerate(results[rule['columns'][0]])
+        ]
+
+        with closing(self.connect()) as connection:
+            with connection:
+                # A job saved again replaces its previous results
+                for table in ('jobs', 'trusses', 'verdicts'):
+                    connection.execute(f'DELETE FROM {table} WHERE job_id = ?', (job_id,))
+                connection.execute(
+                    'INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?)',
+                    (job_id, project or '', file_name, time.time(), len(truss_rows), json.dumps(input_data)),
+                )
+                connection.executemany(
+                    f"INSERT INTO trusses ({', '.join(TRUSS_COLUMNS)}) VALUES ({', '.join('?' * len(TRUSS_COLUMNS))})",
+                    truss_rows,
+                )
+                connection.executemany('INSERT INTO verdicts VALUES (?, ?, ?, ?)', verdict_rows)
+            # Refreshes only the statistics of tables that changed enough since they were gathered
+            connection.execute('PRAGMA analysis_limit=1000')
+            connection.execute('PRAGMA optimize')
+        return job_id
+
+    def query(self, sql, parameters=()):
+        """Run a read query and return its rows as dictionaries"""
+        with closing(self.connect()) as connection:
+            return [dict(row) for row in connection.execute(sql, parameters)]
+
+    def jobs(self, project=None, file_name=None):
+        """The saved jobs, newest first, optionally of one project or file"""
+        conditions, parameters = filter_conditions({'jobs.project': project, 'jobs.file_name': file_name})
+        return self.query(
+            f'SELECT job_id, project, file_name, analysed_at, truss_count FROM jobs {conditions} '
+            'ORDER BY analysed_at DESC',
+            parameters,
+        )
+
+    def trusses(self, rule=None, verdict=None, project=None, file_name=None, label=None, limit=None, **field_values):
+        """
+        Finds trusses across every saved job.
+
+        Parameters:
+        - rule (str): Only trusses with a verdict on this validation rule, e.g. 'live_deflection'.
+        - verdict (str): Only trusses with this verdict on the rule: 'pass', 'fail' or 'skip'.
+        - project (str): Only jobs of this project.
+        - file_name (str): Only jobs of this PDF.
+        - label (str): Only trusses with this label.
+        - limit (int): Maximum number of trusses returned, all when None.
+        - field_values: Only trusses whose TrussRecord field equals the value, e.g.
+          live_deflection_criteria=360.
+
+        Returns:
+        list: A dictionary per truss with its job, project, file, fields, occurrences,
+        source pages, conflict flag and, when a rule is given, its verdict on that rule.
+        """
+        unknown = set(field_values) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown truss fields: {', '.join(sorted(unknown))}")
+        if rule is not None and rule not in RULE_NAMES:
+            raise ValueError(f"Unknown rule '{rule}'")
+        verdicts = {name: value for value, name in VERDICT_NAMES.items()}
+        if verdict is not None and verdict not in verdicts:
+            raise ValueError(f"Unknown verdict '{verdict}', expected pass, fail or skip")
+
+        filters = {'jobs.project': project, 'jobs.file_name': file_name, 'trusses.label': label}
+        filters.update({f'trusses.{field}': value for field, value in field_values.items()})
+        columns = 'jobs.job_id, jobs.project, jobs.file_name, '
+        columns += ', '.join(f'trusses.{column}' for column in TRUSS_COLUMNS[2:])
+        joins = 'FROM trusses JOIN jobs ON jobs.job_id = trusses.job_id'
+        if rule is not None:
+            columns += ', verdicts.rule, verdicts.verdict'
+            joins += ' JOIN verdicts ON verdicts.job_id = trusses.job_id AND verdicts.row = trusses.row'
+            filters['verdicts.rule'] = rule
+            filters['verdicts.verdict'] = verdicts.get(verdict)
+
+        conditions, parameters = filter_conditions(filters)
+        sql = f'SELECT {columns} {joins} {conditions} ORDER BY jobs.analysed_at, trusses.row'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        rows = self.query(sql, parameters)
+        for row in rows:
+            if row['conflict'] is not None:
+                row['conflict'] = bool(row['conflict'])
+            if 'verdict' in row:
+                row['verdict'] = VERDICT_NAMES[row['verdict']]
+        return rows
+
+    def failure_counts(self, project=None):
+        """Number of failing trusses per rule across the saved jobs, optionally of one project"""
+        sql = 'SELECT COUNT(*) FROM verdicts WHERE rule = ? AND verdict = ?'
+        if project is not None:
+            sql += ' AND job_id IN (SELECT job_id FROM jobs WHERE project = ?)'
+        counts = {}
+        with closing(self.connect()) as connection:
+            # One seek per rule on the (rule, verdict) index instead of scanning every verdict
+            for rule in RULE_NAMES:
+                parameters = (rule, FAIL) if project is None else (rule, FAIL, project)
+                failures = connection.execute(sql, parameters).fetchone()[0]
+                if failures:
+                    counts[rule] = failures
+        return counts
+
+
+def filter_conditions(filters):
+    """Builds a WHERE clause and its parameters from column filters, None filters are ignored"""
+    filters = {column: value for column, value in filters.items() if value is not None}
+    if not filters:
+        return '', ()
+    return 'WHERE ' + ' AND '.join(f'{column} = ?' for column in filters), tuple(filters.values())
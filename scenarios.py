@@ -0,0 +1,105 @@
+import re
+from user_input import get_input_data
+from validation_rules import VALIDATION_RULES, PASS, FAIL
+
+# SCRIPT FOR THE WHAT-IF VALIDATION OF ONE DOCUMENT AGAINST SEVERAL CRITERIA SETS
+# The PDF is read and parsed once, every scenario is evaluated in one pass over the
+# same parsed columns (validation_rules.evaluate_scenarios), and the trusses whose
+# verdict changes between scenarios are listed on the comparison sheet.
+
+# Criteria sets accepted in one request
+MAX_SCENARIOS = 20
+
+COMPARISON_SHEET = 'Comparison'
+
+# Excel sheet titles are at most 31 characters and cannot hold []:*?/\
+SHEET_TITLE_LENGTH = 31
+INVALID_TITLE_CHARACTERS = re.compile(r'[\[\]:*?/\\]')
+
+
+def scenario_criteria(specs, base=None):
+    """
+    Builds the design criteria of each scenario.
+
+    Parameters:
+    - specs (list): One dictionary per scenario, keyed as the arguments of
+      get_input_data, with an optional 'name'.
+    - base (dict): Criteria from get_input_data that scenarios leave unchanged,
+      missing criteria take the get_input_data defaults without one.
+
+    Returns:
+    list: (name, input_data) pairs, in the given order.
+    """
+    if not isinstance(specs, list) or not specs:
+        raise ValueError('Scenarios must be a non-empty list of criteria sets')
+    if len(specs) > MAX_SCENARIOS:
+        raise ValueError(f'At most {MAX_SCENARIOS} scenarios can be compared at once')
+
+    scenarios = []
+    for number, spec in enumerate(specs, start=1):
+        if not isinstance(spec, dict):
+            raise ValueError(f'Scenario {number} must be a dictionary of criteria')
+        spec = dict(spec)
+        name = str(spec.pop('name', '') or f'Scenario {number}')
+        try:
+            scenarios.append((name, get_input_data(**{**(base or {}), **spec})))
+        except TypeError as e:
+            raise ValueError(f'Scenario {number}: {str(e)}')
+    return scenarios
+
+
+def sheet_titles(names):
+    """Unique valid sheet titles for the scenario names, never the comparison sheet title"""
+    titles = []
+    taken = {COMPARISON_SHEET.lower()}
+    for name in names:
+        base = INVALID_TITLE_CHARACTERS.sub('-', name).strip("' ")[:SHEET_TITLE_LENGTH] or 'Scenario'
+        title, copy = base, 2
+        while title.lower() in taken:
+            suffix = f' ({copy})'
+            title = base[:SHEET_TITLE_LENGTH - len(suffix)] + suffix
+            copy += 1
+        taken.add(title.lower())
+        titles.append(title)
+    return titles
+
+
+def changed_criteria(scenarios):
+    """The criteria keys whose value differs between scenarios, in get_input_data order"""
+    keys = list(scenarios[0][1])
+    return [key for key in keys if len({input_data[key] for _, input_data in scenarios}) > 1]
+
+
+def verdict_flips(labels, scenario_results, rules=VALIDATION_RULES):
+    """
+    Finds the trusses that pass a check in one scenario and fail it in another.
+
+    Parameters:
+    - labels (list): The truss labels, in row order.
+    - scenario_results (list): The masks of each scenario from evaluate_scenarios.
+    - rules (list): The rule table the masks were evaluated with.
+
+    Returns:
+    list: One dictionary per flipping truss, its 'label', its overall PASS/FAIL
+    'verdicts' in each scenario and the names of the 'rules' that changed.
+    """
+    rule_masks = [
+        (rule['name'], [results[rule['columns'][0]] for results in scenario_results])
+        for rule in rules if rule['columns'][0] in scenario_results[0]
+    ]
+    flips = []
+    for row, label in enumerate(labels):
+        changed = []
+        failed = [False] * len(scenario_results)
+        for name, masks in rule_masks:
+            verdicts = [mask[row] for mask in masks]
+            if PASS in verdicts and FAIL in verdicts:
+                changed.append(name)
+            failed = [f or verdict == FAIL for f, verdict in zip(failed, verdicts)]
+        if changed:
+            flips.append({
+                'label': label,
+                'verdicts': [FAIL if f else PASS for f in failed],
+                'rules': changed,
+            })
+    return flips
@@ -1,5 +1,7 @@
 import re
-from pattern import regex_dict
+from page_scanner import PAGE1_ROLE
+from page_index import PageIndex
+from truss_record import TrussRecord
 
 def find_patterns(page, regex_dict):
     """
@@ -31,41 +33,45 @@ def find_patterns(page, regex_dict):
         'warning_found': re.findall(regex_dict['warning_pattern'], page),
     }
 
-def extract_truss_label(page_patterns, truss_dictionary, truss_key):
-    """Extracts and stores the truss label if found."""
-    truss_dictionary[truss_key] = [truss_key]  # Initialize with the truss key
+def extract_truss_label(page_patterns, truss_key):
+    """Starts the record of a truss from its label."""
+    return TrussRecord(truss_key)
 
-def extract_design_loads(page_patterns, truss_dictionary, truss_key):
-    """Extracts design loads and appends them to the truss dictionary."""
+def extract_design_loads(page_patterns, record):
+    """Extracts the top and bottom chord dead and live loads."""
     if page_patterns['design_load_found']:
         loads = [load.strip('BCDL *') for load in page_patterns['design_load_found'][0].split('\n')]
-        truss_dictionary[truss_key].extend([loads[1], loads[3], loads[0], loads[2]])
+        record.set_text('top_chord_dead_load', loads[1])
+        record.set_text('bottom_chord_dead_load', loads[3])
+        record.set_text('top_chord_live_load', loads[0])
+        record.set_text('bottom_chord_live_load', loads[2])
 
-def extract_slope(page_patterns, truss_dictionary, truss_key):
-    """Extracts roof or floor slope and appends it to the truss dictionary."""
+def extract_slope(page_patterns, record):
+    """Extracts the roof slope, floor trusses have a slope of zero."""
     if page_patterns['roof_slope_found']:
-        truss_dictionary[truss_key].append(page_patterns['roof_slope_found'][0])
+        record.set_text('slope', page_patterns['roof_slope_found'][0])
     else:
-        truss_dictionary[truss_key].append('0.00')
+        record.slope = 0.0
 
-def extract_spacing(page_patterns, truss_dictionary, truss_key):
-    """Extracts truss spacing and appends it to the truss dictionary."""
+def extract_spacing(page_patterns, record):
+    """Extracts the truss spacing."""
     if page_patterns['truss_spacing_found']:
-        truss_dictionary[truss_key].append(page_patterns['truss_spacing_found'][0].split('-')[0].strip('Code'))
+        record.set_text('spacing', page_patterns['truss_spacing_found'][0].split('-')[0].strip('Code'))
 
-def extract_wind_data(page_patterns, truss_dictionary, truss_key):
-    """Extracts wind standard and wind speed, and appends them to the truss dictionary."""
+def extract_wind_data(page_patterns, record):
+    """Extracts the wind standard and wind speed."""
     wind_standard = page_patterns['wind_standard_found'][0].strip('Wind: ') if page_patterns['wind_standard_found'] else 'NA'
     wind_speed = page_patterns['wind_speed_found'][0].strip('Vult= mph') if page_patterns['wind_speed_found'] else 'NA'
-    truss_dictionary[truss_key].extend([wind_standard, wind_speed])
+    record.set_text('wind_standard', wind_standard)
+    record.set_text('wind_speed', wind_speed)
 
-def extract_risk_category(page_patterns, truss_dictionary, truss_key):
-    """Extracts risk category and appends it to the truss dictionary."""
+def extract_risk_category(page_patterns, record):
+    """Extracts the risk category."""
     risk_category = page_patterns['risk_category_found'][0].strip('Cat.\n') if page_patterns['risk_category_found'] else 'NA'
-    truss_dictionary[truss_key].append(risk_category)
+    record.set_text('risk_category', risk_category)
 
-def extract_building_code(page_patterns, truss_dictionary, truss_key):
-    """Extracts building code and appends it to the truss dictionary."""
+def extract_building_code(page_patterns, record):
+    """Extracts the building code."""
     if page_patterns['building_code_found']:
         code, year = '', ''
         for char in page_patterns['building_code_found'][0]:
@@ -73,74 +79,199 @@ def extract_building_code(page_patterns, truss_dictionary, truss_key):
                 code += char
             elif char.isdigit():
                 year += char
-        truss_dictionary[truss_key].append(f"{code} {year}")
+        record.set_text('building_code', f"{code} {year}")
 
-def extract_max_member_stress(page_patterns, truss_dictionary, truss_key):
-    """Extracts max member stress values and appends them to the truss dictionary."""
+def extract_max_member_stress(page_patterns, record):
+    """Extracts the max top chord, bottom chord and web stresses."""
     if page_patterns['max_member_stress_found']:
         stresses = [stress.strip('DEFL') for stress in page_patterns['max_member_stress_found'][0].split('\n')]
-        truss_dictionary[truss_key].extend(stresses)
+        for field, stress in zip(('top_chord_stress', 'bottom_chord_stress', 'web_stress'), stresses):
+            record.set_text(field, stress)
 
-def extract_deflection_criteria(page_patterns, truss_dictionary, truss_key):
-    """Extracts deflection criteria and appends them to the truss dictionary."""
+def extract_deflection_criteria(page_patterns, record):
+    """Extracts the deflection criteria and the calculated deflections."""
     if page_patterns['design_deflection_criteria_found']:
         deflection_criteria = page_patterns['design_deflection_criteria_found'][0].split('\n')
-        truss_dictionary[truss_key].extend([deflection_criteria[1], deflection_criteria[2]])
+        record.set_text('live_deflection_criteria', deflection_criteria[1])
+        record.set_text('total_deflection_criteria', deflection_criteria[2])
     else:
-        truss_dictionary[truss_key].extend(['NA', 'NA'])
+        record.set_text('live_deflection_criteria', 'NA')
+        record.set_text('total_deflection_criteria', 'NA')
 
     if page_patterns['actual_deflection_found']:
         actual_deflection = [d.strip('><') for d in page_patterns['actual_deflection_found'][0].split('\n')]
-        truss_dictionary[truss_key].extend([actual_deflection[1], actual_deflection[2]])
+        record.set_text('live_deflection', actual_deflection[1])
+        record.set_text('total_deflection', actual_deflection[2])
 
-def extract_drag_load(page_patterns, page_storage, index, truss_dictionary, truss_key):
-    """Extracts drag load and appends it to the truss dictionary, including checks on subsequent pages."""
+def first_drag_load(drag_load_found):
+    """The first number of a drag load sentence, or None."""
+    for load in drag_load_found[0].split(' '):
+        if re.search(r'\d+', load):
+            return load
+    return None
+
+def extract_drag_load(page_patterns, continuation_patterns, record):
+    """Extracts the drag load, from the 'Page 2' continuation when page 1 has none."""
     if page_patterns['drag_load_found']:
-        for load in page_patterns['drag_load_found'][0].split(' '):
-            if re.search(r'\d+', load):
-                truss_dictionary[truss_key].append(load)
-    elif index + 1 < len(page_storage):
-        next_page_patterns = find_patterns(page_storage[index + 1], regex_dict)
-        if next_page_patterns['drag_load_found'] and re.findall(r'Page 2', page_storage[index + 1]):
-            for load in next_page_patterns['drag_load_found'][0].split(' '):
-                if re.search(r'\d+', load):
-                    truss_dictionary[truss_key].append(load)
-        else:
-            truss_dictionary[truss_key].append('-')
+        drag_load = first_drag_load(page_patterns['drag_load_found'])
+    elif continuation_patterns is not None and continuation_patterns['drag_load_found']:
+        drag_load = first_drag_load(continuation_patterns['drag_load_found'])
     else:
-        truss_dictionary[truss_key].append('-')
+        drag_load = '-'
+
+    if drag_load is not None:
+        record.set_text('drag_load', drag_load)
 
-def extract_warning(page_patterns, truss_dictionary, truss_key):
-    """Extracts warning data and appends it to the truss dictionary."""
+def extract_warning(page_patterns, record):
+    """Extracts the required bearing warning."""
     warning = page_patterns['warning_found'][0].strip(': Required bearing') if page_patterns['warning_found'] else '-'
-    truss_dictionary[truss_key].append(warning)
+    record.set_text('warning', warning)
+
+# Extract functions of a design page, in the order they are run
+PAGE_EXTRACTORS = (
+    extract_design_loads,
+    extract_slope,
+    extract_spacing,
+    extract_wind_data,
+    extract_risk_category,
+    extract_building_code,
+    extract_max_member_stress,
+    extract_deflection_criteria,
+    extract_warning,
+)
+
+# Extract functions that also read the 'Page 2' continuation of a design page
+CONTINUATION_EXTRACTORS = (
+    extract_drag_load,
+)
+
+def iter_truss_records(regex_dict, pages, page_index=None, page_extractors=PAGE_EXTRACTORS,
+                       continuation_extractors=CONTINUATION_EXTRACTORS):
+    """
+    Streams truss records from an iterable of page texts.
+
+    Every page is scanned once, into the page index, with a single page of lookahead
+    so the drag load of a design page can be read from its continuation. Page texts
+    are dropped once indexed, only the page index, a few entries per page, grows
+    with the page count. A design page reprinted with the same text, and the
+    same continuation, is not parsed again: its record is copied from the first.
+
+    Parameters:
+    - regex_dict (dict): The dictionary containing regex patterns.
+    - pages (iterable): The text of each page, e.g. from pdf_reader.iter_pdf.
+    - page_index (PageIndex): Optional index to fill, e.g. to read the matches of the
+      design pages afterwards. A new one is used when not given.
+    - page_extractors (tuple): Functions called as extract(page_patterns, record) to
+      fill the record of a design page, e.g. those of a pattern profile.
+    - continuation_extractors (tuple): Functions called as
+      extract(page_patterns, continuation_patterns, record), the continuation
+      patterns being None when the design page has no 'Page 2'.
+
+    Yields:
+    tuple: (truss_key, TrussRecord) as soon as each truss design page has been parsed,
+    the record carrying its page number. A label repeated later in the document yields
+    another record.
+    """
+    page_index = page_index if page_index is not None else PageIndex(regex_dict)
+    # Records already parsed, by the first pages with the text of their design page and continuation
+    parsed = {}
+    pages = iter(pages)
+    page = next(pages, None)
+    current = page_index.add(page) if page is not None else None
+
+    while current is not None:
+        page = next(pages, None)
+        following = page_index.add(page) if page is not None else None
+
+        if page_index.role(current) == PAGE1_ROLE:
+            truss_key = page_index.label(current)
+            continuation = page_index.continuation_page(current)
+            content_key = (page_index.original(current),
+                           page_index.original(continuation) if continuation is not None else None)
+            if content_key in parsed:
+                yield truss_key, parsed[content_key].copy(current + 1)
+                current = following
+                continue
+
+            page_patterns = page_index.page_matches(current)
+            record = extract_truss_label(page_patterns, truss_key)
+            record.pages = [current + 1]
+            for extract in page_extractors:
+                extract(page_patterns, record)
+            continuation_patterns = page_index.continuation(current)
+            for extract in continuation_extractors:
+                extract(page_patterns, continuation_patterns, record)
+
+            parsed[content_key] = record
+            yield truss_key, record
+
+        current = following
 
-def compartmentalize_pdf(regex_dict, pdf_data):
+
+def add_record(truss_dictionary, versions, truss_key, record):
+    """
+    Adds a parsed record to the truss dictionary.
+
+    A record with the same values as one already held under its label only adds its
+    page to that record. A label found with different values is kept as another
+    version, under the label numbered from 2, e.g. 'T01 (2)', which is also written to
+    the label of its record so its rows can be told apart in every output. Every
+    version of the label is flagged as a conflict.
+
+    Parameters:
+    - truss_dictionary (dict): Truss keys mapped to their TrussRecord.
+    - versions (dict): Truss labels mapped to the keys of their versions.
+    - truss_key (str): The label of the record.
+    - record (TrussRecord): The record of one design page.
+    """
+    keys = versions.setdefault(truss_key, [])
+    for key in keys:
+        if truss_dictionary[key].same_values(record):
+            truss_dictionary[key].add_pages(record.pages)
+            return
+
+    key = truss_key if not keys else f'{truss_key} ({len(keys) + 1})'
+    record.label = key
+    truss_dictionary[key] = record
+    keys.append(key)
+    if len(keys) > 1:
+        for key in keys:
+            truss_dictionary[key].conflict = True
+
+
+def compartmentalize_pdf(regex_dict, pdf_data, progress=None, page_index=None, page_extractors=PAGE_EXTRACTORS,
+                         continuation_extractors=CONTINUATION_EXTRACTORS):
     """
     Main function to process PDF pages and organize extracted data into a dictionary.
+
+    Parameters:
+    - regex_dict (dict): The dictionary containing regex patterns.
+    - pdf_data (iterable): The text of each page, as a list or a lazy page iterator.
+    - progress (callable): Optional callback, called as
+      progress('compartmentalize_pdf', trusses_found) after each truss record.
+    - page_index (PageIndex): Optional index filled with the role, label and
+      matches of every page.
+    - page_extractors, continuation_extractors (tuple): The extract functions, see
+      iter_truss_records.
+
+    Returns:
+    dict: Truss labels mapped to their TrussRecord. Design pages repeating a label
+    with the same values are counted in one record, with every source page. A label
+    repeated with different values gets a record per version, flagged as a conflict,
+    see add_record.
+
+    The dictionary is only final once every page is read, since a label repeated
+    later adds pages to, or flags as a conflict, a record found earlier. Records are
+    therefore collected here before any output stage runs, a caller that can act on
+    each record as its page is parsed consumes iter_truss_records instead.
     """
     truss_dictionary = {}
-    # page_storage = read_pdf('Wright Reviewed_24-1180s3b')
-    page_storage = pdf_data
-
-    for index, page in enumerate(page_storage):
-        page_patterns = find_patterns(page, regex_dict)
-        
-        if page_patterns['label_found'] and page_patterns['page1_pattern_found'] and not page_patterns['truss_layout_pattern_found']:
-            truss_key = page_patterns['label_found'][0].split('Truss')[0]
-            
-            if truss_key not in truss_dictionary:
-                extract_truss_label(page_patterns, truss_dictionary, truss_key)
-
-            extract_design_loads(page_patterns, truss_dictionary, truss_key)
-            extract_slope(page_patterns, truss_dictionary, truss_key)
-            extract_spacing(page_patterns, truss_dictionary, truss_key)
-            extract_wind_data(page_patterns, truss_dictionary, truss_key)
-            extract_risk_category(page_patterns, truss_dictionary, truss_key)
-            extract_building_code(page_patterns, truss_dictionary, truss_key)
-            extract_max_member_stress(page_patterns, truss_dictionary, truss_key)
-            extract_deflection_criteria(page_patterns, truss_dictionary, truss_key)
-            extract_drag_load(page_patterns, page_storage, index, truss_dictionary, truss_key)
-            extract_warning(page_patterns, truss_dictionary, truss_key)
-
-    return truss_dictionary
\ No newline at end of file
+    versions = {}
+
+    records = iter_truss_records(regex_dict, pdf_data, page_index, page_extractors, continuation_extractors)
+    for truss_key, record in records:
+        add_record(truss_dictionary, versions, truss_key, record)
+        if progress is not None:
+            progress('compartmentalize_pdf', len(truss_dictionary))
+
+    return truss_dictionary
@@ -0,0 +1,125 @@
+import re
+
+# SCRIPT FOR THE TYPED RECORD OF ONE TRUSS DESIGN
+# Every extracted value is parsed once, when the page is scanned. Numeric fields hold
+# floats, values reported as text such as NA, n/r or **** are kept as the reported
+# string, and a field missing from the page is None so it never shifts later columns.
+
+# Fields in the order of the results columns A to T
+FIELDS = (
+    'label',
+    'top_chord_dead_load',
+    'bottom_chord_dead_load',
+    'top_chord_live_load',
+    'bottom_chord_live_load',
+    'slope',
+    'spacing',
+    'wind_standard',
+    'wind_speed',
+    'risk_category',
+    'building_code',
+    'top_chord_stress',
+    'bottom_chord_stress',
+    'web_stress',
+    'live_deflection_criteria',
+    'total_deflection_criteria',
+    'live_deflection',
+    'total_deflection',
+    'drag_load',
+    'warning',
+)
+
+# Fields always stored as text, every other field is parsed as a number
+TEXT_FIELDS = ('label', 'wind_standard', 'risk_category', 'building_code', 'warning')
+
+# Extracted values containing any of these characters are not numbers
+type_non_float = re.compile(r'[*a-zA-Z-]+')
+
+
+def parse_number(text):
+    """
+    Parses an extracted value as a number.
+
+    Returns:
+    float or str: The number, or the text unchanged when it is not a number, e.g. 'NA',
+    'n/r', '****' or '-'.
+    """
+    if type_non_float.search(text):
+        return text
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class TrussRecord:
+    __slots__ = FIELDS + ('pages', 'conflict')
+
+    def __init__(self, label, page_number=None):
+        for field in FIELDS:
+            setattr(self, field, None)
+        self.label = label
+        # Page numbers, from 1, of every design page carrying exactly these values
+        self.pages = [page_number] if page_number is not None else []
+        # True when the label is also on design pages with different values
+        self.conflict = False
+
+    def set_text(self, field, text):
+        """Stores an extracted string, parsed unless the field is a text field"""
+        setattr(self, field, text if field in TEXT_FIELDS else parse_number(text))
+
+    @property
+    def occurrences(self):
+        """The number of design pages carrying this record"""
+        return len(self.pages)
+
+    def add_pages(self, page_numbers):
+        """Counts further design pages carrying the same values"""
+        self.pages.extend(page_numbers)
+
+    def same_values(self, record):
+        """True when another record holds the same value in every field but the label, which may carry a version"""
+        return self.cells()[1:] == record.cells()[1:]
+
+    def copy(self, page_number=None):
+        """A record with the same values, for another design page with the same content"""
+        record = self.from_cells(self.cells())
+        if page_number is not None:
+            record.pages = [page_number]
+        return record
+
+    def cells(self):
+        """The values of the results columns A to T"""
+        return [getattr(self, field) for field in FIELDS]
+
+    def row(self):
+        """
+        The values written to the results row.
+
+        Columns A to T are followed by the number of design pages carrying the record,
+        their page numbers and whether the label is also found with different values.
+        """
+        return self.cells() + [self.occurrences, ', '.join(map(str, self.pages)), 'YES' if self.conflict else '-']
+
+    def to_list(self):
+        """JSON serialisable form, the cells of this record, its pages and its conflict flag"""
+        return [self.cells(), self.pages, self.conflict]
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Builds a record from the values of its results columns"""
+        record = cls(cells[0])
+        for field, value in zip(FIELDS[1:], cells[1:]):
+            setattr(record, field, value)
+        return record
+
+    @classmethod
+    def from_list(cls, data):
+        """Builds a record back from to_list"""
+        record = cls.from_cells(data[0])
+        record.pages = list(data[1])
+        record.conflict = data[2]
+        return record
+
+    def __repr__(self):
+        return f'TrussRecord({self.cells()!r}, pages={self.pages!r}, conflict={self.conflict!r})'
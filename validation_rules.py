@@ -0,0 +1,339 @@
+import operator
+from array import array
+
+# SCRIPT TO VALIDATE TRUSS RESULTS AGAINST THE DESIGN CRITERIA
+# Every check is a row in VALIDATION_RULES. The rules are evaluated column-wise over
+# typed column arrays, producing a pass/fail mask per results column; the workbook is
+# only touched afterwards to apply the masks.
+
+# Mask values
+PASS = 1
+FAIL = 0
+SKIP = -1
+
+# Results columns, in the order workbook_creater writes them
+COLUMNS = 'ABCDEFGHIJKLMNOPQRST'
+
+# Deflections reported without a number always fail
+NA_DEFLECTIONS = ('n/r', 'n/a', '****')
+
+COMPARISONS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Each rule flags its 'columns' by comparing either the sum of its numeric 'values'
+# columns or its 'text' column against a criterion. The criterion is an input_data
+# key, a {row category: input_data key} mapping with categories steep, shallow, roof
+# (steep or shallow) and floor, or a constant. Rows where a 'requires' column is not
+# numeric are skipped, as are floor rows of a 'roof_only' rule.
+VALIDATION_RULES = [
+    {
+        'name': 'dead_load',
+        'columns': ['B', 'C'],
+        'values': ['B', 'C'],
+        'requires': ['B', 'C', 'F'],
+        'compare': '>=',
+        'criterion': {'roof': 'design_roof_dead_load', 'floor': 'design_floor_dead_load'},
+    },
+    {
+        'name': 'live_load',
+        'columns': ['D', 'E'],
+        'values': ['D', 'E'],
+        'requires': ['D', 'E', 'F'],
+        'compare': '>=',
+        'criterion': {
+            'steep': 'design_roof_live_load_more_slope',
+            'shallow': 'design_roof_live_load_less_slope',
+            'floor': 'design_floor_live_load',
+        },
+    },
+    {
+        'name': 'truss_spacing',
+        'columns': ['G'],
+        'values': ['G'],
+        'requires': ['G'],
+        'compare': '<=',
+        'criterion': 'actual_truss_spacing',
+    },
+    {
+        'name': 'wind_standard',
+        'columns': ['H'],
+        'text': 'H',
+        'requires': ['F', 'I'],
+        'roof_only': True,
+        'compare': '==',
+        'criterion': 'design_wind_standard',
+    },
+    {
+        'name': 'wind_speed',
+        'columns': ['I'],
+        'values': ['I'],
+        'requires': ['F', 'I'],
+        'compare': '>=',
+        'criterion': 'design_wind_speed',
+    },
+    {
+        'name': 'risk_category',
+        'columns': ['J'],
+        'text': 'J',
+        'requires': ['F', 'I'],
+        'compare': '==',
+        'criterion': 'design_risk_category',
+    },
+    {
+        'name': 'building_code',
+        'columns': ['K'],
+        'text': 'K',
+        'requires': ['F', 'I'],
+        'compare': '==',
+        'criterion': 'design_building_code',
+    },
+] + [
+    {
+        'name': f'member_stress_{column}',
+        'columns': [column],
+        'values': [column],
+        'requires': [column],
+        'compare': '<',
+        'criterion': 1,
+    }
+    for column in 'LMN'
+] + [
+    {
+        'name': 'live_deflection_criteria',
+        'columns': ['O'],
+        'values': ['O'],
+        'requires': ['F', 'O', 'P'],
+        'compare': '>=',
+        'criterion': {'roof': 'design_roof_live_load_deflection_criteria',
+                      'floor': 'design_floor_live_load_deflection_criteria'},
+    },
+    {
+        'name': 'total_deflection_criteria',
+        'columns': ['P'],
+        'values': ['P'],
+        'requires': ['F', 'O', 'P'],
+        'compare': '>=',
+        'criterion': {'roof': 'design_roof_total_load_deflection_criteria',
+                      'floor': 'design_floor_total_load_deflection_criteria'},
+    },
+    {
+        'name': 'live_deflection',
+        'columns': ['Q'],
+        'values': ['Q'],
+        'requires': ['F', 'O', 'P'],
+        'na_fails': True,
+        'compare': '>=',
+        'criterion': {'roof': 'design_roof_live_load_deflection_criteria',
+                      'floor': 'design_floor_live_load_deflection_criteria'},
+    },
+    {
+        'name': 'total_deflection',
+        'columns': ['R'],
+        'values': ['R'],
+        'requires': ['F', 'O', 'P'],
+        'na_fails': True,
+        'compare': '>=',
+        'criterion': {'roof': 'design_roof_total_load_deflection_criteria',
+                      'floor': 'design_floor_total_load_deflection_criteria'},
+    },
+    {
+        'name': 'warning',
+        'columns': ['T'],
+        'text': 'T',
+        'requires': [],
+        'compare': '!=',
+        'criterion': 'WARNING',
+    },
+]
+
+
+class NumericColumn:
+    """A results column as a typed float array plus a mask of parseable rows"""
+    __slots__ = ('values', 'valid')
+
+    def __init__(self, cells):
+        self.values = array('d')
+        self.valid = array('b')
+        for cell in cells:
+            # Truss records already hold parsed numbers
+            if type(cell) is float:
+                self.values.append(cell)
+                self.valid.append(1)
+                continue
+            try:
+                # Empty cells count as zero, as they always have in the results sheet
+                self.values.append(float(cell or 0))
+                self.valid.append(1)
+            except (ValueError, TypeError):
+                self.values.append(0.0)
+                self.valid.append(0)
+
+
+def text_column(cells):
+    """A results column as strings, empty cells become empty strings"""
+    return [str(cell or '') for cell in cells]
+
+
+def row_categories(slope):
+    """Classifies each row as a steep roof, shallow roof or floor truss from its slope"""
+    return [
+        'steep' if value >= 4 else 'shallow' if value != 0 else 'floor'
+        for value in slope.values
+    ]
+
+
+def criterion_by_category(criterion, input_data):
+    """Resolves a rule criterion to its limit for each row category"""
+    if isinstance(criterion, dict):
+        limits = {}
+        for category in ('steep', 'shallow', 'floor'):
+            key = criterion.get(category) or criterion.get('floor' if category == 'floor' else 'roof')
+            limits[category] = float(input_data[key])
+        return limits
+
+    if isinstance(criterion, str):
+        criterion = input_data.get(criterion, criterion)
+    return {'steep': criterion, 'shallow': criterion, 'floor': criterion}
+
+
+def evaluate_rule(rule, cells, numbers, categories, input_data):
+    """
+    Evaluates one rule over every row.
+
+    Returns:
+    array: A PASS/FAIL/SKIP value per row.
+    """
+    return evaluate_rule_scenarios(rule, cells, numbers, categories, [input_data])[0]
+
+
+def evaluate_rule_scenarios(rule, cells, numbers, categories, scenarios):
+    """
+    Evaluates one rule over every row for each of several criteria sets.
+
+    The measured values and skipped rows do not depend on the criteria, they are
+    worked out once and only the comparison against the limits runs per scenario.
+
+    Returns:
+    list: A PASS/FAIL/SKIP array per row for each scenario, in scenario order.
+    """
+    compare = COMPARISONS[rule['compare']]
+
+    required = [numbers[column].valid for column in rule['requires']]
+    ready = [all(flags) for flags in zip(*required)] if required else [True] * len(categories)
+    if rule.get('roof_only'):
+        ready = [r and category != 'floor' for r, category in zip(ready, categories)]
+
+    if 'text' in rule:
+        measured = text_column(cells[rule['text']])
+        masks = []
+        for input_data in scenarios:
+            limits = criterion_by_category(rule['criterion'], input_data)
+            masks.append(array('b', (
+                SKIP if not r else PASS if compare(value, limits[category]) else FAIL
+                for r, value, category in zip(ready, measured, categories)
+            )))
+        return masks
+
+    columns = [numbers[column] for column in rule['values']]
+    measured = [sum(values) for values in zip(*(column.values for column in columns))]
+    parsed = [all(flags) for flags in zip(*(column.valid for column in columns))]
+    if rule.get('na_fails'):
+        not_reported = [
+            isinstance(cell, str) and cell.lower() in NA_DEFLECTIONS
+            for cell in cells[rule['values'][0]]
+        ]
+    else:
+        not_reported = [False] * len(categories)
+
+    masks = []
+    for input_data in scenarios:
+        limits = {category: float(limit)
+                  for category, limit in criterion_by_category(rule['criterion'], input_data).items()}
+        masks.append(array('b', (
+            SKIP if not r else FAIL if na else SKIP if not p else PASS if compare(value, limits[category]) else FAIL
+            for r, na, p, value, category in zip(ready, not_reported, parsed, measured, categories)
+        )))
+    return masks
+
+
+def prepare_columns(cells):
+    """Pads the results columns to one length and parses their numbers and row categories"""
+    row_count = max((len(values) for values in cells.values()), default=0)
+    cells = {column: list(cells.get(column, [])) + [None] * (row_count - len(cells.get(column, [])))
+             for column in COLUMNS}
+    numbers = {column: NumericColumn(values) for column, values in cells.items()}
+    return cells, numbers, row_categories(numbers['F'])
+
+
+def evaluate_rules(cells, input_data, rules=VALIDATION_RULES):
+    """
+    Evaluates the validation rules over the results columns.
+
+    Parameters:
+    - cells (dict): Column letter mapped to the list of cell values of that column,
+      one per truss, as stored in the results sheet.
+    - input_data (dict): The design criteria from user_input.get_input_data.
+    - rules (list): The rule table to evaluate.
+
+    Returns:
+    dict: Column letter mapped to an array holding PASS, FAIL or SKIP per truss.
+    """
+    return evaluate_scenarios(cells, [input_data], rules)[0]
+
+
+def evaluate_scenarios(cells, scenarios, rules=VALIDATION_RULES):
+    """
+    Evaluates the validation rules over the results columns for several criteria sets
+    in one pass, parsing the columns once.
+
+    Parameters:
+    - cells (dict): Column letter mapped to the list of cell values of that column.
+    - scenarios (list): Design criteria dictionaries from user_input.get_input_data.
+    - rules (list): The rule table to evaluate.
+
+    Returns:
+    list: For each scenario, column letter mapped to its PASS/FAIL/SKIP array.
+    """
+    cells, numbers, categories = prepare_columns(cells)
+    results = [{} for _ in scenarios]
+    for rule in rules:
+        masks = evaluate_rule_scenarios(rule, cells, numbers, categories, scenarios)
+        for scenario_results, mask in zip(results, masks):
+            for column in rule['columns']:
+                scenario_results[column] = mask
+    return results
+
+
+def failures_by_rule(results, rules=VALIDATION_RULES):
+    """Number of failing trusses of each rule, from the masks returned by evaluate_rules"""
+    return {rule['name']: results[rule['columns'][0]].count(FAIL) for rule in rules if rule['columns'][0] in results}
+
+
+def columns_from_records(truss_dictionary):
+    """
+    Builds the results columns straight from the extracted truss records.
+
+    Parameters:
+    - truss_dictionary (dict): Truss labels mapped to their TrussRecord.
+
+    Returns:
+    dict: Column letter mapped to the list of cell values of that column.
+    """
+    rows = [record.cells() for record in truss_dictionary.values()]
+    return {column: [row[index] for row in rows] for index, column in enumerate(COLUMNS)}
+
+
+def columns_from_sheet(ws, first_row=4):
+    """Reads the results columns from a worksheet in a single pass"""
+    cells = {column: [] for column in COLUMNS}
+    if ws.max_row < first_row:
+        return cells
+    for column, values in zip(COLUMNS, ws.iter_cols(min_row=first_row, max_row=ws.max_row,
+                                                     max_col=len(COLUMNS), values_only=True)):
+        cells[column] = list(values)
+    return cells
@@ -1,18 +1,40 @@
 import openpyxl
-from openpyxl.styles import Alignment, Font, Border, Side
+from openpyxl.utils import get_column_letter
 import os
-import re
+from cell_styles import register_styles, HEADER_STYLE, UNIT_STYLE, LABEL_STYLE, VALUE_STYLE, FAIL_STYLE
+from conditional_formats import add_validation_formats
+from scenarios import COMPARISON_SHEET
+from validation_rules import FAIL
+
+def results_file_path(pdf_file_name, directory_path=None):
+    # RESULTS WORKBOOK IS WRITTEN TO THE JOB DIRECTORY, OR THE CURRENT WORKING DIRECTORY
+    file_name = 'Truss Review Results_' + pdf_file_name
+    if directory_path is None:
+        directory_path = os.getcwd()
+    return os.path.join(directory_path, file_name + '.xlsx')
+
+
+def scenarios_file_path(pdf_file_name, directory_path=None):
+    # WHAT-IF WORKBOOK OF A PDF CHECKED AGAINST SEVERAL CRITERIA SETS
+    if directory_path is None:
+        directory_path = os.getcwd()
+    return os.path.join(directory_path, 'Truss Review Scenarios_' + pdf_file_name + '.xlsx')
+
 
 def create_workbook(pdf_file_name, truss_dictionary):
-    # CREATING A WORKBOOK AND SAVING IT IN THE CURRENT WORKING DIRECTORY
-    wb = openpyxl.Workbook()
+    # CREATING A WORKBOOK IN MEMORY, IT IS ONLY WRITTEN TO DISK ONCE BY save_workbook
+    # AFTER THE VALUES ARE STORED AND VALIDATED
+    wb = register_styles(openpyxl.Workbook())
     ws = wb.active
-    file_name = 'Truss Review Results_' + pdf_file_name
     ws.title = "Summary"
-    directory_path = os.getcwd()
-    file_path = directory_path + '/' + file_name + '.xlsx'
+    setup_results_sheet(ws, truss_dictionary)
+    return wb
+
 
-    # Dictionary with keys from 'A' to 'T' and their respective values
+# TITLE ROW, UNIT ROW AND COLUMN LAYOUT OF A RESULTS SHEET
+def setup_results_sheet(ws, truss_dictionary):
+    # Dictionary with keys from 'A' to 'W' and their respective values, U to W tell how
+    # many design pages carry the record, which ones, and whether its label conflicts
     cell_values = {
         'A': {'A1': 'TRUSS LABEL'},
         'B': {'B1': 'TOP CHORD DEAD LOAD', 'B2': '(PSF)'},
@@ -33,7 +55,10 @@ def create_workbook(pdf_file_name, truss_dictionary):
         'Q': {'Q1': 'CALCULATED LIVE LOAD DEFLECTION', 'Q2': '(L/)'},
         'R': {'R1': 'CALCULATED TOTAL LOAD DEFLECTION', 'R2': '(L/)'},
         'S': {'S1': 'DRAG LOAD', 'S2': '(LB)'},
-        'T': {'T1': 'WARNING'}
+        'T': {'T1': 'WARNING'},
+        'U': {'U1': 'OCCURRENCES'},
+        'V': {'V1': 'SOURCE PAGES'},
+        'W': {'W1': 'LABEL CONFLICT'}
     }
 
     # Initializing the title row and unit row using the dictionary
@@ -50,43 +75,137 @@ def create_workbook(pdf_file_name, truss_dictionary):
         # SETTING CELL WIDTH
         ws.column_dimensions[column].width = 20
 
-        # SETTING FONT ALIGNMENT AND FONT STYLE
-        ws[f'{column}1'].alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        ws[f'{column}2'].alignment = Alignment(horizontal='center', vertical='center')
-        ws[f'{column}1'].font = Font(bold=True)
-        ws[f'{column}2'].font = Font(bold=True)
-
-        # SETTING CELL BORDER STYLE
-        thin_border = Side(border_style='thin', color='000000')
-        border_format = Border(bottom=thin_border)
-        ws[f'{column}2'].border = border_format
+        # SETTING FONT ALIGNMENT, FONT STYLE AND BORDER FROM THE SHARED STYLES
+        ws[f'{column}1'].style = HEADER_STYLE
+        ws[f'{column}2'].style = UNIT_STYLE
 
     # SETTING UP CELL BORDER FOR FIRST COLUMN ONLY : AT TRUSS LABELS
     for i in range(len(truss_dictionary.keys())):
-        thin_border = Side(border_style='thin', color='000000')
-        border_format = Border(right=thin_border)
-        ws[f'A{i + 4}'].border = border_format
+        ws.cell(row=i + 4, column=1).style = LABEL_STYLE
 
-    # Save the workbook
-    wb.save(file_path)
-    return file_path
+    return ws
 
 
 # UNPACKING DICTONARY AND STORING VALUES IN CELLS
-def unpack_and_store_values(file_path, truss_dictionary):
-    wb = openpyxl.load_workbook(file_path)
-    ws = wb.active
-    type_non_float = re.compile(r'[*a-zA-Z-]+')
+# THE TRUSS RECORDS ALREADY HOLD NUMBERS OR TEXT, NO VALUE IS PARSED HERE
+def unpack_and_store_values(wb, truss_dictionary):
+    store_values(wb.active, truss_dictionary)
+
+
+def store_values(ws, truss_dictionary):
     row_num = 4  # Initialize row_num to start from the fourth row
 
-    for truss, values in truss_dictionary.items():
+    for truss, record in truss_dictionary.items():
+        for col_num, value in enumerate(record.row(), start=1):
+            cell = ws.cell(row=row_num, column=col_num)
+            cell.value = value
+            cell.style = LABEL_STYLE if col_num == 1 else VALUE_STYLE
+        row_num += 1
+
+
+# LEAVING THE PASS/FAIL HIGHLIGHTS TO EXCEL, ONE CONDITIONAL FORMATTING RULE PER
+# VALIDATION RULE READING THE CRITERIA FROM A HIDDEN SHEET, INSTEAD OF PAINTING CELLS
+def add_conditional_formats(wb, input_data, truss_dictionary):
+    return add_validation_formats(wb, input_data, len(truss_dictionary), first_row=4)
+
+
+# ONE RESULTS SHEET PER CRITERIA SCENARIO AFTER THE COMPARISON SHEET, THE SHEETS
+# ARE VALIDATED AND THE COMPARISON FILLED IN ONCE EVERY SCENARIO IS EVALUATED
+def create_scenarios_workbook(truss_dictionary, titles):
+    wb = register_styles(openpyxl.Workbook())
+    wb.active.title = COMPARISON_SHEET
+    for title in titles:
+        ws = wb.create_sheet(title)
+        setup_results_sheet(ws, truss_dictionary)
+        store_values(ws, truss_dictionary)
+    return wb
+
+
+# COMPARISON SHEET: THE CRITERIA THAT DIFFER BETWEEN SCENARIOS, THEN EVERY TRUSS WHOSE
+# VERDICT FLIPS WITH ITS OVERALL VERDICT IN EACH SCENARIO AND THE CHECKS THAT CHANGED
+def write_comparison_sheet(wb, titles, scenarios, criteria_keys, flips):
+    ws = wb[COMPARISON_SHEET]
+    ws.freeze_panes = 'B2'
+    ws.column_dimensions['A'].width = 45
+    for col_num in range(2, len(titles) + 3):
+        ws.column_dimensions[get_column_letter(col_num)].width = 20
+    ws.column_dimensions[get_column_letter(len(titles) + 2)].width = 60
+
+    def header(row_num, values):
         for col_num, value in enumerate(values, start=1):
             cell = ws.cell(row=row_num, column=col_num)
-            if re.search(type_non_float, value):
-                cell.value = value
-            else:
-                cell.value = float(value)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+            cell.value = value
+            cell.style = HEADER_STYLE
+
+    header(1, ['CRITERION'] + titles)
+    row_num = 2
+    for key in criteria_keys:
+        ws.cell(row=row_num, column=1, value=key).style = LABEL_STYLE
+        for col_num, (_, input_data) in enumerate(scenarios, start=2):
+            ws.cell(row=row_num, column=col_num, value=input_data[key]).style = VALUE_STYLE
+        row_num += 1
+
+    row_num += 1
+    header(row_num, ['TRUSS LABEL'] + titles + ['CHANGED CHECKS'])
+    row_num += 1
+    if not flips:
+        ws.cell(row=row_num, column=1, value='No truss changes verdict between scenarios').style = LABEL_STYLE
+    for flip in flips:
+        ws.cell(row=row_num, column=1, value=flip['label']).style = LABEL_STYLE
+        for col_num, verdict in enumerate(flip['verdicts'], start=2):
+            cell = ws.cell(row=row_num, column=col_num)
+            cell.value = 'FAIL' if verdict == FAIL else 'PASS'
+            cell.style = FAIL_STYLE if verdict == FAIL else VALUE_STYLE
+        ws.cell(row=row_num, column=len(titles) + 2, value=', '.join(flip['rules'])).style = VALUE_STYLE
         row_num += 1
+    return ws
+
+
+# WRITING THE FINISHED WORKBOOK TO DISK
+def save_workbook(wb, file_path):
+    wb.save(file_path)
+    return file_path
+
+
+def batch_summary_path(directory_path=None):
+    # BATCH SUMMARY IS WRITTEN NEXT TO THE RESULTS WORKBOOKS OF THE BATCH
+    if directory_path is None:
+        directory_path = os.getcwd()
+    return os.path.join(directory_path, 'Truss Review Batch Summary.xlsx')
+
+
+# WRITING ONE ROW PER ANALYSED FILE OF A BATCH
+def save_batch_summary(file_summaries, file_path):
+    wb = register_styles(openpyxl.Workbook())
+    ws = wb.active
+    ws.title = "Batch Summary"
+
+    columns = [
+        ('FILE', lambda summary: os.path.basename(summary['pdf_file_path'])),
+        ('STATUS', lambda summary: summary['status'].upper()),
+        ('PAGES', lambda summary: summary['pages']),
+        ('TRUSSES', lambda summary: summary['trusses']),
+        ('TRUSSES WITH FAILURES', lambda summary: summary['failed_trusses']),
+        ('FAILED CELLS', lambda summary: summary['failed_cells']),
+        ('TIME (S)', lambda summary: round(summary['seconds'], 1)),
+        ('RESULTS FILE', lambda summary: summary['output_path'] or ''),
+        ('ERROR', lambda summary: summary['error']),
+    ]
+
+    ws.row_dimensions[1].height = 40
+    ws.freeze_panes = 'B2'
+    for col_num, (title, _) in enumerate(columns, start=1):
+        cell = ws.cell(row=1, column=col_num)
+        cell.value = title
+        cell.style = HEADER_STYLE
+        ws.column_dimensions[cell.column_letter].width = 20
+    ws.column_dimensions['A'].width = 40
+    ws.column_dimensions['H'].width = 60
+
+    for row_num, summary in enumerate(file_summaries, start=2):
+        for col_num, (_, value) in enumerate(columns, start=1):
+            cell = ws.cell(row=row_num, column=col_num)
+            cell.value = value(summary)
+            cell.style = LABEL_STYLE if col_num == 1 else VALUE_STYLE
 
-    wb.save(file_path)
\ No newline at end of file
+    return save_workbook(wb, file_path)